@@ -0,0 +1,3 @@
+"""
+基准测试
+"""
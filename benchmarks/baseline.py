@@ -0,0 +1,130 @@
+"""
+基准测试结果的保存与对比
+
+结果是嵌套的 JSON 字典;对比时展开为 "stages.translate.wall_seconds" 形式的指标,
+只比较数值型指标,按指标名后缀决定噪声下限 (差值低于下限的波动不视为退化)
+"""
+
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 指标名后缀 -> 默认噪声下限 (绝对差值)
+DEFAULT_FLOORS = {
+    '_seconds': 0.05,
+    '_mb': 5.0,
+    'count': 0,
+    'bytes': 0,
+    'calls': 0,
+    'tokens': 0,
+}
+
+
+def run_metadata(options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """记录提交、环境和参数,便于跨提交对比时确认条件一致"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options or {},
+    }
+
+
+def save(result: Dict[str, Any], path: str) -> None:
+    """保存结果为 JSON"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n", encoding='utf-8')
+
+
+def load(path: str) -> Dict[str, Any]:
+    """读取 JSON 结果"""
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    """展开嵌套字典,只保留数值型指标 (跳过 meta)"""
+    metrics = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if name == 'meta':
+            continue
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def _floor(name: str, floors: Dict[str, float]) -> Optional[float]:
+    """指标的噪声下限,未知指标返回 None (不参与对比)"""
+    leaf = name.rsplit('.', 1)[-1]
+    for suffix, floor in floors.items():
+        if leaf.endswith(suffix):
+            return floor
+    return None
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.2,
+    floors: Optional[Dict[str, float]] = None
+) -> List[str]:
+    """
+    对比当前结果和基线
+
+    Args:
+        baseline: 基线结果
+        current: 当前结果
+        threshold: 相对退化阈值 (0.2 表示比基线慢/大 20% 以上)
+        floors: 指标名后缀 -> 噪声下限,默认 DEFAULT_FLOORS
+
+    Returns:
+        退化描述列表,为空表示没有退化
+    """
+    floors = DEFAULT_FLOORS if floors is None else floors
+    base_metrics = flatten(baseline)
+    regressions = []
+    for name, value in sorted(flatten(current).items()):
+        floor = _floor(name, floors)
+        if floor is None or name not in base_metrics:
+            continue
+        base = base_metrics[name]
+        if value - base > floor and value > base * (1 + threshold):
+            change = f"+{(value - base) / base:.0%}" if base else "new"
+            regressions.append(f"{name}: {base:g} -> {value:g} ({change})")
+    return regressions
+
+
+def report_comparison(baseline_path: str, current: Dict[str, Any], threshold: float, floors=None) -> int:
+    """打印与基线的对比结果,返回进程退出码 (有退化时为 1)"""
+    baseline = load(baseline_path)
+    regressions = compare(baseline, current, threshold, floors)
+    base_commit = baseline.get('meta', {}).get('commit')
+
+    base_options = baseline.get('meta', {}).get('options', {})
+    current_options = current.get('meta', {}).get('options', {})
+    changed = sorted(k for k in set(base_options) | set(current_options)
+                     if base_options.get(k) != current_options.get(k))
+    if changed:
+        print("⚠️ 与基线的参数不同,对比结果仅供参考: "
+              + ", ".join(f"{k}={base_options.get(k)!r}->{current_options.get(k)!r}" for k in changed))
+
+    if regressions:
+        print(f"❌ 相对基线 {baseline_path} ({base_commit}) 有 {len(regressions)} 项退化 (阈值 {threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"✅ 相对基线 {baseline_path} ({base_commit}) 没有超过 {threshold:.0%} 的退化")
+    return 0
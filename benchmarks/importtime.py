@@ -0,0 +1,190 @@
+"""
+入口模块的冷启动导入耗时
+
+每次在新的解释器中执行 python -X importtime -c "import <模块>",解析 stderr 得到入口模块的累计导入耗时
+和按顶层包汇总的自身耗时。两类检查任一失败时退出码为 1:
+- 预算: 入口模块导入耗时 (多次运行的中位数) 超过 BUDGETS
+- 禁止导入: 启动时不应加载的重量级依赖 (未选中的 LLM 服务商 SDK、Gmail API 客户端等) 出现在导入列表中
+
+用法:
+    python -m benchmarks.importtime                      # 全部入口,检查预算和禁止导入
+    python -m benchmarks.importtime --only scheduler --repeat 10
+    python -m benchmarks.importtime --save-baseline benchmarks/baselines/importtime.json
+    python -m benchmarks.importtime --baseline benchmarks/baselines/importtime.json
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks import baseline  # noqa: E402
+
+# 入口名称 -> 模块
+ENTRY_POINTS = {
+    'scheduler': 'src.scheduler.main',
+    'cli': 'src.pipeline.cli',
+    'translator': 'src.translator.langchain_translator',
+}
+
+# 导入耗时预算 (秒),约为本地实测的 3 倍,留出 CI 机器的余量
+BUDGETS = {
+    'scheduler': 0.5,
+    'cli': 1.2,
+    'translator': 1.0,
+}
+
+# 各服务商的 SDK 只在选中时导入
+_PROVIDER_SDKS = ['langchain_openai', 'langchain_google_vertexai', 'langchain_google_genai', 'openai', 'vertexai']
+
+# 入口启动时不应导入的包 (顶层包名)
+FORBIDDEN = {
+    'scheduler': _PROVIDER_SDKS + ['googleapiclient', 'sqlalchemy', 'bs4', 'langchain_core'],
+    'cli': _PROVIDER_SDKS + ['googleapiclient'],
+    'translator': _PROVIDER_SDKS + ['langchain_core'],
+}
+
+# 冷启动耗时受磁盘缓存和调度影响,波动可达几十毫秒
+FLOORS = {'min_seconds': 0.1}
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        [{'module', 'self_us', 'cumulative_us', 'depth'}],按输出顺序 (子模块在父模块之前)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                'module': module,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': len(indent) // 2,
+            })
+    return entries
+
+
+def measure_once(module: str) -> List[Dict[str, Any]]:
+    """在新的解释器中导入模块,返回解析后的导入记录"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=str(project_root),
+        env={**os.environ, 'PYTHONWARNINGS': 'ignore'},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else completed.returncode
+        raise RuntimeError(f"导入 {module} 失败: {error}")
+    return parse_importtime(completed.stderr)
+
+
+def measure(name: str, module: str, repeat: int, top: int) -> Dict[str, Any]:
+    """预热一次后导入 repeat 次,返回入口的耗时统计、最重的顶层包和禁止导入的包"""
+    measure_once(module)
+    totals = []
+    entries: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        entries = measure_once(module)
+        total = next((e['cumulative_us'] for e in entries if e['module'] == module and e['depth'] == 0), None)
+        if total is None:
+            raise RuntimeError(f"-X importtime 输出中没有 {module}")
+        totals.append(total / 1e6)
+
+    # 按顶层包汇总自身耗时 (最后一次运行)
+    packages: Dict[str, float] = {}
+    for entry in entries:
+        package = entry['module'].split('.', 1)[0]
+        packages[package] = packages.get(package, 0.0) + entry['self_us'] / 1e6
+    imported = {entry['module'].split('.', 1)[0] for entry in entries}
+
+    return {
+        'module': module,
+        'median_seconds': round(statistics.median(totals), 4),
+        'min_seconds': round(min(totals), 4),
+        'modules_count': len(entries),
+        'forbidden': sorted(imported & set(FORBIDDEN.get(name, []))),
+        'packages': {
+            package: round(seconds, 4)
+            for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> int:
+    """打印结果并检查预算/禁止导入,返回失败项数"""
+    failures = 0
+    print(f"  {'入口':<12}{'模块':<40}{'中位数(s)':>10}{'最小值(s)':>10}{'预算(s)':>9}{'模块数':>8}")
+    for name, result in results.items():
+        budget = BUDGETS.get(name)
+        print(f"  {name:<12}{result['module']:<40}{result['median_seconds']:>10.3f}{result['min_seconds']:>10.3f}"
+              f"{budget if budget is not None else '-':>9}{result['modules_count']:>8}")
+    print()
+    for name, result in results.items():
+        heaviest = ", ".join(f"{package} {seconds * 1000:.0f}ms" for package, seconds in result['packages'].items())
+        print(f"  {name}: {heaviest}")
+    print()
+
+    for name, result in results.items():
+        budget = BUDGETS.get(name)
+        if budget is not None and result['median_seconds'] > budget:
+            failures += 1
+            print(f"❌ {name} 导入耗时 {result['median_seconds']:.3f}s 超过预算 {budget}s")
+        if result['forbidden']:
+            failures += 1
+            print(f"❌ {name} 启动时导入了不应加载的包: {', '.join(result['forbidden'])}")
+    if not failures:
+        print("✅ 导入耗时均在预算内,没有导入禁止的包")
+    return failures
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="入口模块的冷启动导入耗时 (-X importtime) 与预算检查")
+    parser.add_argument('--only', help=f"只测量指定入口,逗号分隔 (可选: {', '.join(ENTRY_POINTS)})")
+    parser.add_argument('--repeat', type=int, default=5, help="每个入口导入的次数 (取中位数)")
+    parser.add_argument('--top', type=int, default=8, help="列出自身耗时最多的顶层包数")
+    parser.add_argument('--output', help="保存本次结果的 JSON 路径")
+    parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    parser.add_argument('--baseline', help="与基线 JSON 对比,有退化时退出码为 1")
+    parser.add_argument('--threshold', type=float, default=0.2, help="相对退化阈值 (默认 20%%)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(ENTRY_POINTS)
+    unknown = set(names) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"未知入口: {', '.join(sorted(unknown))},可选: {', '.join(ENTRY_POINTS)}")
+
+    results = {name: measure(name, ENTRY_POINTS[name], args.repeat, args.top) for name in names}
+    summary = {'meta': baseline.run_metadata({'entry_points': names, 'repeat': args.repeat}), 'entry_points': results}
+    failures = print_report(results)
+
+    if args.output:
+        baseline.save(summary, args.output)
+    if args.save_baseline:
+        baseline.save(summary, args.save_baseline)
+        print(f"\n💾 已保存基线: {args.save_baseline}")
+    if args.baseline:
+        print()
+        failures += baseline.report_comparison(args.baseline, summary, args.threshold, FLOORS)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+CPU 热点的微基准测试
+
+覆盖剪切、文本节点提取、欢迎语清理、格式化和标题摘要提取,
+在真实邮件夹具上运行,并把正文块 (body 下的顶层 <tr>) 复制为 2x / 10x / 100x 的合成变体,
+用于观察耗时是否随块数线性增长。结果可以保存为 JSON 基线,之后的提交与基线对比
+
+用法:
+    python -m benchmarks.micro                                   # 全部基准,1x/2x/10x/100x
+    python -m benchmarks.micro --only clip,convert --scales 1,10
+    python -m benchmarks.micro --save-baseline benchmarks/baselines/micro.json
+    python -m benchmarks.micro --baseline benchmarks/baselines/micro.json --threshold 0.2
+"""
+
+import argparse
+import email
+import statistics
+import sys
+import time
+from email import policy
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# 添加项目根目录到路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks import baseline  # noqa: E402
+
+DEFAULT_CORPUS = [project_root / "data" / "original_email.html"]
+DEFAULT_SCALES = (1, 2, 10, 100)
+# 微基准的耗时很短,噪声下限按毫秒计;最小值受调度和其他进程干扰最小,用于判断退化
+FLOORS = {'min_seconds': 0.001}
+
+
+class _OriginalImages:
+    """格式化时不上传图片,保留原始地址"""
+
+    def upload_image(self, image_url: str) -> str:
+        return image_url
+
+
+def load_fixture(path: Path) -> str:
+    """读取夹具邮件的 HTML (.html 直接读取,.eml 取 HTML 正文)"""
+    if path.suffix.lower() == '.eml':
+        message = email.message_from_bytes(path.read_bytes(), policy=policy.default)
+        return message.get_body(preferencelist=('html',)).get_content()
+    return path.read_text(encoding='utf-8')
+
+
+def collect_corpus(paths: List[str]) -> Dict[str, str]:
+    """收集夹具 {名称: 原始 HTML},目录中的 .html / .eml 文件都会加入"""
+    corpus = {}
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob('*') if p.suffix.lower() in ('.html', '.eml')) if path.is_dir() else [path]
+        for file in files:
+            corpus[file.stem] = load_fixture(file)
+    return corpus
+
+
+def scale_blocks(original_html: str, factor: int) -> str:
+    """
+    生成合成的放大变体: 剪切范围内除欢迎语外的正文块重复 factor 次
+
+    Args:
+        original_html: 原始邮件 HTML
+        factor: 放大倍数,1 时原样返回
+
+    Returns:
+        放大后的原始邮件 HTML (剪切等后续步骤照常处理)
+    """
+    if factor == 1:
+        return original_html
+
+    from bs4 import BeautifulSoup
+    from src.gmail.parser import EmailParser
+
+    clipped = EmailParser().clip_email_html(original_html)
+    body_start = clipped.find(">", clipped.find("<body")) + 1
+    body_end = clipped.rfind("</body>")
+    region = clipped[body_start:body_end]
+    offset = original_html.find(region)
+    if not region or offset == -1:
+        raise ValueError("无法定位剪切范围,不能生成放大变体")
+
+    body = BeautifulSoup(f"<body>{region}</body>", 'html.parser').body
+    rows = [str(tr) for tr in body.find_all('tr', recursive=False)]
+    if len(rows) < 2:
+        raise ValueError("剪切范围内没有可复制的正文块")
+    scaled_region = rows[0] + ''.join(rows[1:]) * factor
+    return original_html[:offset] + scaled_region + original_html[offset + len(region):]
+
+
+def prepare_inputs(original_html: str) -> Dict[str, Any]:
+    """依次执行上游步骤,得到每个基准的输入 (不计时)"""
+    from bs4 import BeautifulSoup
+    from src.gmail.parser import EmailParser
+    from src.pipeline.daily import clean_greeting
+    from src.wechat.table_based_converter import TableBasedConverter
+
+    clipped = EmailParser().clip_email_html(original_html)
+    cleaned = clean_greeting(clipped)
+    formatted = TableBasedConverter(publisher=_OriginalImages()).convert(cleaned)
+    return {
+        'original': original_html,
+        'clipped': clipped,
+        'soup': BeautifulSoup(cleaned, 'html.parser'),
+        'cleaned': cleaned,
+        'formatted': formatted,
+    }
+
+
+def get_benchmarks() -> Dict[str, tuple]:
+    """基准名称 -> (函数, 输入名)"""
+    from bs4 import BeautifulSoup
+    from src.gmail.parser import EmailParser
+    from src.pipeline.daily import clean_greeting, extract_title_and_digest
+    from src.translator.html_translator import extract_text_nodes
+    from src.wechat.table_based_converter import TableBasedConverter
+
+    parser = EmailParser()
+    return {
+        'clip': (parser.clip_email_html, 'original'),
+        'soup_parse': (lambda html: BeautifulSoup(html, 'html.parser'), 'cleaned'),
+        'extract_text_nodes': (extract_text_nodes, 'soup'),
+        'clean_greeting': (clean_greeting, 'clipped'),
+        'convert': (lambda html: TableBasedConverter(publisher=_OriginalImages()).convert(html), 'cleaned'),
+        'extract_title_and_digest': (extract_title_and_digest, 'formatted'),
+    }
+
+
+def measure(func: Callable[[Any], Any], arg: Any, min_time: float, min_rounds: int, max_rounds: int) -> List[float]:
+    """预热一次后重复执行,直到累计时间达到 min_time (至少 min_rounds 次,最多 max_rounds 次)"""
+    func(arg)
+    times: List[float] = []
+    while len(times) < min_rounds or (sum(times) < min_time and len(times) < max_rounds):
+        started = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def run(
+    corpus: Dict[str, str],
+    names: List[str],
+    scales: List[int],
+    min_time: float,
+    min_rounds: int,
+    max_rounds: int
+) -> Dict[str, Dict[str, Dict[str, Dict[str, float]]]]:
+    """执行基准,返回 {基准: {夹具: {'x<倍数>': 指标}}}"""
+    benchmarks = get_benchmarks()
+    results: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {name: {} for name in names}
+
+    for fixture, original_html in corpus.items():
+        for factor in scales:
+            inputs = prepare_inputs(scale_blocks(original_html, factor))
+            for name in names:
+                func, input_name = benchmarks[name]
+                times = measure(func, inputs[input_name], min_time, min_rounds, max_rounds)
+                median = statistics.median(times)
+                results[name].setdefault(fixture, {})[f"x{factor}"] = {
+                    'median_seconds': round(median, 6),
+                    'min_seconds': round(min(times), 6),
+                    'rounds': len(times),
+                }
+                print(f"  {name:<26}{fixture:<22}x{factor:<5}{median * 1000:>10.2f} ms")
+    return results
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    """打印结果;scaling 为 (Nx 中位数 / 1x 中位数) / N,约等于 1 表示线性增长"""
+    print(f"\n  {'基准':<26}{'夹具':<22}{'倍数':<7}{'中位数(ms)':>12}{'最小值(ms)':>12}{'scaling':>9}")
+    for name, fixtures in results.items():
+        for fixture, scales in fixtures.items():
+            base = scales.get('x1', {}).get('median_seconds')
+            for scale, metrics in scales.items():
+                factor = int(scale[1:])
+                scaling = f"{metrics['median_seconds'] / base / factor:.2f}" if base else "-"
+                print(f"  {name:<26}{fixture:<22}{scale:<7}{metrics['median_seconds'] * 1000:>12.2f}"
+                      f"{metrics['min_seconds'] * 1000:>12.2f}{scaling:>9}")
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="剪切 / 节点提取 / 格式化等 CPU 热点的微基准测试")
+    parser.add_argument('--corpus', nargs='+', default=[str(p) for p in DEFAULT_CORPUS],
+                        help="夹具邮件 (.html / .eml 文件或目录)")
+    parser.add_argument('--only', help="只运行指定基准,逗号分隔")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)), help="放大倍数,逗号分隔")
+    parser.add_argument('--min-time', type=float, default=0.5, help="每项基准的最短累计计时 (秒)")
+    parser.add_argument('--min-rounds', type=int, default=3)
+    parser.add_argument('--max-rounds', type=int, default=50)
+    parser.add_argument('--output', help="保存本次结果的 JSON 路径")
+    parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    parser.add_argument('--baseline', help="与基线 JSON 对比,有退化时退出码为 1")
+    parser.add_argument('--threshold', type=float, default=0.2, help="相对退化阈值 (默认 20%%)")
+    args = parser.parse_args(argv)
+
+    from src.utils.logger import setup_logging
+    setup_logging(log_level="ERROR")
+
+    available = list(get_benchmarks())
+    names = args.only.split(',') if args.only else available
+    unknown = set(names) - set(available)
+    if unknown:
+        parser.error(f"未知基准: {', '.join(sorted(unknown))},可选: {', '.join(available)}")
+    scales = [int(s) for s in args.scales.split(',')]
+    corpus = collect_corpus(args.corpus)
+
+    options = {'benchmarks': names, 'scales': scales, 'corpus': sorted(corpus), 'min_time': args.min_time}
+    results = run(corpus, names, scales, args.min_time, args.min_rounds, args.max_rounds)
+    summary = {'meta': baseline.run_metadata(options), 'benchmarks': results}
+    print_report(results)
+
+    if args.output:
+        baseline.save(summary, args.output)
+    if args.save_baseline:
+        baseline.save(summary, args.save_baseline)
+        print(f"\n💾 已保存基线: {args.save_baseline}")
+    if args.baseline:
+        print()
+        return baseline.report_comparison(args.baseline, summary, args.threshold, FLOORS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
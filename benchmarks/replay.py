@@ -0,0 +1,537 @@
+"""
+端到端回放基准测试
+
+不依赖 Gmail/IMAP、LLM 和 api.weixin.qq.com,用本地替身驱动真实的每日流水线:
+- 邮件: 固定的夹具邮件 (默认 data/original_email.html) 写成 .eml,由 LocalMailClient 读取
+- LLM: 模拟 LLM (AI_PROVIDER=fake),延迟和错误注入可配置
+- 微信: 本地 HTTP 服务模拟 token / 素材上传 / 草稿 / 发布接口,邮件中的图片地址也改写到该服务
+
+输出每个阶段的墙钟时间、CPU 时间、峰值 RSS,各接口的请求数和收发字节数,
+结果可以保存为 JSON 基线,之后的提交与基线对比
+
+用法:
+    python -m benchmarks.replay                                  # 回放 3 次,输出中位数
+    python -m benchmarks.replay --accounts 2 --streaming         # 多账号 / 流式模式
+    python -m benchmarks.replay --save-baseline benchmarks/baselines/replay.json
+    python -m benchmarks.replay --baseline benchmarks/baselines/replay.json --threshold 0.2
+"""
+
+import argparse
+import email
+import json
+import os
+import re
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from email import policy
+from email.message import EmailMessage
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+# 添加项目根目录到路径 (回放时会切换工作目录,不能依赖相对路径导入)
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks import baseline  # noqa: E402
+
+DEFAULT_FIXTURE = project_root / "data" / "original_email.html"
+ASSETS_DIR = project_root / "data" / "assets"
+SENDER = "news@daily.therundown.ai"
+IMAGE_SRC_PATTERN = re.compile(r'''(src=["'])(https?://[^"']+)(["'])''', re.I)
+
+
+class WeChatStandIn:
+    """
+    本地模拟的微信公众平台接口
+
+    按接口统计请求数、请求体字节数和响应字节数;/img/ 下提供邮件图片的下载
+    """
+
+    def __init__(self, image_bytes: bytes, latency_ms: float = 0.0):
+        """
+        Args:
+            image_bytes: /img/ 返回的图片内容
+            latency_ms: 每个请求的模拟服务端延迟
+        """
+        self.image_bytes = image_bytes
+        self.latency = latency_ms / 1000
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._media_counter = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'WeChatStandIn':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = {}
+
+    def _record(self, endpoint: str, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            entry = self.stats.setdefault(endpoint, {'count': 0, 'bytes_in': 0, 'bytes_out': 0})
+            entry['count'] += 1
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+
+    def _next_media_id(self) -> int:
+        with self._lock:
+            self._media_counter += 1
+            return self._media_counter
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> tuple:
+        """处理请求,返回 (接口名, 状态码, 响应内容, Content-Type)"""
+        if method == 'GET' and path.startswith('/img/'):
+            return 'image_download', 200, self.image_bytes, 'image/jpeg'
+
+        if method == 'GET' and path == '/cgi-bin/token':
+            payload = {'access_token': f"bench-token-{query.get('appid', [''])[0]}", 'expires_in': 7200}
+            return 'token', 200, payload, None
+
+        if method == 'POST' and path == '/cgi-bin/material/add_material':
+            kind = query.get('type', ['image'])[0]
+            media_id = self._next_media_id()
+            payload = {'media_id': f"bench-media-{media_id}", 'url': f"{self.base_url}/mmbiz/{media_id}.jpg"}
+            return f"add_material:{kind}", 200, payload, None
+
+        if method == 'POST' and path == '/cgi-bin/draft/add':
+            articles = json.loads(body.decode('utf-8')).get('articles') or []
+            if not articles or not articles[0].get('content'):
+                return 'draft_add', 200, {'errcode': 40007, 'errmsg': 'empty content'}, None
+            return 'draft_add', 200, {'media_id': f"bench-draft-{self._next_media_id()}"}, None
+
+        if method == 'POST' and path == '/cgi-bin/freepublish/submit':
+            return 'freepublish_submit', 200, {'errcode': 0, 'publish_id': f"bench-publish-{self._next_media_id()}"}, None
+
+        return 'not_found', 404, {'errcode': 404, 'errmsg': f'unknown endpoint {path}'}, None
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self, method: str):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+
+                endpoint, status, payload, content_type = stand_in.handle(
+                    method, url.path, parse_qs(url.query), body
+                )
+                if content_type is None:
+                    payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                stand_in._record(endpoint, len(body), len(payload))
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class RssSampler:
+    """后台采样进程 RSS,用于计算每个阶段执行期间的峰值"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[tuple] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        try:
+            self._page_size = os.sysconf('SC_PAGE_SIZE')
+            self._statm = open('/proc/self/statm', 'rb', buffering=0)
+        except (AttributeError, OSError, ValueError):
+            self._statm = None
+
+    def current_rss(self) -> int:
+        """当前 RSS (字节);没有 /proc 时退化为进程历史峰值"""
+        if self._statm is not None:
+            self._statm.seek(0)
+            return int(self._statm.read().split()[1]) * self._page_size
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter(), self.current_rss()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> 'RssSampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append((time.perf_counter(), self.current_rss()))
+        if self._statm is not None:
+            self._statm.close()
+
+    def peak_between(self, start: float, end: float) -> int:
+        """时间区间内的峰值 RSS (字节),区间过短没有采样点时取之后最近的一个采样"""
+        inside = [rss for t, rss in self.samples if start <= t <= end]
+        if inside:
+            return max(inside)
+        after = [rss for t, rss in self.samples if t >= end]
+        return after[0] if after else 0
+
+
+def build_fixture(source: Path, image_base: str, target: Path) -> Path:
+    """
+    生成回放用的 .eml 夹具
+
+    source 可以是 HTML 文件或 .eml 文件;正文中的远程图片地址改写到本地模拟服务,
+    相同地址映射到相同的本地地址 (保持图片去重行为不变)
+
+    Returns:
+        写入的 .eml 路径
+    """
+    if source.suffix.lower() == '.eml':
+        message = email.message_from_bytes(source.read_bytes(), policy=policy.default)
+        html_part = message.get_body(preferencelist=('html',))
+        html = html_part.get_content()
+    else:
+        message = EmailMessage()
+        message['From'] = f"The Rundown AI <{SENDER}>"
+        message['To'] = "bench@localhost"
+        message['Subject'] = "Replay benchmark"
+        message['Date'] = formatdate(localtime=False)
+        message['Message-ID'] = "<replay-benchmark@localhost>"
+        html_part = None
+        html = source.read_text(encoding='utf-8')
+
+    mapping: Dict[str, str] = {}
+
+    def rewrite(match):
+        url = match.group(2)
+        if url not in mapping:
+            mapping[url] = f"{image_base}/img/{len(mapping)}.jpg"
+        return f"{match.group(1)}{mapping[url]}{match.group(3)}"
+
+    html = IMAGE_SRC_PATTERN.sub(rewrite, html)
+    if html_part is not None:
+        html_part.set_content(html, subtype='html')
+    else:
+        message.set_content(html, subtype='html')
+
+    target.write_bytes(message.as_bytes())
+    return target
+
+
+def replay_once(
+    fixture: Path,
+    run_dir: Path,
+    options: Dict[str, Any],
+    pipeline_options: Dict[str, Any],
+    stand_in: WeChatStandIn
+) -> Dict[str, Any]:
+    """
+    在独立的工作目录中执行一次完整流水线 (冷缓存),返回测量结果
+
+    Args:
+        fixture: 夹具邮件
+        run_dir: 本次回放的工作目录
+        options: 回放参数 (账号数、是否自动发布)
+        pipeline_options: build_daily_pipeline 的参数 (get_pipeline_options() 加上命令行覆盖)
+        stand_in: 本地微信接口
+
+    Returns:
+        测量结果;注入的 LLM 错误导致流水线失败时 status 为 failed,error 为失败原因
+    """
+    from src.email.local_client import LocalMailClient
+    from src.pipeline.daily import build_daily_pipeline
+    from src.pipeline.engine import failed_result
+    from src.utils.artifacts import ArtifactStore
+    from src.utils.database import Database
+    from src.wechat.accounts import WeChatAccount
+
+    class CountingMailClient(LocalMailClient):
+        """统计读取的邮件数和字节数"""
+
+        reads = 0
+        bytes_read = 0
+
+        def _read_message_bytes(self, message_id):
+            data = super()._read_message_bytes(message_id)
+            self.reads += 1
+            self.bytes_read += len(data)
+            return data
+
+    shutil.copytree(ASSETS_DIR, run_dir / "data" / "assets")
+    previous_cwd = os.getcwd()
+    os.chdir(run_dir)
+    try:
+        mail_client = CountingMailClient(str(fixture))
+        accounts = None
+        if options['accounts'] > 0:
+            accounts = [
+                WeChatAccount(name=f"bench{i}", app_id=f"bench-app-{i}", app_secret="bench-secret")
+                for i in range(1, options['accounts'] + 1)
+            ]
+        pipeline = build_daily_pipeline(
+            email_client=mail_client,
+            sender_email=SENDER,
+            auto_publish=options['auto_publish'],
+            author="benchmark",
+            store=ArtifactStore(root=str(run_dir / "artifacts")),
+            database=Database(f"sqlite:///{run_dir / 'bench.db'}"),
+            accounts=accounts,
+            **pipeline_options
+        )
+
+        stand_in.reset()
+        error = None
+        with RssSampler() as sampler:
+            cpu_start = time.process_time()
+            started = time.perf_counter()
+            try:
+                result = pipeline.run()
+            except Exception as e:
+                # 注入的超时/429 在严格模式下会使翻译失败,记录为失败的回放而不是中断基准测试
+                result = failed_result(e)
+                if result is None:
+                    raise
+                error = f"{type(e).__name__}: {e}"
+            cpu_seconds = time.process_time() - cpu_start
+    finally:
+        os.chdir(previous_cwd)
+
+    if result.stopped:
+        raise RuntimeError(f"流水线提前终止: {result.stop_reason}")
+
+    stages = {}
+    for name, timing in sorted(result.timings.items(), key=lambda item: item[1].start):
+        stages[name] = {
+            'wall_seconds': round(timing.duration, 4),
+            'cpu_seconds': round(timing.cpu_seconds, 4),
+            'peak_rss_mb': round(sampler.peak_between(started + timing.start, started + timing.end) / 2**20, 1),
+        }
+
+    translator = result.get('translator')
+    llm_stats = getattr(getattr(translator, 'llm', None), 'stats', None)
+    return {
+        'status': 'failed' if error else 'success',
+        'error': error,
+        'total': {
+            'wall_seconds': round(result.total_seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'peak_rss_mb': round(max(rss for _, rss in sampler.samples) / 2**20, 1),
+        },
+        'critical_path': result.critical_path,
+        'stages': stages,
+        'requests': {name: dict(entry) for name, entry in sorted(stand_in.stats.items())},
+        'mail': {'count': mail_client.reads, 'bytes': mail_client.bytes_read},
+        'llm': llm_stats.summary() if llm_stats is not None else {},
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多次回放: 时间取中位数,RSS 取最大值,请求数和字节数取最后一次 (回放是确定性的)
+
+    失败的回放计入 runs.failed_count 并列出错误,有成功的回放时时间只统计成功的回放
+    """
+    failed = [run for run in runs if run['status'] == 'failed']
+    runs = [run for run in runs if run['status'] != 'failed'] or runs
+    last = runs[-1]
+
+    def merge(metrics: List[Dict[str, float]]) -> Dict[str, float]:
+        return {
+            'wall_seconds': round(statistics.median(m['wall_seconds'] for m in metrics), 4),
+            'cpu_seconds': round(statistics.median(m['cpu_seconds'] for m in metrics), 4),
+            'peak_rss_mb': max(m['peak_rss_mb'] for m in metrics),
+        }
+
+    llm = dict(last['llm'])
+    for key in ('p50_seconds', 'p95_seconds', 'p99_seconds', 'max_seconds'):
+        # 模拟延迟由配置决定,不作为退化指标
+        if key in llm:
+            llm[key.replace('_seconds', '_latency')] = round(llm.pop(key), 4)
+
+    return {
+        'runs': {'failed_count': len(failed), 'errors': sorted({run['error'] for run in failed})},
+        'total': merge([run['total'] for run in runs]),
+        'critical_path': last['critical_path'],
+        'stages': {
+            name: merge([run['stages'][name] for run in runs if name in run['stages']])
+            for name in last['stages']
+        },
+        'requests': last['requests'],
+        'mail': last['mail'],
+        'llm': llm,
+    }
+
+
+def print_report(summary: Dict[str, Any], repeat: int) -> None:
+    """打印测量结果"""
+    total = summary['total']
+    print(f"\n⏱️ 回放 {repeat} 次 (中位数): 总计 {total['wall_seconds']:.3f}s, "
+          f"CPU {total['cpu_seconds']:.3f}s, 峰值 RSS {total['peak_rss_mb']:.1f} MB")
+    print(f"  {'阶段':<24}{'墙钟(s)':>10}{'CPU(s)':>10}{'RSS(MB)':>10}")
+    for name, metrics in summary['stages'].items():
+        marker = "*" if name in summary['critical_path'] else " "
+        print(f"{marker} {name:<24}{metrics['wall_seconds']:>10.3f}{metrics['cpu_seconds']:>10.3f}"
+              f"{metrics['peak_rss_mb']:>10.1f}")
+
+    print(f"\n  {'接口':<24}{'请求数':>8}{'上行字节':>12}{'下行字节':>12}")
+    for name, entry in summary['requests'].items():
+        print(f"  {name:<24}{entry['count']:>8}{entry['bytes_in']:>12}{entry['bytes_out']:>12}")
+    mail = summary['mail']
+    print(f"  {'mail':<24}{mail['count']:>8}{0:>12}{mail['bytes']:>12}")
+
+    llm = summary['llm']
+    if llm:
+        print(f"\n  LLM: {llm['calls']} 次调用, 错误 {llm['errors'] or 0}, "
+              f"输入 {llm['input_tokens']} / 输出 {llm['output_tokens']} tokens")
+
+    failures = summary['runs']
+    if failures['failed_count']:
+        print(f"\n  ❌ {failures['failed_count']}/{repeat} 次回放失败:")
+        for error in failures['errors']:
+            print(f"    {error}")
+
+
+def configure_environment(args, stand_in: WeChatStandIn) -> None:
+    """在导入 src 之前设置环境变量: 模拟 LLM、本地微信接口,本地请求不走代理"""
+    os.environ.update({
+        'AI_PROVIDER': 'fake',
+        'FAKE_LLM_LATENCY': args.llm_latency,
+        'FAKE_LLM_LATENCY_MS': str(args.llm_latency_ms),
+        'FAKE_LLM_RATE_LIMIT_RATE': str(args.llm_429_rate),
+        'FAKE_LLM_TIMEOUT_RATE': str(args.llm_timeout_rate),
+        'FAKE_LLM_SEED': str(args.seed),
+        'WECHAT_APP_ID': 'bench-app',
+        'WECHAT_APP_SECRET': 'bench-secret',
+        'WECHAT_API_BASE_URL': f"{stand_in.base_url}/cgi-bin",
+        'NO_PROXY': '127.0.0.1,localhost',
+        'no_proxy': '127.0.0.1,localhost',
+    })
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="端到端回放基准测试 (本地邮件 / 模拟 LLM / 本地微信接口)")
+    parser.add_argument('--fixture', default=str(DEFAULT_FIXTURE), help="夹具邮件 (.html 或 .eml)")
+    parser.add_argument('--repeat', type=int, default=3, help="回放次数,结果取中位数")
+    parser.add_argument('--accounts', type=int, default=0, help="多账号模式的账号数 (0 表示单账号模式)")
+    parser.add_argument('--streaming', action=argparse.BooleanOptionalAction, default=None,
+                        help="流式翻译 (默认读取配置)")
+    parser.add_argument('--translate-workers', type=int, default=None, help="流式模式的翻译并发数 (默认读取配置)")
+    parser.add_argument('--max-workers', type=int, default=None, help="流水线阶段并发数 (默认读取配置)")
+    parser.add_argument('--segmentation', choices=('node', 'block'), default=None,
+                        help="翻译单元: 逐个文本节点 / 按块 (默认读取配置)")
+    parser.add_argument('--auto-publish', action='store_true', help="创建草稿后调用发布接口")
+    parser.add_argument('--llm-latency', default='fixed', choices=('fixed', 'lognormal', 'heavy_tail'))
+    parser.add_argument('--llm-latency-ms', type=float, default=20.0, help="模拟 LLM 延迟 (中位数/最小值)")
+    parser.add_argument('--llm-429-rate', type=float, default=0.0, help="模拟 LLM 429 比例")
+    parser.add_argument('--llm-timeout-rate', type=float, default=0.0, help="模拟 LLM 超时比例")
+    parser.add_argument('--wechat-latency-ms', type=float, default=0.0, help="本地微信接口的模拟延迟")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="保存本次结果的 JSON 路径")
+    parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    parser.add_argument('--baseline', help="与基线 JSON 对比,有退化时退出码为 1")
+    parser.add_argument('--threshold', type=float, default=0.2, help="相对退化阈值 (默认 20%%)")
+    parser.add_argument('--verbose', action='store_true', help="输出流水线日志")
+    args = parser.parse_args(argv)
+
+    stand_in = WeChatStandIn((ASSETS_DIR / "temp_thumb.jpg").read_bytes(), args.wechat_latency_ms).start()
+    configure_environment(args, stand_in)
+
+    from src.pipeline.daily import get_pipeline_options
+    from src.utils.logger import setup_logging
+
+    setup_logging(log_level="INFO" if args.verbose else "WARNING")
+    # 与 cli.py 相同,按配置构建流水线 (降级策略、中文变体等),命令行参数只覆盖指定的项
+    pipeline_options = get_pipeline_options()
+    for key, value in (
+        ('streaming', args.streaming),
+        ('translate_workers', args.translate_workers),
+        ('max_workers', args.max_workers),
+        ('segmentation', args.segmentation),
+    ):
+        if value is not None:
+            pipeline_options[key] = value
+
+    degraded = pipeline_options['degraded']
+    options = {
+        'accounts': args.accounts,
+        'auto_publish': args.auto_publish,
+        'streaming': pipeline_options['streaming'],
+        'translate_workers': pipeline_options['translate_workers'],
+        'max_workers': pipeline_options['max_workers'],
+        'segmentation': pipeline_options['segmentation'],
+        'degraded': degraded.min_completeness if degraded is not None else None,
+        'variants': sorted(pipeline_options['variants']),
+        'llm_latency': args.llm_latency,
+        'llm_latency_ms': args.llm_latency_ms,
+        'llm_429_rate': args.llm_429_rate,
+        'llm_timeout_rate': args.llm_timeout_rate,
+        'wechat_latency_ms': args.wechat_latency_ms,
+        'fixture': Path(args.fixture).name,
+    }
+
+    workdir = Path(tempfile.mkdtemp(prefix="replay-bench-"))
+    try:
+        fixture = build_fixture(Path(args.fixture), stand_in.base_url, workdir / "fixture.eml")
+        runs = []
+        for i in range(args.repeat):
+            run_dir = workdir / f"run-{i}"
+            run_dir.mkdir()
+            runs.append(replay_once(fixture, run_dir, options, pipeline_options, stand_in))
+            status = "" if runs[-1]['status'] == 'success' else f" (失败: {runs[-1]['error']})"
+            print(f"  回放 {i + 1}/{args.repeat}: {runs[-1]['total']['wall_seconds']:.3f}s{status}")
+    finally:
+        stand_in.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = {'meta': baseline.run_metadata(options), **summarize(runs)}
+    print_report(summary, args.repeat)
+
+    if args.output:
+        baseline.save(summary, args.output)
+    if args.save_baseline:
+        baseline.save(summary, args.save_baseline)
+        print(f"\n💾 已保存基线: {args.save_baseline}")
+    if args.baseline:
+        print()
+        return baseline.report_comparison(args.baseline, summary, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,10 @@
 """
 邮箱服务模块
-支持多种邮箱服务: Gmail API, IMAP (QQ/163/Gmail)
+支持多种邮箱服务: Gmail API, IMAP (QQ/163/Gmail), 本地邮件源 (.eml/mbox/Maildir)
 """
 
 from .base import EmailClient
-from .factory import create_email_client
+from .factory import create_email_client, get_shared_email_client
 
-__all__ = ['EmailClient', 'create_email_client']
+__all__ = ['EmailClient', 'create_email_client', 'get_shared_email_client']
 
@@ -4,6 +4,8 @@
 """
 
 from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import List, Optional, Dict, Any
 
 
@@ -61,3 +63,49 @@ class EmailClient(ABC):
         """
         pass
 
+    def search_emails_between(
+        self,
+        sender: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按日期范围搜索来自指定发件人的邮件 (用于历史回填)
+
+        默认实现基于 search_emails 按天数搜索后再按 Date 头过滤,
+        支持服务端日期查询的客户端应覆盖此方法
+
+        Args:
+            sender: 发件人邮箱地址
+            since: 起始时间 (含),None 表示不限制
+            until: 结束时间 (不含),None 表示不限制
+
+        Returns:
+            邮件列表 (按日期从旧到新)
+        """
+        now = datetime.now(timezone.utc)
+        since = _as_utc(since)
+        until = _as_utc(until)
+        days_back = (now - since).days + 1 if since else 0
+
+        results = []
+        for message in self.search_emails(sender, max_results=500, days_back=days_back):
+            try:
+                date = _as_utc(parsedate_to_datetime(message.get('date', '')))
+            except (TypeError, ValueError):
+                date = None
+            if since and (date is None or date < since):
+                continue
+            if until and (date is None or date >= until):
+                continue
+            results.append((date or now, message))
+
+        results.sort(key=lambda item: item[0])
+        return [message for _, message in results]
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """不带时区的时间按 UTC 处理"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
@@ -4,21 +4,30 @@
 """
 
 import os
+import threading
 import yaml
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
 from dotenv import load_dotenv
 
 from .base import EmailClient
-from .gmail_client import GmailClient
-from .imap_client import IMAPClient
 from ..utils.logger import get_logger
 
+if TYPE_CHECKING:
+    # 各客户端在选中时才导入 (Gmail API 客户端依赖 googleapiclient,导入较慢)
+    from .gmail_client import GmailClient
+    from .imap_client import IMAPClient
+    from .local_client import LocalMailClient
+
 # 加载环境变量
 load_dotenv()
 
 logger = get_logger(__name__)
 
+# 长驻进程 (调度器) 复用的客户端,按 (配置文件, 服务类型) 缓存
+_shared_clients: Dict[tuple, EmailClient] = {}
+_shared_lock = threading.Lock()
+
 
 def create_email_client(
     config_path: str = "config/config.yaml",
@@ -29,10 +38,10 @@ def create_email_client(
     
     Args:
         config_path: 配置文件路径
-        provider: 强制指定邮箱服务类型 (gmail_api | imap),如果为 None 则从配置文件读取
+        provider: 强制指定邮箱服务类型 (gmail_api | imap | local),如果为 None 则从配置文件读取
     
     Returns:
-        EmailClient: Gmail API 或 IMAP 客户端
+        EmailClient: Gmail API、IMAP 或本地邮件源客户端
     
     Raises:
         ValueError: 不支持的邮箱服务类型
@@ -60,11 +69,64 @@ def create_email_client(
         return _create_gmail_client(email_config)
     elif provider == 'imap':
         return _create_imap_client(email_config)
+    elif provider == 'local':
+        return _create_local_client(email_config)
     else:
         raise ValueError(f"不支持的邮箱服务类型: {provider}")
 
 
-def _create_gmail_client(email_config: dict) -> GmailClient:
+def get_shared_email_client(
+    config_path: str = "config/config.yaml",
+    provider: Optional[str] = None
+) -> EmailClient:
+    """
+    获取进程内共享的邮箱客户端 (用于调度器模式)
+
+    第一次调用时创建客户端,之后的调用复用同一个已认证的会话,
+    避免每次运行都重新进行 DNS + TLS + LOGIN + SELECT。IMAP 客户端
+    会在使用前自动探活并在断线时重连。
+
+    Args:
+        config_path: 配置文件路径
+        provider: 强制指定邮箱服务类型,如果为 None 则从配置文件读取
+
+    Returns:
+        EmailClient: 共享的客户端实例
+    """
+    key = (config_path, provider)
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = create_email_client(config_path, provider)
+            _shared_clients[key] = client
+            logger.info("已创建共享邮箱客户端")
+        return client
+
+
+def keepalive_shared_clients() -> None:
+    """对所有共享客户端执行保活 (IMAP 发送 NOOP)"""
+    with _shared_lock:
+        clients = list(_shared_clients.values())
+
+    for client in clients:
+        keepalive = getattr(client, 'keepalive', None)
+        if keepalive:
+            keepalive()
+
+
+def close_shared_clients() -> None:
+    """关闭并清空所有共享客户端"""
+    with _shared_lock:
+        clients = list(_shared_clients.values())
+        _shared_clients.clear()
+
+    for client in clients:
+        close = getattr(client, 'close', None)
+        if close:
+            close()
+
+
+def _create_gmail_client(email_config: dict) -> "GmailClient":
     """
     创建 Gmail API 客户端
     
@@ -74,6 +136,8 @@ def _create_gmail_client(email_config: dict) -> GmailClient:
     Returns:
         GmailClient
     """
+    from .gmail_client import GmailClient
+
     gmail_config = email_config.get('gmail_api', {})
     
     # 从配置或环境变量获取凭证路径
@@ -97,7 +161,7 @@ def _create_gmail_client(email_config: dict) -> GmailClient:
     )
 
 
-def _create_imap_client(email_config: dict) -> IMAPClient:
+def _create_imap_client(email_config: dict) -> "IMAPClient":
     """
     创建 IMAP 客户端
     
@@ -107,6 +171,8 @@ def _create_imap_client(email_config: dict) -> IMAPClient:
     Returns:
         IMAPClient
     """
+    from .imap_client import IMAPClient
+
     imap_config = email_config.get('imap', {})
     
     # 从配置获取 IMAP 服务器信息
@@ -114,6 +180,9 @@ def _create_imap_client(email_config: dict) -> IMAPClient:
     port = imap_config.get('port', 993)
     use_ssl = imap_config.get('use_ssl', True)
     folder = imap_config.get('folder', 'INBOX')
+    timeout = imap_config.get('timeout', 30)
+    compress = imap_config.get('compress', True)
+    keepalive_interval = imap_config.get('keepalive_interval', 600)
     
     # 从环境变量获取账号密码
     username = os.getenv('EMAIL_USERNAME')
@@ -141,6 +210,35 @@ def _create_imap_client(email_config: dict) -> IMAPClient:
         password=password,
         port=port,
         use_ssl=use_ssl,
-        folder=folder
+        folder=folder,
+        timeout=timeout,
+        compress=compress,
+        keepalive_interval=keepalive_interval
     )
 
+
+def _create_local_client(email_config: dict) -> "LocalMailClient":
+    """
+    创建本地邮件源客户端 (.eml / mbox / Maildir)
+    
+    Args:
+        email_config: 邮箱配置
+    
+    Returns:
+        LocalMailClient
+    """
+    from .local_client import LocalMailClient
+
+    local_config = email_config.get('local', {})
+    
+    # 环境变量优先,便于临时指定回放的归档
+    path = os.getenv('LOCAL_MAIL_PATH') or local_config.get('path')
+    honor_days_back = local_config.get('honor_days_back', False)
+    
+    if not path:
+        raise ValueError("本地邮件源路径未配置 (config.yaml -> email.local.path 或环境变量 LOCAL_MAIL_PATH)")
+    
+    logger.info(f"创建本地邮件源客户端")
+    logger.info(f"  路径: {path}")
+    
+    return LocalMailClient(path=path, honor_days_back=honor_days_back)
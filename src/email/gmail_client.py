@@ -5,24 +5,47 @@ Gmail API 客户端
 
 import os
 import pickle
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+import threading
+from pathlib import Path
+from typing import List, Optional, Dict, Any, TYPE_CHECKING
+from datetime import datetime, timedelta, timezone
 import httplib2
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from .base import EmailClient
 from ..utils.logger import get_logger
 
+if TYPE_CHECKING:
+    from ..utils.database import Database
+
 logger = get_logger(__name__)
 
 # Gmail API 权限范围
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# 筛选邮件时只请求需要的头部和字段 (partial response)
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+LIST_FIELDS = 'messages(id,threadId),nextPageToken'
+METADATA_FIELDS = 'id,threadId,internalDate,snippet,payload/headers'
+FULL_FIELDS = 'id,threadId,internalDate,snippet,payload'
+
+# 单个 batch 请求包含的子请求数 (Gmail 上限 100,官方建议不超过 50)
+BATCH_SIZE = 50
+
+# 令牌在过期前多少秒由后台线程刷新
+TOKEN_REFRESH_MARGIN = 300
+
+# discovery 文档缓存 (静态文档不可用时使用)
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version=v1'
+DISCOVERY_CACHE_PATH = Path('data/cache/gmail.v1.discovery.json')
+
+# 增量同步
+HISTORY_FIELDS = 'history(messagesAdded/message(id,threadId)),historyId,nextPageToken'
+HISTORY_STATE_KEY = 'gmail_history_id'
+
 
 def _log_proxy_info() -> None:
     """
@@ -53,6 +76,9 @@ class GmailClient(EmailClient):
     ):
         """
         初始化 Gmail 客户端
+
+        只加载凭证,不构建 API 服务: 服务在第一次访问 self.service 时才构建,
+        令牌刷新在后台线程中提前进行
         
         Args:
             credentials_path: OAuth 凭证文件路径
@@ -60,15 +86,48 @@ class GmailClient(EmailClient):
         """
         self.credentials_path = credentials_path
         self.token_path = token_path
-        self.service = None
+        self._service = None
+        self._service_lock = threading.Lock()
+        self._creds: Optional[Credentials] = None
+        self._from_env = False
+        self._refresh_ready = threading.Event()
+        self._refresh_error: Optional[Exception] = None
+        self._stop_refresh = threading.Event()
+        # 最近一次增量同步得到、尚未写回数据库的 historyId (见 commit_sync)
+        self._pending_history_id: Optional[str] = None
         self._authenticate()
+
+    @property
+    def service(self):
+        """Gmail API 服务 (首次访问时构建)"""
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    creds = self._wait_for_credentials()
+                    self._service = self._build_service(creds)
+                    logger.info("Gmail API 客户端初始化成功")
+        return self._service
+
+    @service.setter
+    def service(self, value) -> None:
+        self._service = value
+
+    @staticmethod
+    def _is_server_env() -> bool:
+        """是否在无浏览器的服务器环境中运行"""
+        return bool(
+            os.getenv('GMAIL_TOKEN_JSON') or os.getenv('RENDER') or os.getenv('DOCKER_CONTAINER')
+        )
     
     def _authenticate(self) -> None:
         """
-        执行 OAuth 认证
+        加载 OAuth 凭证
         支持两种方式：
         1. 本地开发：使用 token.pickle 文件
         2. Render 部署：使用环境变量中的 token 信息
+
+        有可刷新的凭证时,刷新交给后台线程;没有凭证时 (仅本地)
+        同步执行浏览器授权流程
         """
         creds = None
 
@@ -87,6 +146,7 @@ class GmailClient(EmailClient):
                     client_secret=token_data.get('client_secret'),
                     scopes=token_data.get('scopes')
                 )
+                self._from_env = True
                 logger.info("从环境变量加载 token 成功")
             except Exception as e:
                 logger.warning(f"从环境变量加载 token 失败: {e}")
@@ -98,71 +158,167 @@ class GmailClient(EmailClient):
             with open(self.token_path, 'rb') as token:
                 creds = pickle.load(token)
 
-        # 如果没有有效凭证，执行认证流程
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                logger.info("刷新过期的访问令牌")
+        if creds and (creds.valid or creds.refresh_token):
+            # 有效或可刷新: 后台线程负责在过期前刷新
+            self._creds = creds
+            self._start_refresh_thread()
+            return
+
+        # 没有可用凭证，执行 OAuth 流程（仅本地）
+        self._creds = self._run_oauth_flow()
+        self._refresh_ready.set()
+        self._start_refresh_thread()
+
+    def _run_oauth_flow(self) -> Credentials:
+        """执行浏览器 OAuth 授权流程并保存令牌 (仅本地)"""
+        # 检查是否在服务器环境（没有浏览器）
+        if self._is_server_env():
+            raise RuntimeError(
+                "在服务器环境中无法执行 OAuth 浏览器授权流程。\n"
+                "请在本地完成授权:\n"
+                "1. 在本地执行: uv run python -c \"from src.gmail.client import GmailClient; GmailClient()\"\n"
+                "2. 完成浏览器授权\n"
+                "3. 上传新的 credentials/token.pickle 到服务器"
+            )
+
+        logger.info("执行 OAuth 认证流程")
+        if not os.path.exists(self.credentials_path):
+            raise FileNotFoundError(
+                f"凭证文件不存在: {self.credentials_path}\n"
+                "请从 Google Cloud Console 下载 credentials.json"
+            )
+
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file(
+            self.credentials_path, SCOPES
+        )
+        creds = flow.run_local_server(port=0)
+
+        # 保存令牌供下次使用
+        self._save_token(creds)
+
+        # 打印 token 信息供 Render 部署使用
+        self._print_token_for_deployment(creds)
+        return creds
+
+    def _save_token(self, creds: Credentials) -> None:
+        """保存令牌到本地文件"""
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        with open(self.token_path, 'wb') as token:
+            pickle.dump(creds, token)
+        logger.info(f"访问令牌已保存: {self.token_path}")
+
+    def _start_refresh_thread(self) -> None:
+        """启动后台令牌刷新线程"""
+        thread = threading.Thread(
+            target=self._refresh_loop,
+            name="gmail-token-refresh",
+            daemon=True
+        )
+        thread.start()
+
+    def _seconds_until_refresh(self, creds: Credentials) -> Optional[float]:
+        """距离需要刷新还有多少秒,没有过期时间时返回 None"""
+        if not creds.expiry:
+            return None
+        # google-auth 的 expiry 是不带时区的 UTC 时间
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (creds.expiry - now).total_seconds() - TOKEN_REFRESH_MARGIN
+
+    def _refresh_loop(self) -> None:
+        """后台线程: 在令牌过期前 TOKEN_REFRESH_MARGIN 秒刷新"""
+        while not self._stop_refresh.is_set():
+            creds = self._creds
+            remaining = self._seconds_until_refresh(creds)
+
+            if not creds.valid or (remaining is not None and remaining <= 0):
+                if not creds.refresh_token:
+                    self._refresh_error = RuntimeError("访问令牌已过期且没有 refresh_token")
+                    self._refresh_ready.set()
+                    return
+
+                logger.info("刷新访问令牌")
                 try:
                     creds.refresh(Request())
                     logger.info("令牌刷新成功")
-
-                    # 🔧 修复: 刷新成功后保存新的 token
-                    if not gmail_token_json:  # 只在本地环境保存文件
-                        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
-                        with open(self.token_path, 'wb') as token:
-                            pickle.dump(creds, token)
-                        logger.info(f"✅ 刷新后的令牌已保存: {self.token_path}")
-
+                    # 只在本地环境保存文件
+                    if not self._from_env:
+                        self._save_token(creds)
                 except Exception as e:
                     logger.error(f"令牌刷新失败: {e}")
-                    # 如果刷新失败且在服务器环境，抛出错误
-                    if gmail_token_json or os.getenv('RENDER') or os.getenv('DOCKER_CONTAINER'):
-                        raise RuntimeError(
-                            "Gmail token 刷新失败。请在本地重新授权:\n"
-                            "1. 在本地执行: uv run python -c \"from src.gmail.client import GmailClient; GmailClient()\"\n"
-                            "2. 完成浏览器授权\n"
-                            "3. 上传新的 credentials/token.pickle 到服务器"
-                        )
-                    creds = None
-
-            # 如果还是没有有效凭证，执行 OAuth 流程（仅本地）
-            if not creds:
-                # 检查是否在服务器环境（没有浏览器）
-                if gmail_token_json or os.getenv('RENDER') or os.getenv('DOCKER_CONTAINER'):
-                    raise RuntimeError(
-                        "在服务器环境中无法执行 OAuth 浏览器授权流程。\n"
-                        "请在本地完成授权:\n"
-                        "1. 在本地执行: uv run python -c \"from src.gmail.client import GmailClient; GmailClient()\"\n"
-                        "2. 完成浏览器授权\n"
-                        "3. 上传新的 credentials/token.pickle 到服务器"
-                    )
-
-                logger.info("执行 OAuth 认证流程")
-                if not os.path.exists(self.credentials_path):
-                    raise FileNotFoundError(
-                        f"凭证文件不存在: {self.credentials_path}\n"
-                        "请从 Google Cloud Console 下载 credentials.json"
-                    )
-
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path, SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-
-                # 保存令牌供下次使用
-                os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
-                with open(self.token_path, 'wb') as token:
-                    pickle.dump(creds, token)
-                logger.info(f"访问令牌已保存: {self.token_path}")
+                    self._refresh_error = e
+                    self._refresh_ready.set()
+                    return
+                remaining = self._seconds_until_refresh(creds)
+
+            self._refresh_ready.set()
+            if remaining is None:
+                return
+            self._stop_refresh.wait(max(remaining, 1))
+
+    def _wait_for_credentials(self) -> Credentials:
+        """等待后台刷新就绪,刷新失败时按环境报错或重新授权"""
+        self._refresh_ready.wait()
+
+        if self._refresh_error is not None:
+            # 如果刷新失败且在服务器环境，抛出错误
+            if self._is_server_env():
+                raise RuntimeError(
+                    "Gmail token 刷新失败。请在本地重新授权:\n"
+                    "1. 在本地执行: uv run python -c \"from src.gmail.client import GmailClient; GmailClient()\"\n"
+                    "2. 完成浏览器授权\n"
+                    "3. 上传新的 credentials/token.pickle 到服务器"
+                ) from self._refresh_error
+
+            self._creds = self._run_oauth_flow()
+            self._refresh_error = None
+            self._start_refresh_thread()
+
+        return self._creds
+
+    def _build_service(self, creds: Credentials):
+        """
+        构建 Gmail API 服务
 
-                # 打印 token 信息供 Render 部署使用
-                self._print_token_for_deployment(creds)
+        优先使用随 google-api-python-client 发布的静态 discovery 文档;
+        不可用时使用磁盘缓存的文档 (首次下载后缓存),不再每次启动都拉取
+        """
+        # 延迟导入: googleapiclient.discovery 本身的导入耗时明显
+        from googleapiclient.discovery import build, build_from_document
 
-        # 构建 Gmail API 服务
         # 注意：代理通过环境变量 HTTP_PROXY/HTTPS_PROXY 配置
         # Google API 客户端会自动读取这些环境变量
-        self.service = build('gmail', 'v1', credentials=creds)
-        logger.info("Gmail API 客户端初始化成功")
+        try:
+            return build(
+                'gmail', 'v1',
+                credentials=creds,
+                static_discovery=True,
+                cache_discovery=False
+            )
+        except Exception as e:
+            logger.warning(f"静态 discovery 文档不可用: {e},使用本地缓存")
+
+        return build_from_document(self._load_discovery_document(), credentials=creds)
+
+    @staticmethod
+    def _load_discovery_document() -> str:
+        """读取磁盘缓存的 discovery 文档,不存在时下载并缓存"""
+        if DISCOVERY_CACHE_PATH.exists():
+            return DISCOVERY_CACHE_PATH.read_text(encoding='utf-8')
+
+        import requests
+
+        logger.info(f"下载 Gmail discovery 文档: {DISCOVERY_URL}")
+        response = requests.get(DISCOVERY_URL, timeout=30)
+        response.raise_for_status()
+        DISCOVERY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        DISCOVERY_CACHE_PATH.write_text(response.text, encoding='utf-8')
+        return response.text
+
+    def close(self) -> None:
+        """停止后台令牌刷新"""
+        self._stop_refresh.set()
 
     def _print_token_for_deployment(self, creds: Credentials) -> None:
         """
@@ -215,18 +371,252 @@ class GmailClient(EmailClient):
             results = self.service.users().messages().list(
                 userId='me',
                 q=query,
-                maxResults=max_results
+                maxResults=max_results,
+                fields=LIST_FIELDS
             ).execute()
             
             messages = results.get('messages', [])
             logger.info(f"找到 {len(messages)} 封邮件")
-            
-            return messages
+
+            if not messages:
+                return []
+
+            # 一次 batch 往返获取所有邮件的元数据
+            metadata = self._batch_get_metadata([m['id'] for m in messages])
+            return [metadata.get(m['id'], m) for m in messages]
         
         except HttpError as error:
             logger.error(f"Gmail API 错误: {error}")
             raise
+
+    def search_emails_between(
+        self,
+        sender: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按日期范围搜索来自指定发件人的邮件 (用于历史回填)
+
+        使用 after:/before: 时间戳查询并翻页获取全部结果
+
+        Args:
+            sender: 发件人邮箱地址
+            since: 起始时间 (含),None 表示不限制
+            until: 结束时间 (不含),None 表示不限制
+
+        Returns:
+            邮件列表 (按日期从旧到新)
+        """
+        query = f"from:{sender}"
+        if since:
+            query += f" after:{int(since.timestamp())}"
+        if until:
+            query += f" before:{int(until.timestamp())}"
+        logger.info(f"搜索邮件: {query}")
+
+        try:
+            message_ids = []
+            page_token = None
+            while True:
+                results = self.service.users().messages().list(
+                    userId='me',
+                    q=query,
+                    maxResults=500,
+                    pageToken=page_token,
+                    fields=LIST_FIELDS
+                ).execute()
+                message_ids.extend(m['id'] for m in results.get('messages', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as error:
+            logger.error(f"Gmail API 错误: {error}")
+            raise
+
+        logger.info(f"找到 {len(message_ids)} 封邮件")
+        if not message_ids:
+            return []
+
+        metadata = self._batch_get_metadata(message_ids)
+        messages = [metadata.get(message_id, {'id': message_id}) for message_id in message_ids]
+        return sorted(messages, key=lambda m: m.get('internalDate', 0))
+
+    def _batch_get_metadata(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        通过 batch 请求获取多封邮件的元数据
+
+        只请求 Subject/From/Date 头部 (format='metadata' + fields 掩码),
+        不下载正文
+
+        Args:
+            message_ids: 邮件 ID 列表
+
+        Returns:
+            {邮件 ID: 元数据} 字典,获取失败的邮件不在其中
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"获取邮件 {request_id} 元数据失败: {exception}")
+                return
+            results[request_id] = self._summarize_metadata(response)
+
+        for start in range(0, len(message_ids), BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=_callback)
+            for message_id in message_ids[start:start + BATCH_SIZE]:
+                batch.add(
+                    self.service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='metadata',
+                        metadataHeaders=METADATA_HEADERS,
+                        fields=METADATA_FIELDS
+                    ),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        logger.info(f"批量获取元数据: {len(results)}/{len(message_ids)} 封")
+        return results
+
+    @staticmethod
+    def _summarize_metadata(message: Dict[str, Any]) -> Dict[str, Any]:
+        """将 metadata 响应整理为与 IMAP 客户端一致的摘要格式"""
+        headers = {
+            h['name'].lower(): h['value']
+            for h in message.get('payload', {}).get('headers', [])
+        }
+        return {
+            'id': message['id'],
+            'threadId': message.get('threadId'),
+            'internalDate': int(message.get('internalDate', 0)),
+            'subject': headers.get('subject', ''),
+            'from': headers.get('from', ''),
+            'date': headers.get('date', ''),
+            'snippet': message.get('snippet', '')
+        }
     
+    def sync_new_messages(
+        self,
+        sender: str,
+        database: "Database",
+        max_results: int = 10,
+        days_back: int = 7,
+        commit: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        增量同步: 只返回上次同步之后新到达的、来自指定发件人的邮件
+
+        从数据库中保存的 historyId 开始调用 users.history.list;
+        首次同步或 history 已过期 (404) 时回退到完整查询。
+        新的 historyId 只有在所有新邮件的元数据都获取成功时才会写回,
+        否则下次同步从原来的 historyId 重新开始,不会漏掉获取失败的邮件。
+
+        Args:
+            sender: 发件人邮箱地址
+            database: 用于保存 historyId 的数据库
+            max_results: 回退到完整查询时的最大返回数量
+            days_back: 回退到完整查询时搜索最近几天的邮件
+            commit: 为 False 时不写回 historyId,调用方处理完新邮件后调用 commit_sync;
+                处理失败时不调用,下次同步会再次返回这些邮件
+
+        Returns:
+            新邮件的元数据列表 (格式同 search_emails)
+        """
+        start_history_id = database.get_sync_state(HISTORY_STATE_KEY)
+
+        if start_history_id:
+            try:
+                message_ids, latest_history_id = self._list_history(start_history_id)
+            except HttpError as error:
+                if error.resp.status != 404:
+                    logger.error(f"Gmail history 查询失败: {error}")
+                    raise
+                logger.warning(f"historyId {start_history_id} 已过期,回退到完整查询")
+                messages, latest_history_id = self._full_sync(sender, max_results, days_back)
+            else:
+                messages = []
+                if message_ids:
+                    metadata = self._batch_get_metadata(message_ids)
+                    if len(metadata) < len(message_ids):
+                        logger.warning(f"{len(message_ids) - len(metadata)} 封邮件的元数据获取失败,"
+                                       f"保留 historyId {start_history_id},下次同步重试")
+                        latest_history_id = None
+                    messages = [
+                        metadata[message_id] for message_id in message_ids
+                        if message_id in metadata
+                        and sender.lower() in metadata[message_id].get('from', '').lower()
+                    ]
+                logger.info(f"增量同步: {len(message_ids)} 封新邮件,其中 {len(messages)} 封来自 {sender}")
+        else:
+            logger.info("没有保存的 historyId,执行完整查询")
+            messages, latest_history_id = self._full_sync(sender, max_results, days_back)
+
+        self._pending_history_id = latest_history_id
+        if commit:
+            self.commit_sync(database)
+        return messages
+
+    def commit_sync(self, database: "Database") -> None:
+        """
+        写回最近一次 sync_new_messages 得到的 historyId (新邮件处理完成后调用)
+
+        元数据获取不完整的同步没有可写回的 historyId,此时什么也不做
+
+        Args:
+            database: 用于保存 historyId 的数据库
+        """
+        history_id, self._pending_history_id = self._pending_history_id, None
+        if history_id is not None:
+            database.set_sync_state(HISTORY_STATE_KEY, history_id)
+
+    def _full_sync(self, sender: str, max_results: int, days_back: int) -> tuple[List[Dict[str, Any]], str]:
+        """完整查询,返回 (邮件列表, 当前 historyId) ,historyId 作为下次增量同步的起点"""
+        # 先取 historyId 再查询,避免两者之间到达的邮件被漏掉
+        profile = self.service.users().getProfile(userId='me', fields='historyId').execute()
+        messages = self.search_emails(sender, max_results=max_results, days_back=days_back)
+        return messages, str(profile['historyId'])
+
+    def _list_history(self, start_history_id: str) -> tuple[List[str], str]:
+        """
+        列出 start_history_id 之后新增的邮件
+
+        Args:
+            start_history_id: 起始 historyId
+
+        Returns:
+            (按到达顺序去重的邮件 ID 列表, 最新 historyId)
+        """
+        message_ids: List[str] = []
+        seen = set()
+        latest_history_id = start_history_id
+        page_token = None
+
+        while True:
+            response = self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                pageToken=page_token,
+                fields=HISTORY_FIELDS
+            ).execute()
+
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added['message']['id']
+                    if message_id not in seen:
+                        seen.add(message_id)
+                        message_ids.append(message_id)
+
+            latest_history_id = str(response.get('historyId', latest_history_id))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        return message_ids, latest_history_id
+
     def get_email_content(self, message_id: str) -> Dict[str, Any]:
         """
         获取邮件完整内容
@@ -243,7 +633,8 @@ class GmailClient(EmailClient):
             message = self.service.users().messages().get(
                 userId='me',
                 id=message_id,
-                format='full'
+                format='full',
+                fields=FULL_FIELDS
             ).execute()
             
             return message
@@ -267,14 +658,17 @@ class GmailClient(EmailClient):
         Returns:
             最新邮件的完整内容，如果没有则返回 None
         """
-        messages = self.search_emails(sender, max_results=1, days_back=days_back)
+        # 多取几封候选,元数据在一次 batch 往返中获取,用于按日期挑选
+        messages = self.search_emails(sender, max_results=5, days_back=days_back)
         
         if not messages:
             logger.warning(f"未找到来自 {sender} 的邮件")
             return None
         
-        message_id = messages[0]['id']
-        return self.get_email_content(message_id)
+        # 按 internalDate 选出最新的一封,只下载这一封的完整内容
+        latest = max(messages, key=lambda m: m.get('internalDate', 0))
+        logger.info(f"找到最新邮件: {latest.get('subject')} ({latest.get('date')})")
+        return self.get_email_content(latest['id'])
     
     def extract_email_data(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
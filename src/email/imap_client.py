@@ -5,17 +5,108 @@ IMAP 邮箱客户端
 
 import imaplib
 import email
-from email.header import decode_header
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import re
-import base64
+import socket
+import ssl
+import threading
+import time
+import zlib
 
 from .base import EmailClient
+from .mime_utils import (
+    decode_header_value,
+    message_to_gmail_format,
+    extract_email_data,
+    extract_html_from_payload
+)
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# imaplib 默认不认识 COMPRESS 命令 (RFC 4978),需要登记其允许的状态
+imaplib.Commands.setdefault('COMPRESS', ('AUTH', 'SELECTED'))
+
+# 视为连接已断开、需要重连的异常
+_CONNECTION_ERRORS = (imaplib.IMAP4.abort, socket.timeout, ssl.SSLError, OSError)
+
+
+class _DeflateMixin:
+    """为 imaplib 连接增加 COMPRESS=DEFLATE 支持"""
+
+    _compressor = None
+    _decompressor = None
+
+    def enable_compression(self) -> bool:
+        """
+        协商 COMPRESS=DEFLATE,服务器不支持时返回 False
+
+        必须在登录之后、发送下一条命令之前调用
+        """
+        typ, data = self.capability()
+        capabilities = data[0].decode('ascii', errors='ignore').upper().split() if data and data[0] else []
+        if 'COMPRESS=DEFLATE' not in capabilities:
+            return False
+
+        typ, _ = self._simple_command('COMPRESS', 'DEFLATE')
+        if typ != 'OK':
+            return False
+
+        # RFC 4978 要求使用不带 zlib 头的原始 deflate 流
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        self._inbuf = bytearray()
+        return True
+
+    def _fill_buffer(self) -> None:
+        """从 socket 读取并解压数据,直到得到至少一个字节"""
+        while True:
+            data = self.sock.recv(65536)
+            if not data:
+                raise self.abort('socket error: EOF')
+            chunk = self._decompressor.decompress(data)
+            if chunk:
+                self._inbuf += chunk
+                return
+
+    def read(self, size):
+        if self._decompressor is None:
+            return super().read(size)
+        while len(self._inbuf) < size:
+            self._fill_buffer()
+        data = bytes(self._inbuf[:size])
+        del self._inbuf[:size]
+        return data
+
+    def readline(self):
+        if self._decompressor is None:
+            return super().readline()
+        while True:
+            pos = self._inbuf.find(b'\n')
+            if pos >= 0:
+                break
+            if len(self._inbuf) > imaplib._MAXLINE:
+                raise self.error("got more than %d bytes" % imaplib._MAXLINE)
+            self._fill_buffer()
+        line = bytes(self._inbuf[:pos + 1])
+        del self._inbuf[:pos + 1]
+        return line
+
+    def send(self, data):
+        if self._compressor is None:
+            return super().send(data)
+        payload = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.sock.sendall(payload)
+
+
+class _IMAP4(_DeflateMixin, imaplib.IMAP4):
+    """支持压缩的 IMAP4 连接"""
+
+
+class _IMAP4_SSL(_DeflateMixin, imaplib.IMAP4_SSL):
+    """支持压缩的 IMAP4_SSL 连接"""
+
 
 class IMAPClient(EmailClient):
     """IMAP 邮箱客户端 (支持 QQ/163/Gmail IMAP)"""
@@ -27,7 +118,10 @@ class IMAPClient(EmailClient):
         password: str,
         port: int = 993,
         use_ssl: bool = True,
-        folder: str = "INBOX"
+        folder: str = "INBOX",
+        timeout: float = 30,
+        compress: bool = True,
+        keepalive_interval: int = 600
     ):
         """
         初始化 IMAP 客户端
@@ -39,6 +133,9 @@ class IMAPClient(EmailClient):
             port: IMAP 端口 (默认 993)
             use_ssl: 是否使用 SSL (默认 True)
             folder: 邮箱文件夹 (默认 INBOX)
+            timeout: socket 超时秒数
+            compress: 服务器支持时是否启用 COMPRESS=DEFLATE
+            keepalive_interval: 空闲超过该秒数后,下次使用前先发送 NOOP 探活
         """
         self.server = server
         self.username = username
@@ -46,7 +143,13 @@ class IMAPClient(EmailClient):
         self.port = port
         self.use_ssl = use_ssl
         self.folder = folder
+        self.timeout = timeout
+        self.compress = compress
+        self.keepalive_interval = keepalive_interval
         self.mail = None
+        self._last_used = 0.0
+        # 调度器的保活任务和工作流可能在不同线程中使用同一连接
+        self._lock = threading.RLock()
         
         logger.info(f"初始化 IMAP 客户端: {server}:{port}")
         self._connect()
@@ -55,42 +158,120 @@ class IMAPClient(EmailClient):
         """连接到 IMAP 服务器"""
         try:
             if self.use_ssl:
-                self.mail = imaplib.IMAP4_SSL(self.server, self.port)
+                self.mail = _IMAP4_SSL(self.server, self.port, timeout=self.timeout)
             else:
-                self.mail = imaplib.IMAP4(self.server, self.port)
+                self.mail = _IMAP4(self.server, self.port, timeout=self.timeout)
             
             logger.info(f"连接到 IMAP 服务器: {self.server}")
             self.mail.login(self.username, self.password)
             logger.info("IMAP 登录成功")
+
+            if self.compress:
+                if self.mail.enable_compression():
+                    logger.info("已启用 COMPRESS=DEFLATE 压缩")
+                else:
+                    logger.info("服务器不支持 COMPRESS=DEFLATE,使用未压缩连接")
             
             self.mail.select(self.folder)
             logger.info(f"选择邮箱文件夹: {self.folder}")
+            self._last_used = time.monotonic()
             
         except Exception as e:
             logger.error(f"IMAP 连接失败: {e}")
             raise
+
+    def _reconnect(self) -> None:
+        """丢弃旧连接并重新登录"""
+        logger.info("重新建立 IMAP 连接")
+        self._disconnect()
+        self._connect()
+
+    def _disconnect(self) -> None:
+        """关闭当前连接,忽略已断开连接上的错误"""
+        if not self.mail:
+            return
+        try:
+            if self.mail.state == 'SELECTED':
+                self.mail.close()
+            self.mail.logout()
+        except Exception:
+            try:
+                self.mail.shutdown()
+            except Exception:
+                pass
+        finally:
+            self.mail = None
+
+    def _execute(self, command: str, *args):
+        """
+        在当前连接上执行 IMAP 命令
+
+        连接空闲过久时先用 NOOP 探活;遇到 abort/超时等连接错误时
+        自动重连并重试一次
+
+        Args:
+            command: imaplib 方法名 (如 search, fetch)
+            *args: 命令参数
+
+        Returns:
+            imaplib 命令的返回值
+        """
+        with self._lock:
+            if self.mail is not None and time.monotonic() - self._last_used > self.keepalive_interval:
+                self.keepalive()
+            if self.mail is None:
+                self._connect()
+
+            try:
+                result = getattr(self.mail, command)(*args)
+            except _CONNECTION_ERRORS as e:
+                logger.warning(f"IMAP 连接中断 ({command}): {e},正在重连")
+                self._reconnect()
+                result = getattr(self.mail, command)(*args)
+
+            self._last_used = time.monotonic()
+            return result
+
+    def keepalive(self) -> bool:
+        """
+        发送 NOOP 保持会话活跃,连接已失效时自动重连
+
+        Returns:
+            连接是否可用
+        """
+        with self._lock:
+            try:
+                if self.mail is None:
+                    self._connect()
+                else:
+                    self.mail.noop()
+                self._last_used = time.monotonic()
+                return True
+            except _CONNECTION_ERRORS as e:
+                logger.warning(f"IMAP NOOP 失败: {e},正在重连")
+            try:
+                self._reconnect()
+                return True
+            except Exception as e:
+                logger.error(f"IMAP 重连失败: {e}")
+                return False
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            if self.mail:
+                self._disconnect()
+                logger.info("IMAP 连接已关闭")
+
+    def __enter__(self) -> "IMAPClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
     
     def _decode_header(self, header_value: str) -> str:
         """解码邮件头部"""
-        if not header_value:
-            return ""
-        
-        decoded_parts = decode_header(header_value)
-        result = []
-        
-        for part, encoding in decoded_parts:
-            if isinstance(part, bytes):
-                if encoding:
-                    try:
-                        result.append(part.decode(encoding))
-                    except:
-                        result.append(part.decode('utf-8', errors='ignore'))
-                else:
-                    result.append(part.decode('utf-8', errors='ignore'))
-            else:
-                result.append(str(part))
-        
-        return ''.join(result)
+        return decode_header_value(header_value)
     
     def _parse_email_address(self, address: str) -> str:
         """从邮件地址字符串中提取纯邮箱地址"""
@@ -125,7 +306,7 @@ class IMAPClient(EmailClient):
             logger.info(f"搜索邮件: {search_criteria}")
             
             # 搜索邮件
-            status, messages = self.mail.search(None, search_criteria)
+            status, messages = self._execute('search', None, search_criteria)
             
             if status != 'OK':
                 logger.warning(f"搜索邮件失败: {status}")
@@ -148,7 +329,7 @@ class IMAPClient(EmailClient):
             for email_id in email_ids:
                 try:
                     # 获取邮件头部信息
-                    status, msg_data = self.mail.fetch(email_id, '(BODY[HEADER.FIELDS (SUBJECT FROM DATE)])')
+                    status, msg_data = self._execute('fetch', email_id, '(BODY[HEADER.FIELDS (SUBJECT FROM DATE)])')
                     if status == 'OK' and msg_data and msg_data[0]:
                         msg = email.message_from_bytes(msg_data[0][1])
 
@@ -176,6 +357,58 @@ class IMAPClient(EmailClient):
             logger.error(f"搜索邮件失败: {e}")
             raise
     
+    def search_emails_between(
+        self,
+        sender: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按日期范围搜索来自指定发件人的邮件 (用于历史回填)
+
+        IMAP 的 SINCE/BEFORE 只精确到日期,按天过滤
+
+        Args:
+            sender: 发件人邮箱地址
+            since: 起始时间 (含),None 表示不限制
+            until: 结束时间 (不含),None 表示不限制
+
+        Returns:
+            邮件列表 (按邮箱中的顺序,即从旧到新)
+        """
+        criteria = [f'FROM "{sender}"']
+        if since:
+            criteria.append(f"SINCE {since.strftime('%d-%b-%Y')}")
+        if until:
+            criteria.append(f"BEFORE {until.strftime('%d-%b-%Y')}")
+        search_criteria = f"({' '.join(criteria)})"
+        logger.info(f"搜索邮件: {search_criteria}")
+
+        status, messages = self._execute('search', None, search_criteria)
+        if status != 'OK':
+            logger.warning(f"搜索邮件失败: {status}")
+            return []
+
+        email_ids = messages[0].split()
+        logger.info(f"找到 {len(email_ids)} 封邮件")
+
+        emails = []
+        for email_id in email_ids:
+            entry = {'id': email_id.decode()}
+            try:
+                status, msg_data = self._execute('fetch', email_id, '(BODY[HEADER.FIELDS (SUBJECT FROM DATE)])')
+                if status == 'OK' and msg_data and msg_data[0]:
+                    msg = email.message_from_bytes(msg_data[0][1])
+                    entry.update({
+                        'subject': self._decode_header(msg.get('Subject', '')),
+                        'from': self._decode_header(msg.get('From', '')),
+                        'date': msg.get('Date', '')
+                    })
+            except Exception as e:
+                logger.warning(f"获取邮件 {email_id} 元数据失败: {e}")
+            emails.append(entry)
+        return emails
+
     def get_email_content(self, message_id: str) -> Dict[str, Any]:
         """
         获取邮件完整内容
@@ -190,7 +423,7 @@ class IMAPClient(EmailClient):
             logger.info(f"获取邮件内容: {message_id}")
             
             # 获取邮件数据
-            status, msg_data = self.mail.fetch(message_id, '(RFC822)')
+            status, msg_data = self._execute('fetch', message_id, '(RFC822)')
             
             if status != 'OK':
                 logger.error(f"获取邮件失败: {status}")
@@ -200,83 +433,11 @@ class IMAPClient(EmailClient):
             email_body = msg_data[0][1]
             email_message = email.message_from_bytes(email_body)
             
-            # 提取邮件头部信息
-            subject = self._decode_header(email_message.get('Subject', ''))
-            from_addr = self._decode_header(email_message.get('From', ''))
-            date_str = email_message.get('Date', '')
-            
-            logger.info(f"邮件主题: {subject}")
-            logger.info(f"发件人: {from_addr}")
-            
-            # 提取邮件正文
-            html_content = None
-            text_content = None
-            
-            if email_message.is_multipart():
-                for part in email_message.walk():
-                    content_type = part.get_content_type()
-                    
-                    if content_type == 'text/html':
-                        try:
-                            html_content = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                        except:
-                            pass
-                    elif content_type == 'text/plain':
-                        try:
-                            text_content = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                        except:
-                            pass
-            else:
-                content_type = email_message.get_content_type()
-                payload = email_message.get_payload(decode=True)
-                
-                if payload:
-                    if content_type == 'text/html':
-                        html_content = payload.decode('utf-8', errors='ignore')
-                    elif content_type == 'text/plain':
-                        text_content = payload.decode('utf-8', errors='ignore')
-            
-            # 构建返回数据 (兼容 Gmail API 格式)
-            result = {
-                'id': message_id,
-                'payload': {
-                    'headers': [
-                        {'name': 'Subject', 'value': subject},
-                        {'name': 'From', 'value': from_addr},
-                        {'name': 'Date', 'value': date_str}
-                    ],
-                    'parts': []
-                }
-            }
-            
-            # 添加邮件正文部分 (编码为 base64,兼容 Gmail API 格式)
-            if html_content:
-                # 将 HTML 内容编码为 base64 (兼容 Gmail API)
-                html_base64 = base64.urlsafe_b64encode(html_content.encode('utf-8')).decode('ascii')
-                result['payload']['parts'].append({
-                    'mimeType': 'text/html',
-                    'body': {
-                        'data': html_base64
-                    }
-                })
-
-            if text_content:
-                # 将文本内容编码为 base64 (兼容 Gmail API)
-                text_base64 = base64.urlsafe_b64encode(text_content.encode('utf-8')).decode('ascii')
-                result['payload']['parts'].append({
-                    'mimeType': 'text/plain',
-                    'body': {
-                        'data': text_base64
-                    }
-                })
-
-            # 如果没有 parts,直接放在 body 中
-            if not result['payload']['parts'] and html_content:
-                html_base64 = base64.urlsafe_b64encode(html_content.encode('utf-8')).decode('ascii')
-                result['payload']['body'] = {
-                    'data': html_base64
-                }
-                result['payload']['mimeType'] = 'text/html'
+            result = message_to_gmail_format(message_id, email_message)
+
+            headers = {h['name']: h['value'] for h in result['payload']['headers']}
+            logger.info(f"邮件主题: {headers['Subject']}")
+            logger.info(f"发件人: {headers['From']}")
             
             return result
         
@@ -342,31 +503,7 @@ class IMAPClient(EmailClient):
         Returns:
             提取的邮件数据 (Gmail API 兼容格式)
         """
-        headers = message['payload']['headers']
-
-        # 提取邮件头信息
-        subject = next(
-            (h['value'] for h in headers if h['name'].lower() == 'subject'),
-            'No Subject'
-        )
-        sender = next(
-            (h['value'] for h in headers if h['name'].lower() == 'from'),
-            'Unknown'
-        )
-        date_str = next(
-            (h['value'] for h in headers if h['name'].lower() == 'date'),
-            ''
-        )
-
-        return {
-            'id': message['id'],
-            'thread_id': message.get('threadId', message['id']),  # IMAP 没有 threadId,用 id 代替
-            'subject': subject,
-            'sender': sender,
-            'date': date_str,
-            'snippet': message.get('snippet', ''),
-            'payload': message['payload']
-        }
+        return extract_email_data(message)
 
     def get_email_html(self, message_id: str) -> Optional[str]:
         """
@@ -380,30 +517,10 @@ class IMAPClient(EmailClient):
         """
         try:
             message = self.get_email_content(message_id)
-            payload = message.get('payload', {})
-
             # IMAP 返回的内容是 base64 编码的,需要解码 (兼容 Gmail API)
-            parts = payload.get('parts', [])
-
-            # 优先查找 text/html 部分
-            for part in parts:
-                if part.get('mimeType') == 'text/html':
-                    body = part.get('body', {})
-                    html_base64 = body.get('data', '')
-                    if html_base64:
-                        # 解码 base64
-                        html_content = base64.urlsafe_b64decode(html_base64).decode('utf-8')
-                        return html_content
-
-            # 如果没有 parts,检查 body
-            if not parts:
-                body = payload.get('body', {})
-                if payload.get('mimeType') == 'text/html':
-                    html_base64 = body.get('data', '')
-                    if html_base64:
-                        # 解码 base64
-                        html_content = base64.urlsafe_b64decode(html_base64).decode('utf-8')
-                        return html_content
+            html_content = extract_html_from_payload(message.get('payload', {}))
+            if html_content:
+                return html_content
 
             logger.warning("未找到 HTML 内容")
             return None
@@ -415,10 +532,7 @@ class IMAPClient(EmailClient):
     def __del__(self):
         """析构函数,关闭连接"""
         try:
-            if self.mail:
-                self.mail.close()
-                self.mail.logout()
-                logger.info("IMAP 连接已关闭")
+            self.close()
         except:
             pass
 
@@ -0,0 +1,330 @@
+"""
+本地邮件源客户端
+从 .eml 文件、mbox 归档或 Maildir 目录读取邮件,用于离线回放、基准测试和历史回填
+"""
+
+import email
+import mailbox
+import mmap
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+from .base import EmailClient
+from .mime_utils import (
+    decode_header_value,
+    message_to_gmail_format,
+    extract_email_data,
+    extract_html_from_payload
+)
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LocalMailClient(EmailClient):
+    """
+    本地邮件源客户端
+
+    支持的来源 (根据路径自动识别):
+    - 单个 .eml 文件
+    - 包含 .eml 文件的目录 (递归)
+    - Maildir 目录 (包含 cur/new/tmp)
+    - mbox 归档文件: 通过 mmap 扫描建立偏移索引,按需读取单封邮件,
+      不会把整个归档载入内存
+    """
+
+    def __init__(self, path: str, honor_days_back: bool = False):
+        """
+        初始化本地邮件源
+
+        Args:
+            path: .eml 文件、.eml 目录、Maildir 目录或 mbox 文件路径
+            honor_days_back: 是否按 days_back 过滤;本地归档通常是历史邮件,
+                默认忽略,使回放时 get_latest_email 返回归档中最新的一封
+        """
+        self.path = Path(path)
+        self.honor_days_back = honor_days_back
+        if not self.path.exists():
+            raise FileNotFoundError(f"本地邮件源不存在: {path}")
+
+        self.source_type = self._detect_source_type()
+        self._file = None
+        self._mmap = None
+        self._maildir = None
+        # 邮件 ID -> 定位信息 (mbox 偏移 / 文件路径 / Maildir key)
+        self._locations: Dict[str, Any] = {}
+        # 邮件 ID -> 头部元数据
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+        self._build_index()
+        logger.info(f"本地邮件源: {self.path} ({self.source_type}), 共 {len(self._metadata)} 封邮件")
+
+    def _detect_source_type(self) -> str:
+        """识别来源类型"""
+        if self.path.is_dir():
+            if all((self.path / sub).is_dir() for sub in ('cur', 'new', 'tmp')):
+                return 'maildir'
+            return 'eml_dir'
+        if self.path.suffix.lower() == '.eml':
+            return 'eml'
+        return 'mbox'
+
+    def _build_index(self) -> None:
+        """建立邮件索引并解析头部元数据"""
+        if self.source_type == 'mbox':
+            self._index_mbox()
+        elif self.source_type == 'maildir':
+            self._maildir = mailbox.Maildir(str(self.path), factory=None, create=False)
+            for key in self._maildir.iterkeys():
+                with self._maildir.get_file(key) as f:
+                    self._add_entry(key, key, self._read_header_block(f))
+        else:
+            files = [self.path] if self.source_type == 'eml' else sorted(self.path.rglob('*.eml'))
+            for file_path in files:
+                message_id = file_path.name if self.source_type == 'eml' else str(file_path.relative_to(self.path))
+                with open(file_path, 'rb') as f:
+                    self._add_entry(message_id, file_path, self._read_header_block(f))
+
+    def _index_mbox(self) -> None:
+        """
+        用 mmap 扫描 mbox,记录每封邮件的字节偏移
+
+        mbox 中每封邮件以行首的 "From " 分隔行开始
+        """
+        self._file = open(self.path, 'rb')
+        if self.path.stat().st_size == 0:
+            return
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        size = len(mm)
+
+        starts = []
+        pos = 0 if mm[:5] == b'From ' else mm.find(b'\nFrom ')
+        while pos != -1:
+            if mm[pos:pos + 1] == b'\n':
+                pos += 1
+            starts.append(pos)
+            pos = mm.find(b'\nFrom ', pos)
+
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < len(starts) else size
+            # 跳过 "From " 分隔行本身
+            body_start = mm.find(b'\n', start, end) + 1
+            if body_start <= 0:
+                continue
+
+            header_end = self._find_header_end(mm, body_start, end)
+            self._add_entry(str(index), (body_start, end), mm[body_start:header_end])
+
+    @staticmethod
+    def _find_header_end(buffer, start: int, end: int) -> int:
+        """查找头部与正文之间空行的位置"""
+        candidates = [
+            pos for pos in (buffer.find(b'\n\n', start, end), buffer.find(b'\r\n\r\n', start, end))
+            if pos != -1
+        ]
+        return min(candidates) if candidates else end
+
+    @staticmethod
+    def _read_header_block(f) -> bytes:
+        """从文件对象中只读取头部 (到第一个空行为止)"""
+        lines = []
+        for line in f:
+            if line in (b'\n', b'\r\n'):
+                break
+            lines.append(line)
+        return b''.join(lines)
+
+    def _add_entry(self, message_id: str, location: Any, header_block: bytes) -> None:
+        """解析头部并登记邮件"""
+        headers = BytesHeaderParser().parsebytes(header_block)
+        date_str = headers.get('Date', '')
+
+        timestamp = None
+        if date_str:
+            try:
+                timestamp = parsedate_to_datetime(date_str)
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+            except Exception:
+                logger.warning(f"解析日期失败: {date_str}")
+
+        self._locations[message_id] = location
+        self._metadata[message_id] = {
+            'id': message_id,
+            'subject': decode_header_value(headers.get('Subject', '')),
+            'from': decode_header_value(headers.get('From', '')),
+            'date': date_str,
+            'timestamp': timestamp
+        }
+
+    def _read_message_bytes(self, message_id: str) -> bytes:
+        """读取单封邮件的原始字节"""
+        if message_id not in self._locations:
+            raise KeyError(f"邮件不存在: {message_id}")
+
+        location = self._locations[message_id]
+        if self.source_type == 'mbox':
+            start, end = location
+            return self._mmap[start:end]
+        if self.source_type == 'maildir':
+            return self._maildir.get_bytes(location)
+        return Path(location).read_bytes()
+
+    def search_emails(
+        self,
+        sender: str,
+        max_results: int = 10,
+        days_back: int = 1
+    ) -> List[Dict[str, Any]]:
+        """
+        搜索来自指定发件人的邮件
+
+        Args:
+            sender: 发件人邮箱地址
+            max_results: 最大返回数量
+            days_back: 搜索最近几天的邮件 (<= 0 或 honor_days_back=False 时不限制)
+
+        Returns:
+            邮件列表 (按日期从旧到新,取最新的 max_results 封)
+        """
+        since = None
+        if days_back > 0 and self.honor_days_back:
+            since = datetime.now(timezone.utc) - timedelta(days=days_back)
+
+        return self.search_emails_between(sender, since=since)[-max_results:]
+
+    def search_emails_between(
+        self,
+        sender: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按日期范围搜索来自指定发件人的邮件 (用于历史回填)
+
+        Args:
+            sender: 发件人邮箱地址
+            since: 起始时间 (含),None 表示不限制
+            until: 结束时间 (不含),None 表示不限制
+
+        Returns:
+            邮件列表 (按日期从旧到新)
+        """
+        sender = sender.lower()
+        results = []
+
+        for metadata in self._metadata.values():
+            if sender not in metadata['from'].lower():
+                continue
+
+            timestamp = metadata['timestamp']
+            if since and (timestamp is None or timestamp < since):
+                continue
+            if until and (timestamp is None or timestamp >= until):
+                continue
+            results.append(metadata)
+
+        results.sort(key=lambda m: m['timestamp'] or datetime.min.replace(tzinfo=timezone.utc))
+        logger.info(f"找到 {len(results)} 封来自 {sender} 的邮件")
+        return [{k: v for k, v in m.items() if k != 'timestamp'} for m in results]
+
+    def get_email_content(self, message_id: str) -> Dict[str, Any]:
+        """
+        获取邮件完整内容
+
+        Args:
+            message_id: 邮件 ID
+
+        Returns:
+            邮件详细信息 (格式兼容 Gmail API)
+        """
+        logger.info(f"获取邮件内容: {message_id}")
+        email_message = email.message_from_bytes(self._read_message_bytes(message_id))
+        return message_to_gmail_format(message_id, email_message)
+
+    def get_latest_email(
+        self,
+        sender: str,
+        days_back: int = 1
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取来自指定发件人的最新邮件
+
+        Args:
+            sender: 发件人邮箱地址
+            days_back: 搜索最近几天的邮件 (<= 0 或 honor_days_back=False 时不限制)
+
+        Returns:
+            最新邮件的完整内容,如果没有则返回 None
+        """
+        messages = self.search_emails(sender, max_results=1, days_back=days_back)
+
+        if not messages:
+            logger.warning(f"未找到来自 {sender} 的邮件")
+            return None
+
+        latest = messages[-1]
+        logger.info(f"找到最新邮件: {latest.get('subject')} ({latest.get('date')})")
+        return self.get_email_content(latest['id'])
+
+    def extract_email_data(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        从邮件对象中提取邮件数据 (兼容 Gmail API 格式)
+
+        Args:
+            message: 邮件对象
+
+        Returns:
+            提取的邮件数据
+        """
+        return extract_email_data(message)
+
+    def get_email_html(self, message_id: str) -> Optional[str]:
+        """
+        获取邮件的 HTML 内容
+
+        Args:
+            message_id: 邮件 ID
+
+        Returns:
+            HTML 内容,如果没有则返回 None
+        """
+        try:
+            message = self.get_email_content(message_id)
+            html_content = extract_html_from_payload(message.get('payload', {}))
+            if html_content:
+                return html_content
+
+            logger.warning("未找到 HTML 内容")
+            return None
+
+        except Exception as e:
+            logger.error(f"获取邮件 HTML 失败: {e}")
+            return None
+
+    def close(self) -> None:
+        """释放 mmap 和文件句柄"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "LocalMailClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __del__(self):
+        """析构函数,释放资源"""
+        try:
+            self.close()
+        except:
+            pass
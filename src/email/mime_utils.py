@@ -0,0 +1,184 @@
+"""
+MIME 邮件工具
+把标准库 email.message 转换为与 Gmail API 兼容的数据格式,
+供 IMAP 客户端和本地邮件源共用
+"""
+
+import base64
+from email.header import decode_header
+from email.message import Message
+from typing import Dict, Any, Optional
+
+
+def decode_header_value(header_value: str) -> str:
+    """解码邮件头部"""
+    if not header_value:
+        return ""
+
+    decoded_parts = decode_header(header_value)
+    result = []
+
+    for part, encoding in decoded_parts:
+        if isinstance(part, bytes):
+            if encoding:
+                try:
+                    result.append(part.decode(encoding))
+                except:
+                    result.append(part.decode('utf-8', errors='ignore'))
+            else:
+                result.append(part.decode('utf-8', errors='ignore'))
+        else:
+            result.append(str(part))
+
+    return ''.join(result)
+
+
+def message_to_gmail_format(message_id: str, email_message: Message) -> Dict[str, Any]:
+    """
+    把 email.message.Message 转换为 Gmail API 兼容格式
+
+    Args:
+        message_id: 邮件 ID
+        email_message: 解析后的邮件
+
+    Returns:
+        邮件详细信息 (正文为 URL-safe base64,兼容 Gmail API)
+    """
+    subject = decode_header_value(email_message.get('Subject', ''))
+    from_addr = decode_header_value(email_message.get('From', ''))
+    date_str = email_message.get('Date', '')
+
+    # 提取邮件正文
+    html_content = None
+    text_content = None
+
+    if email_message.is_multipart():
+        for part in email_message.walk():
+            content_type = part.get_content_type()
+
+            if content_type == 'text/html':
+                try:
+                    html_content = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+                except:
+                    pass
+            elif content_type == 'text/plain':
+                try:
+                    text_content = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+                except:
+                    pass
+    else:
+        content_type = email_message.get_content_type()
+        payload = email_message.get_payload(decode=True)
+
+        if payload:
+            if content_type == 'text/html':
+                html_content = payload.decode('utf-8', errors='ignore')
+            elif content_type == 'text/plain':
+                text_content = payload.decode('utf-8', errors='ignore')
+
+    # 构建返回数据 (兼容 Gmail API 格式)
+    result = {
+        'id': message_id,
+        'payload': {
+            'headers': [
+                {'name': 'Subject', 'value': subject},
+                {'name': 'From', 'value': from_addr},
+                {'name': 'Date', 'value': date_str}
+            ],
+            'parts': []
+        }
+    }
+
+    # 添加邮件正文部分 (编码为 base64,兼容 Gmail API 格式)
+    if html_content:
+        html_base64 = base64.urlsafe_b64encode(html_content.encode('utf-8')).decode('ascii')
+        result['payload']['parts'].append({
+            'mimeType': 'text/html',
+            'body': {
+                'data': html_base64
+            }
+        })
+
+    if text_content:
+        text_base64 = base64.urlsafe_b64encode(text_content.encode('utf-8')).decode('ascii')
+        result['payload']['parts'].append({
+            'mimeType': 'text/plain',
+            'body': {
+                'data': text_base64
+            }
+        })
+
+    # 如果没有 parts,直接放在 body 中
+    if not result['payload']['parts'] and html_content:
+        html_base64 = base64.urlsafe_b64encode(html_content.encode('utf-8')).decode('ascii')
+        result['payload']['body'] = {
+            'data': html_base64
+        }
+        result['payload']['mimeType'] = 'text/html'
+
+    return result
+
+
+def extract_email_data(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从 Gmail 兼容格式的邮件对象中提取邮件数据
+
+    Args:
+        message: 邮件对象
+
+    Returns:
+        提取的邮件数据
+    """
+    headers = message['payload']['headers']
+
+    # 提取邮件头信息
+    subject = next(
+        (h['value'] for h in headers if h['name'].lower() == 'subject'),
+        'No Subject'
+    )
+    sender = next(
+        (h['value'] for h in headers if h['name'].lower() == 'from'),
+        'Unknown'
+    )
+    date_str = next(
+        (h['value'] for h in headers if h['name'].lower() == 'date'),
+        ''
+    )
+
+    return {
+        'id': message['id'],
+        'thread_id': message.get('threadId', message['id']),  # 非 Gmail 来源没有 threadId,用 id 代替
+        'subject': subject,
+        'sender': sender,
+        'date': date_str,
+        'snippet': message.get('snippet', ''),
+        'payload': message['payload']
+    }
+
+
+def extract_html_from_payload(payload: Dict[str, Any]) -> Optional[str]:
+    """
+    从 Gmail 兼容格式的 payload 中解码 HTML 正文
+
+    Args:
+        payload: 邮件 payload
+
+    Returns:
+        HTML 内容,如果没有则返回 None
+    """
+    parts = payload.get('parts', [])
+
+    # 优先查找 text/html 部分
+    for part in parts:
+        if part.get('mimeType') == 'text/html':
+            html_base64 = part.get('body', {}).get('data', '')
+            if html_base64:
+                return base64.urlsafe_b64decode(html_base64).decode('utf-8')
+
+    # 如果没有 parts,检查 body
+    if not parts and payload.get('mimeType') == 'text/html':
+        html_base64 = payload.get('body', {}).get('data', '')
+        if html_base64:
+            return base64.urlsafe_b64decode(html_base64).decode('utf-8')
+
+    return None
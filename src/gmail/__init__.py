@@ -2,8 +2,18 @@
 Gmail 邮件获取模块
 """
 
-from .client import GmailClient
-from .parser import EmailParser
+from importlib import import_module
 
-__all__ = ["GmailClient", "EmailParser"]
+# 按需导入: 只用到解析器时不必加载 Gmail API 客户端 (googleapiclient)
+_EXPORTS = {
+    "GmailClient": ".client",
+    "EmailParser": ".parser",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -22,6 +22,15 @@ logger = get_logger(__name__)
 # Gmail API 权限范围
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# 筛选邮件时只请求需要的头部和字段 (partial response)
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+LIST_FIELDS = 'messages(id,threadId),nextPageToken'
+METADATA_FIELDS = 'id,threadId,internalDate,snippet,payload/headers'
+FULL_FIELDS = 'id,threadId,internalDate,snippet,payload'
+
+# 单个 batch 请求包含的子请求数 (Gmail 上限 100,官方建议不超过 50)
+BATCH_SIZE = 50
+
 
 def _log_proxy_info() -> None:
     """
@@ -214,17 +223,79 @@ class GmailClient:
             results = self.service.users().messages().list(
                 userId='me',
                 q=query,
-                maxResults=max_results
+                maxResults=max_results,
+                fields=LIST_FIELDS
             ).execute()
             
             messages = results.get('messages', [])
             logger.info(f"找到 {len(messages)} 封邮件")
-            
-            return messages
+
+            if not messages:
+                return []
+
+            # 一次 batch 往返获取所有邮件的元数据
+            metadata = self._batch_get_metadata([m['id'] for m in messages])
+            return [metadata.get(m['id'], m) for m in messages]
         
         except HttpError as error:
             logger.error(f"Gmail API 错误: {error}")
             raise
+
+    def _batch_get_metadata(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        通过 batch 请求获取多封邮件的元数据
+
+        只请求 Subject/From/Date 头部 (format='metadata' + fields 掩码),
+        不下载正文
+
+        Args:
+            message_ids: 邮件 ID 列表
+
+        Returns:
+            {邮件 ID: 元数据} 字典,获取失败的邮件不在其中
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"获取邮件 {request_id} 元数据失败: {exception}")
+                return
+            results[request_id] = self._summarize_metadata(response)
+
+        for start in range(0, len(message_ids), BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=_callback)
+            for message_id in message_ids[start:start + BATCH_SIZE]:
+                batch.add(
+                    self.service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='metadata',
+                        metadataHeaders=METADATA_HEADERS,
+                        fields=METADATA_FIELDS
+                    ),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        logger.info(f"批量获取元数据: {len(results)}/{len(message_ids)} 封")
+        return results
+
+    @staticmethod
+    def _summarize_metadata(message: Dict[str, Any]) -> Dict[str, Any]:
+        """将 metadata 响应整理为与 IMAP 客户端一致的摘要格式"""
+        headers = {
+            h['name'].lower(): h['value']
+            for h in message.get('payload', {}).get('headers', [])
+        }
+        return {
+            'id': message['id'],
+            'threadId': message.get('threadId'),
+            'internalDate': int(message.get('internalDate', 0)),
+            'subject': headers.get('subject', ''),
+            'from': headers.get('from', ''),
+            'date': headers.get('date', ''),
+            'snippet': message.get('snippet', '')
+        }
     
     def get_email_content(self, message_id: str) -> Dict[str, Any]:
         """
@@ -242,7 +313,8 @@ class GmailClient:
             message = self.service.users().messages().get(
                 userId='me',
                 id=message_id,
-                format='full'
+                format='full',
+                fields=FULL_FIELDS
             ).execute()
             
             return message
@@ -266,14 +338,17 @@ class GmailClient:
         Returns:
             最新邮件的完整内容，如果没有则返回 None
         """
-        messages = self.search_emails(sender, max_results=1, days_back=days_back)
+        # 多取几封候选,元数据在一次 batch 往返中获取,用于按日期挑选
+        messages = self.search_emails(sender, max_results=5, days_back=days_back)
         
         if not messages:
             logger.warning(f"未找到来自 {sender} 的邮件")
             return None
         
-        message_id = messages[0]['id']
-        return self.get_email_content(message_id)
+        # 按 internalDate 选出最新的一封,只下载这一封的完整内容
+        latest = max(messages, key=lambda m: m.get('internalDate', 0))
+        logger.info(f"找到最新邮件: {latest.get('subject')} ({latest.get('date')})")
+        return self.get_email_content(latest['id'])
     
     def extract_email_data(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
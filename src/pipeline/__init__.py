@@ -0,0 +1,16 @@
+"""
+流水线模块
+"""
+
+from .engine import Pipeline, Stage, StopPipeline, PipelineError, PipelineResult, failed_result
+from .daily import build_daily_pipeline
+
+__all__ = [
+    "Pipeline",
+    "Stage",
+    "StopPipeline",
+    "PipelineError",
+    "PipelineResult",
+    "failed_result",
+    "build_daily_pipeline"
+]
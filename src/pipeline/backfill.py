@@ -0,0 +1,291 @@
+"""
+历史回填
+按日期范围枚举邮件,逐封 获取 -> 剪切 -> 翻译 -> 格式化 并归档 (不发布到微信)
+
+- 邮件解析、剪切和格式化是 CPU 密集的 BeautifulSoup / html2text 处理,放到进程池执行
+- 翻译在主进程的线程中进行,所有邮件共用同一个 LLM 限速器和翻译记忆
+- 每封邮件处理完成后写入数据库,中断后重跑会跳过已完成的邮件
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..gmail.parser import EmailParser
+from ..translator.html_translator import DegradedPolicy, TranslationReport, translate_html
+from ..translator.memory import TranslationMemory
+from ..translator.rate_limit import RateLimiter, RateLimitedTranslator
+from ..wechat.table_based_converter import TableBasedConverter
+from ..utils.artifacts import ArtifactStore
+from ..utils.logger import get_logger
+from .daily import clean_greeting, extract_title_and_digest, translator_fingerprint
+
+logger = get_logger(__name__)
+
+
+class _OriginalImages:
+    """归档时不上传图片,保留原始地址 (之后发布时再上传到对应账号)"""
+
+    def upload_image(self, image_url: str) -> str:
+        return image_url
+
+
+def _clip_worker(message: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """进程池任务: 解析邮件 HTML 并剪切"""
+    parser = EmailParser()
+    html_content = parser.parse_email(message).get('html')
+    if not html_content:
+        return None
+    return {'html_content': html_content, 'clipped_html': parser.clip_email_html(html_content)}
+
+
+def _convert_worker(translated_html: str) -> Dict[str, str]:
+    """进程池任务: 格式化译文并提取标题和摘要"""
+    formatted_html = TableBasedConverter(publisher=_OriginalImages()).convert(translated_html)
+    title, digest = extract_title_and_digest(formatted_html)
+    return {'formatted_html': formatted_html, 'title': title, 'digest': digest}
+
+
+class BackfillStats:
+    """回填统计"""
+
+    def __init__(self):
+        self.total = 0
+        self.skipped = 0
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def emails_per_minute(self) -> float:
+        """吞吐量 (已处理邮件数 / 分钟,不含跳过的邮件)"""
+        elapsed = self.elapsed_seconds
+        return (self.done + self.failed) * 60 / elapsed if elapsed > 0 else 0.0
+
+
+class Backfill:
+    """历史邮件回填"""
+
+    def __init__(
+        self,
+        email_client,
+        sender_email: str,
+        translator,
+        database,
+        store: Optional[ArtifactStore] = None,
+        output_dir: str = "data/archive",
+        processes: int = 2,
+        email_workers: int = 4,
+        requests_per_minute: float = 300,
+        degraded: Optional[DegradedPolicy] = None,
+        segmentation: str = 'node'
+    ):
+        """
+        初始化回填任务
+
+        Args:
+            email_client: 邮箱客户端 (任意 EmailClient)
+            sender_email: 发件人邮箱地址
+            translator: 翻译器 (需提供 translate 方法)
+            database: Database 实例,记录进度和翻译记忆
+            store: 产物存储 (可选);提供时保存 fetch/clip/translate 产物,并以邮件 ID 为引用名,
+                之后可以从 convert 阶段发布任意一封历史邮件
+            output_dir: 归档目录,每封邮件保存为 <日期>_<邮件 ID>.html
+            processes: 剪切/格式化的进程数 (<= 0 时在当前进程执行)
+            email_workers: 同时处理的邮件数 (翻译并发数)
+            requests_per_minute: 所有邮件共享的 LLM 请求速率上限 (<= 0 表示不限速)
+            degraded: 降级策略 (可选),完成度不足的邮件记为失败,重跑时借助翻译记忆只补译缺失片段
+            segmentation: 翻译单元 ('node' 逐个文本节点 / 'block' 按块翻译)
+        """
+        self.email_client = email_client
+        self.sender_email = sender_email
+        self.database = database
+        self.store = store
+        self.output_dir = Path(output_dir)
+        self.processes = processes
+        self.email_workers = max(1, email_workers)
+        self.degraded = degraded
+        self.segmentation = segmentation
+
+        self.limiter = RateLimiter(requests_per_minute)
+        self.translator = RateLimitedTranslator(translator, self.limiter)
+        self.fingerprint = translator_fingerprint()
+        self.memory = TranslationMemory(database, self.fingerprint)
+
+        # 邮箱客户端 (如 IMAP 连接) 不保证线程安全,获取邮件时串行
+        self._client_lock = threading.Lock()
+        self._pool = None
+
+    def list_pending(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        retry_failed: bool = True
+    ) -> tuple:
+        """
+        枚举日期范围内的邮件,跳过已完成的邮件
+
+        Args:
+            since: 起始时间 (含)
+            until: 结束时间 (不含)
+            retry_failed: 是否重试上次失败的邮件
+
+        Returns:
+            (全部邮件摘要列表, 待处理邮件摘要列表)
+        """
+        messages = self.email_client.search_emails_between(self.sender_email, since=since, until=until)
+        statuses = self.database.get_backfill_statuses()
+        skip = {'done'} if retry_failed else {'done', 'failed'}
+        pending = [m for m in messages if statuses.get(m['id']) not in skip]
+        return messages, pending
+
+    def run(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        retry_failed: bool = True
+    ) -> BackfillStats:
+        """
+        执行回填
+
+        Args:
+            since: 起始时间 (含)
+            until: 结束时间 (不含)
+            limit: 本次最多处理的邮件数
+            retry_failed: 是否重试上次失败的邮件
+
+        Returns:
+            BackfillStats
+        """
+        stats = BackfillStats()
+        messages, pending = self.list_pending(since, until, retry_failed)
+        stats.skipped = len(messages) - len(pending)
+        if limit:
+            pending = pending[:limit]
+        stats.total = len(pending)
+        logger.info(f"📚 回填: 共 {len(messages)} 封邮件,已完成 {stats.skipped} 封,本次处理 {stats.total} 封")
+
+        if self.processes > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        try:
+            with ThreadPoolExecutor(max_workers=self.email_workers) as executor:
+                futures = {executor.submit(self._process, summary): summary for summary in pending}
+                for future in as_completed(futures):
+                    summary = futures[future]
+                    try:
+                        future.result()
+                        stats.done += 1
+                        status = "✅"
+                    except Exception as e:
+                        stats.failed += 1
+                        status = "❌"
+                        logger.error(f"回填失败 {summary['id']}: {e}")
+                    logger.info(
+                        f"[{stats.done + stats.failed}/{stats.total}] {status} {summary.get('subject', summary['id'])} "
+                        f"({stats.emails_per_minute:.1f} 封/分钟)"
+                    )
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            self.memory.flush()
+
+        stats.finished = time.perf_counter()
+        logger.info(
+            f"📚 回填完成: 成功 {stats.done},失败 {stats.failed},跳过 {stats.skipped},"
+            f"用时 {stats.elapsed_seconds:.1f}s,{stats.emails_per_minute:.1f} 封/分钟,"
+            f"翻译记忆命中率 {self.memory.hit_rate:.0%},限速等待 {self.limiter.waited_seconds:.1f}s"
+        )
+        return stats
+
+    def _run_cpu(self, func, *args):
+        """在进程池中执行 CPU 密集任务"""
+        if self._pool is None:
+            return func(*args)
+        return self._pool.submit(func, *args).result()
+
+    def _process(self, summary: Dict[str, Any]) -> str:
+        """处理单封邮件,返回归档文件路径"""
+        started = time.perf_counter()
+        email_id = summary['id']
+        subject = summary.get('subject')
+        date = summary.get('date')
+
+        try:
+            with self._client_lock:
+                message = self.email_client.get_email_content(email_id)
+                email_data = self.email_client.extract_email_data(message)
+            subject, date = email_data['subject'], email_data['date']
+
+            clipped = self._run_cpu(_clip_worker, message)
+            if clipped is None:
+                raise ValueError("邮件内容为空")
+
+            report = TranslationReport(self.degraded) if self.degraded is not None else None
+            translated_html = translate_html(
+                clean_greeting(clipped['clipped_html']), self.translator, self.memory, report, self.segmentation
+            )
+            if report is not None:
+                report.check()
+
+            archived = self._run_cpu(_convert_worker, translated_html)
+            output_path = self._write_archive(email_id, date, archived['formatted_html'])
+
+            if self.store is not None and (report is None or report.complete):
+                self._save_artifacts(message, email_data, clipped, translated_html)
+        except Exception as e:
+            self.database.save_backfill_item(
+                email_id, 'failed', subject=subject, received_date=date, error_message=str(e),
+                duration_seconds=int(time.perf_counter() - started)
+            )
+            raise
+
+        self.database.save_backfill_item(
+            email_id, 'done', subject=subject, received_date=date, output_path=output_path,
+            duration_seconds=int(time.perf_counter() - started)
+        )
+        return output_path
+
+    def _write_archive(self, email_id: str, date: Optional[str], formatted_html: str) -> str:
+        """保存归档文件"""
+        try:
+            day = parsedate_to_datetime(date).strftime('%Y-%m-%d')
+        except (TypeError, ValueError):
+            day = 'unknown'
+        safe_id = re.sub(r'[^\w.-]', '_', email_id)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{day}_{safe_id}.html"
+        path.write_text(formatted_html, encoding='utf-8')
+        return str(path)
+
+    def _save_artifacts(
+        self,
+        message: Dict[str, Any],
+        email_data: Dict[str, Any],
+        clipped: Dict[str, str],
+        translated_html: str
+    ) -> None:
+        """按每日流水线的产物键保存,并以邮件 ID 为引用名 (被引用的产物不会被清理)"""
+        email_id = email_data['id']
+        artifacts: List[tuple] = [
+            ('fetch', self.store.make_key('fetch', email_id),
+             {'message': message, 'email_data': email_data, 'html_content': clipped['html_content']}),
+            ('clip', self.store.make_key('clip', clipped['html_content']), clipped['clipped_html']),
+            ('translate', self.store.make_key('translate', clipped['clipped_html'], self.fingerprint),
+             translated_html),
+        ]
+        for stage, key, value in artifacts:
+            self.store.put(stage, key, value)
+            self.store.set_ref(email_id, stage, key)
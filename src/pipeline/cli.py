@@ -0,0 +1,303 @@
+"""
+分阶段执行每日工作流
+
+用法:
+    python -m src.pipeline.cli fetch                # 获取最新邮件
+    python -m src.pipeline.cli clip                 # 剪切 (使用已缓存的邮件)
+    python -m src.pipeline.cli translate            # 翻译 (使用已缓存的剪切结果)
+    python -m src.pipeline.cli convert              # 格式化 (使用已缓存的译文)
+    python -m src.pipeline.cli publish              # 发布 (使用已缓存的格式化结果)
+    python -m src.pipeline.cli run                  # 完整执行,命中缓存的阶段直接复用
+    python -m src.pipeline.cli run --from=convert   # 复用 convert 之前的产物,从 convert 开始重跑
+    python -m src.pipeline.cli evict --days 7       # 清理过期产物
+    python -m src.pipeline.cli backfill --since 2025-01-01 --until 2025-07-01
+                                                    # 回填日期范围内的历史邮件 (翻译并归档,不发布)
+    python -m src.pipeline.cli trace --runs 10      # 分析最近 10 次运行的 LLM 调用 (延迟/token/费用)
+    python -m src.pipeline.cli report --days 14     # 最近 14 天运行指标的按日趋势
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+load_dotenv()
+
+from src.pipeline.engine import failed_result
+from src.pipeline.daily import (
+    CACHED_STAGES,
+    STAGE_OUTPUTS,
+    build_daily_pipeline,
+    create_translator,
+    get_artifact_store,
+    get_degraded_policy,
+    get_pipeline_options,
+    get_segmentation,
+    get_wechat_accounts,
+    load_cached_context,
+    load_yaml_config,
+    open_database,
+    save_run_metrics
+)
+from src.utils.logger import setup_logging, get_logger
+
+logger = get_logger(__name__)
+
+
+def run_stages(command: str, from_stage: str = None) -> int:
+    """
+    执行单个阶段或从某个阶段开始的完整流程
+
+    Args:
+        command: fetch / clip / translate / convert / publish / run
+        from_stage: run 命令的起始阶段
+
+    Returns:
+        进程退出码
+    """
+    from src.utils.config import get_config
+
+    store = get_artifact_store()
+    options = get_pipeline_options()
+    yaml_config = load_yaml_config()
+    config = get_config()
+
+    if command == 'run':
+        start = from_stage or 'fetch'
+        targets = None
+        refresh = CACHED_STAGES[CACHED_STAGES.index(start):] if from_stage else []
+    else:
+        start = command
+        targets = None if command == 'publish' else STAGE_OUTPUTS[command]
+        refresh = [command]
+        # 单阶段命令需要译文和格式化结果分开产出
+        options['streaming'] = False
+
+    try:
+        initial = load_cached_context(store, start)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        print(f"❌ {e}")
+        return 1
+
+    email_client = None
+    if start == 'fetch':
+        from src.email.factory import create_email_client
+        email_client = create_email_client()
+
+    database = open_database()
+    pipeline = build_daily_pipeline(
+        email_client=email_client,
+        sender_email=config.sender_email,
+        auto_publish=yaml_config.get('wechat', {}).get('auto_publish', False),
+        author=config.wechat_author,
+        store=store,
+        refresh=refresh,
+        database=database,
+        accounts=get_wechat_accounts(),
+        **options
+    )
+    # 只有完整流程计入运行指标,单阶段命令的耗时不可比
+    try:
+        result = pipeline.run(initial, targets=targets)
+    except Exception as e:
+        failed = failed_result(e)
+        if command == 'run' and failed is not None:
+            save_run_metrics(database, failed.summary, {**initial, **failed.context})
+        raise
+    if command == 'run':
+        save_run_metrics(database, result.summary, {**initial, **result.context})
+
+    if result.stopped:
+        print(f"⏹ {result.stop_reason}")
+        return 1
+
+    refs = store.get_refs('latest')
+    for stage in CACHED_STAGES:
+        if stage in refs:
+            print(f"  {stage:<10} {refs[stage][:12]}")
+    publish_result = result.get('publish_result')
+    if publish_result:
+        print(f"✅ 发布结果: {publish_result.get('status')} (Media ID: {publish_result.get('media_id')})")
+    for name, account_result in (result.get('publish_results') or {}).items():
+        print(f"  {name:<10} {account_result.get('status')} "
+              f"{account_result.get('media_id') or account_result.get('error', '')}")
+    print(f"⏱️ 用时 {result.total_seconds:.2f}s")
+
+    store.evict()
+    return 0
+
+
+def parse_date(value: str) -> datetime:
+    """解析 YYYY-MM-DD 格式的日期 (UTC)"""
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
+def run_backfill(args) -> int:
+    """
+    回填日期范围内的历史邮件
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        进程退出码
+    """
+    from src.email.factory import create_email_client
+    from src.pipeline.backfill import Backfill
+    from src.utils.config import get_config
+
+    database = open_database()
+    if database is None:
+        print("❌ 回填需要数据库记录进度和翻译记忆")
+        return 1
+
+    backfill_config = load_yaml_config().get('backfill', {})
+    backfill = Backfill(
+        email_client=create_email_client(),
+        sender_email=get_config().sender_email,
+        translator=create_translator(),
+        database=database,
+        store=get_artifact_store(),
+        output_dir=backfill_config.get('output_dir', 'data/archive'),
+        processes=args.processes if args.processes is not None else backfill_config.get('processes', 2),
+        email_workers=args.workers if args.workers is not None else backfill_config.get('email_workers', 4),
+        requests_per_minute=args.rpm if args.rpm is not None else backfill_config.get('requests_per_minute', 300),
+        degraded=get_degraded_policy(),
+        segmentation=get_segmentation()
+    )
+    stats = backfill.run(
+        since=parse_date(args.since) if args.since else None,
+        until=parse_date(args.until) if args.until else None,
+        limit=args.limit,
+        retry_failed=not args.skip_failed
+    )
+
+    print(f"📚 成功 {stats.done},失败 {stats.failed},跳过 {stats.skipped}")
+    print(f"⏱️ 用时 {stats.elapsed_seconds:.1f}s,{stats.emails_per_minute:.1f} 封/分钟")
+    return 1 if stats.failed else 0
+
+
+def run_trace(args) -> int:
+    """
+    分析 LLM 调用追踪文件
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        进程退出码
+    """
+    from src.translator.tracing import analyze, format_report, load_events
+    from src.utils.config import get_config
+
+    path = args.file or get_config().llm_trace_file
+    if not path or not Path(path).exists():
+        print(f"❌ 追踪文件不存在: {path}")
+        return 1
+
+    prices = load_yaml_config().get('translation', {}).get('prices') or {}
+    report = analyze(load_events(path), prices=prices, slowest=args.slowest, last_runs=args.runs)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+def run_report(args) -> int:
+    """
+    输出运行指标的按日趋势
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        进程退出码
+    """
+    from src.pipeline.trends import daily_trends, format_trends
+
+    database = open_database()
+    if database is None:
+        print("❌ 数据库不可用,没有运行指标")
+        return 1
+
+    since = datetime.now() - timedelta(days=args.days)
+    runs = database.get_run_metrics(since, pipeline=args.pipeline)
+    stages = database.get_stage_metrics([run.run_id for run in runs])
+    days = daily_trends(runs, stages, threshold=args.threshold)
+    if args.json:
+        print(json.dumps(days, ensure_ascii=False, indent=2))
+    else:
+        print(f"📊 最近 {args.days} 天的运行指标 ({len(runs)} 次运行,同一天多次运行取中位数)")
+        print(format_trends(days))
+    return 0
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="分阶段执行每日工作流,复用已缓存的阶段产物")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for stage in CACHED_STAGES:
+        subparsers.add_parser(stage, help=f"只执行 {stage} 阶段 (上游使用已缓存的产物)")
+
+    run_parser = subparsers.add_parser('run', help="执行完整流程")
+    run_parser.add_argument('--from', dest='from_stage', choices=CACHED_STAGES,
+                            help="复用该阶段之前的产物,从该阶段开始重新执行")
+
+    evict_parser = subparsers.add_parser('evict', help="清理过期产物")
+    evict_parser.add_argument('--days', type=int, default=None, help="保留天数 (默认读取配置)")
+
+    backfill_parser = subparsers.add_parser('backfill', help="回填日期范围内的历史邮件 (翻译并归档,不发布)")
+    backfill_parser.add_argument('--since', help="起始日期 YYYY-MM-DD (含)")
+    backfill_parser.add_argument('--until', help="结束日期 YYYY-MM-DD (不含)")
+    backfill_parser.add_argument('--limit', type=int, default=None, help="本次最多处理的邮件数")
+    backfill_parser.add_argument('--processes', type=int, default=None, help="剪切/格式化进程数 (默认读取配置)")
+    backfill_parser.add_argument('--workers', type=int, default=None, help="同时处理的邮件数 (默认读取配置)")
+    backfill_parser.add_argument('--rpm', type=float, default=None, help="LLM 每分钟请求数上限 (默认读取配置)")
+    backfill_parser.add_argument('--skip-failed', action='store_true', help="不重试上次失败的邮件")
+
+    trace_parser = subparsers.add_parser('trace', help="分析 LLM 调用追踪 (延迟分位数/token/费用/最慢片段)")
+    trace_parser.add_argument('--file', default=None, help="追踪文件 (默认读取 LLM_TRACE_FILE)")
+    trace_parser.add_argument('--runs', type=int, default=None, help="只统计最近的 N 次运行")
+    trace_parser.add_argument('--slowest', type=int, default=10, help="列出最慢的片段数")
+    trace_parser.add_argument('--json', action='store_true', help="输出 JSON")
+
+    report_parser = subparsers.add_parser('report', help="运行指标的按日趋势 (耗时/片段/LLM/缓存/图片/HTML 大小)")
+    report_parser.add_argument('--days', type=int, default=14, help="统计最近的天数")
+    report_parser.add_argument('--pipeline', default='daily', help="流水线名称")
+    report_parser.add_argument('--threshold', type=float, default=0.2, help="标出相对前一天变化超过该比例的指标")
+    report_parser.add_argument('--json', action='store_true', help="输出 JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == 'trace':
+        return run_trace(args)
+    if args.command == 'report':
+        return run_report(args)
+    setup_logging(log_level="INFO", log_file="logs/app.log")
+
+    if args.command == 'evict':
+        removed = get_artifact_store().evict(args.days)
+        print(f"🧹 已清理 {removed} 个产物")
+        return 0
+
+    try:
+        if args.command == 'backfill':
+            return run_backfill(args)
+        return run_stages(args.command, getattr(args, 'from_stage', None))
+    except Exception as e:
+        logger.error(f"❌ 执行失败: {e}", exc_info=True)
+        print(f"❌ 错误: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,860 @@
+"""
+每日工作流的阶段图
+获取邮件 -> 剪切 -> 翻译 -> 格式化 -> 推送到微信
+
+互不依赖的步骤并发执行:
+- 翻译器初始化、微信 access_token 获取与邮件下载同时进行
+- banner / 新闻图片 / 封面图在翻译期间预先上传,格式化时直接使用缓存
+- 流式模式下按顶层 TR 逐块翻译,每块完成后立即格式化
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pytz
+import requests
+import yaml
+from bs4 import BeautifulSoup
+
+from .engine import Pipeline, Stage, StopPipeline
+from ..gmail.parser import EmailParser
+from ..translator.checkpoint import TranslationCheckpoint
+from ..translator.html_translator import (
+    DegradedPolicy,
+    TranslationReport,
+    translate_html,
+    translate_html_blocks,
+    get_fixed_titles
+)
+from ..translator.variants import BASE_VARIANT, build_converters
+from ..wechat.accounts import WeChatAccount
+from ..wechat.publisher import WeChatPublisher
+from ..wechat.table_based_converter import TableBasedConverter
+from ..utils.artifacts import ArtifactStore, content_hash
+from ..utils import metrics
+from ..utils.config import get_config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CONFIG_PATH = Path("config/config.yaml")
+TEMP_THUMB_PATH = Path("data/assets/temp_thumb.jpg")
+
+# 可缓存的阶段 (按执行顺序) 及其在上下文中的输出
+CACHED_STAGES = ['fetch', 'clip', 'translate', 'convert', 'publish']
+STAGE_OUTPUTS = {
+    'fetch': ('message', 'email_data', 'html_content'),
+    'clip': ('clipped_html',),
+    'translate': ('translated_html',),
+    'convert': ('formatted_html',),
+    'publish': ('publish_result',),
+}
+
+
+def load_yaml_config() -> Dict[str, Any]:
+    """读取 config/config.yaml,不存在时返回空字典"""
+    if CONFIG_PATH.exists():
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+
+def get_pipeline_options() -> Dict[str, Any]:
+    """读取 config.yaml 中的 pipeline 配置,作为 build_daily_pipeline 的参数"""
+    pipeline_config = load_yaml_config().get('pipeline', {})
+    return {
+        'max_workers': pipeline_config.get('max_workers', 4),
+        'streaming': pipeline_config.get('streaming', False),
+        'translate_workers': pipeline_config.get('translate_workers', 1),
+        'degraded': get_degraded_policy(),
+        'variants': load_yaml_config().get('translation', {}).get('variants') or {},
+        'segmentation': get_segmentation()
+    }
+
+
+def get_segmentation() -> str:
+    """读取 config.yaml 中的 translation.segmentation (node: 逐个文本节点翻译; block: 按块翻译)"""
+    return load_yaml_config().get('translation', {}).get('segmentation', 'node')
+
+
+def get_degraded_policy() -> Optional[DegradedPolicy]:
+    """读取 config.yaml 中的 translation.degraded 配置,未启用时返回 None (严格模式)"""
+    degraded_config = load_yaml_config().get('translation', {}).get('degraded', {})
+    if not degraded_config.get('enabled', False):
+        return None
+    return DegradedPolicy(
+        retry_rounds=degraded_config.get('retry_rounds', 3),
+        retry_delay=degraded_config.get('retry_delay_seconds', 5),
+        min_completeness=degraded_config.get('min_completeness', 0.95),
+        failed_marker=degraded_config.get('failed_marker', '')
+    )
+
+
+def get_wechat_accounts() -> Optional[List[WeChatAccount]]:
+    """读取 config.yaml 中的 wechat.accounts,未配置时返回 None (使用环境变量中的单个账号)"""
+    entries = load_yaml_config().get('wechat', {}).get('accounts') or []
+    if not entries:
+        return None
+    return [WeChatAccount.from_config(entry) for entry in entries]
+
+
+def get_artifact_store() -> ArtifactStore:
+    """按 config.yaml 中的 artifacts 配置创建产物存储"""
+    artifacts_config = load_yaml_config().get('artifacts', {})
+    return ArtifactStore(
+        root=artifacts_config.get('root', 'data/artifacts'),
+        retention_days=artifacts_config.get('retention_days', 14)
+    )
+
+
+def open_database():
+    """打开数据库用于翻译检查点,不可用时返回 None (不影响主流程)"""
+    try:
+        from ..utils.database import Database
+        return Database()
+    except Exception as e:
+        logger.warning(f"数据库不可用,翻译检查点已禁用: {e}")
+        return None
+
+
+def create_profiler(store: ArtifactStore):
+    """在产物目录下创建本次运行的性能剖析器 (<root>/profiles/<时间>),采样参数读取 config.yaml 的 profiling 配置"""
+    from ..utils.profiling import PipelineProfiler
+
+    profiling_config = load_yaml_config().get('profiling', {})
+    return PipelineProfiler(
+        output_dir=str(store.root / "profiles" / datetime.now().strftime('%Y%m%d-%H%M%S')),
+        interval=profiling_config.get('interval_ms', 5) / 1000,
+        memory=profiling_config.get('memory', True)
+    )
+
+
+def save_run_metrics(database, summary: Optional[Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> None:
+    """
+    把一次运行的指标写入数据库 (失败只记录警告,不影响主流程)
+
+    Args:
+        database: Database 实例,为 None 时跳过
+        summary: 运行摘要 (PipelineResult.summary,失败时为 failed_result(e).summary)
+        context: 流水线上下文,用于读取邮件信息、翻译模型和各阶段的 HTML 大小;运行失败时可以为空
+    """
+    if database is None or summary is None:
+        return
+    context = context or {}
+
+    def html_bytes(key: str) -> Optional[int]:
+        value = context.get(key)
+        return len(value.encode('utf-8')) if isinstance(value, str) else None
+
+    def local_time(value: str) -> datetime:
+        return datetime.fromisoformat(value).astimezone().replace(tzinfo=None)
+
+    counters = summary['counters']
+    email_data = context.get('email_data') or {}
+    translator = context.get('translator')
+    run = {
+        'run_id': summary['run_id'],
+        'pipeline': summary['pipeline'],
+        'started_at': local_time(summary['started_at']),
+        'finished_at': local_time(summary['finished_at']),
+        'status': summary['status'],
+        'error_message': summary['error'],
+        'email_id': email_data.get('id'),
+        'subject': email_data.get('subject'),
+        'provider': getattr(translator, 'provider', None),
+        'model': getattr(translator, 'model', None),
+        'duration_seconds': summary['total_seconds'],
+        'segments': counters['segments'],
+        'llm_calls': counters['llm_requests'],
+        'llm_errors': counters['llm_errors'],
+        'input_tokens': counters['llm_input_tokens'],
+        'output_tokens': counters['llm_output_tokens'],
+        'translation_cache_hits': counters['translation_cache_hits'],
+        'translation_cache_misses': counters['translation_cache_misses'],
+        'artifact_cache_hits': counters['artifact_cache_hits'],
+        'artifact_cache_misses': counters['artifact_cache_misses'],
+        'images_uploaded': counters['images_uploaded'],
+        'image_bytes': counters['image_bytes_uploaded'],
+        'original_html_bytes': html_bytes('html_content'),
+        'clipped_html_bytes': html_bytes('clipped_html'),
+        'translated_html_bytes': html_bytes('translated_html'),
+        'formatted_html_bytes': html_bytes('formatted_html'),
+    }
+    stages = [
+        {
+            'stage': stage['name'],
+            'status': stage['status'],
+            'start_seconds': stage['start'],
+            'duration_seconds': stage['duration'],
+            'cpu_seconds': stage['cpu_seconds'],
+        }
+        for stage in summary['stages']
+    ]
+    try:
+        database.save_run_metrics(run, stages, email_count=1 if email_data and summary['status'] != 'stopped' else 0)
+    except Exception as e:
+        logger.warning(f"运行指标写入失败: {e}")
+
+
+def load_cached_context(store: ArtifactStore, before_stage: str, ref: str = 'latest') -> Dict[str, Any]:
+    """
+    从产物存储恢复 before_stage 之前所有阶段的输出,作为流水线的初始上下文
+
+    Args:
+        store: 产物存储
+        before_stage: 从该阶段开始重新执行
+        ref: 引用名称
+
+    Returns:
+        初始上下文
+
+    Raises:
+        ValueError: 阶段名称无效或缺少上游产物
+    """
+    if before_stage not in CACHED_STAGES:
+        raise ValueError(f"未知阶段: {before_stage},可选: {', '.join(CACHED_STAGES)}")
+
+    context = {}
+    for stage in CACHED_STAGES[:CACHED_STAGES.index(before_stage)]:
+        value = store.load_ref(ref, stage)
+        if value is None:
+            raise ValueError(f"缺少上游产物: {stage},请先执行该阶段")
+        outputs = STAGE_OUTPUTS[stage]
+        context.update(value if len(outputs) > 1 else {outputs[0]: value})
+    return context
+
+
+def get_routing_config() -> Optional[Dict[str, Any]]:
+    """读取 config.yaml 中的 translation.routing 配置,未启用时返回 None"""
+    routing_config = load_yaml_config().get('translation', {}).get('routing', {})
+    return routing_config if routing_config.get('enabled', False) else None
+
+
+def create_translator():
+    """
+    创建翻译器: 启用模型路由时为 ModelRouter,否则为单个 LangChainTranslator
+
+    延迟导入: LLM SDK 体积较大,调用方通常与邮件下载并发创建
+    """
+    routing_config = get_routing_config()
+    if routing_config is not None:
+        from ..translator.router import ModelRouter
+        return ModelRouter.from_config(routing_config)
+
+    from ..translator.langchain_translator import LangChainTranslator
+    return LangChainTranslator()
+
+
+def translator_fingerprint() -> Dict[str, Any]:
+    """影响译文的翻译配置,作为翻译产物键的一部分"""
+    config = get_config()
+    models = {
+        'openai': config.openai_model,
+        'vertex_ai': config.vertex_ai_model,
+        'google_ai': config.google_ai_model,
+        'local': Path(config.local_mt_model_dir).name,
+        'fake': 'fake-translator',
+    }
+    fingerprint = {
+        'provider': config.ai_provider,
+        'model': models.get(config.ai_provider),
+        'fixed_titles': get_fixed_titles()
+    }
+    routing_config = get_routing_config()
+    if routing_config is not None:
+        fingerprint['routing'] = routing_config
+    # 按块翻译的译文与逐节点翻译不同;默认值不写入,已有的翻译产物仍然有效
+    segmentation = get_segmentation()
+    if segmentation != 'node':
+        fingerprint['segmentation'] = segmentation
+    return fingerprint
+
+
+def download_image(url: str, save_path: Path) -> bool:
+    """下载图片"""
+    try:
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(save_path, 'wb') as f:
+            f.write(response.content)
+        return True
+    except Exception as e:
+        logger.error(f"下载图片失败: {e}")
+        return False
+
+
+def clean_greeting(html_content: str) -> str:
+    """清理欢迎语中的个人称呼"""
+    patterns = [
+        r'Good morning,\s+\w+\.',
+        r'Good afternoon,\s+\w+\.',
+        r'Good evening,\s+\w+\.',
+        r'Hello,\s+\w+\.',
+        r'Hi,\s+\w+\.',
+    ]
+    for pattern in patterns:
+        html_content = re.sub(
+            pattern,
+            lambda m: m.group(0).split(',')[0] + '.',
+            html_content,
+            flags=re.IGNORECASE
+        )
+    return html_content
+
+
+def get_title_with_prefix(original_title: str, title_prefix_template: Optional[str] = None) -> str:
+    """为标题添加日期前缀 (模板默认读取 wechat.title_prefix)"""
+    if title_prefix_template is None:
+        title_prefix_template = load_yaml_config().get('wechat', {}).get('title_prefix', '【{date}AI早报】')
+
+    beijing_tz = pytz.timezone('Asia/Shanghai')
+    now = datetime.now(beijing_tz)
+    date_str = now.strftime('%m月%d日').lstrip('0').replace('月0', '月')
+    title_prefix = title_prefix_template.replace('{date}', date_str)
+    return f"{title_prefix}{original_title}"
+
+
+def extract_title_and_digest(html_content: str) -> tuple:
+    """从HTML中提取标题和摘要"""
+    import emoji
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # 提取第一个h3作为标题
+    title_elem = soup.find('h3')
+    title = title_elem.get_text(strip=True) if title_elem else "AI早报"
+
+    # 去除emoji
+    title = emoji.replace_emoji(title, '').strip()
+
+    # 提取第一个有文本内容的段落作为摘要(跳过banner图片的p标签)
+    digest = ""
+    for p in soup.find_all('p'):
+        # 跳过只包含图片的p标签
+        if p.find('img') and not p.get_text(strip=True):
+            continue
+        text = p.get_text(strip=True)
+        if text:
+            digest = text
+            break
+
+    # 限制摘要长度
+    if len(digest) > 100:
+        digest = digest[:97] + "..."
+
+    return title, digest
+
+
+def build_daily_pipeline(
+    email_client,
+    sender_email: str,
+    auto_publish: bool = False,
+    author: Optional[str] = None,
+    days_back: int = 7,
+    max_workers: int = 4,
+    image_workers: int = 4,
+    streaming: bool = False,
+    translate_workers: int = 1,
+    store: Optional[ArtifactStore] = None,
+    refresh: Iterable[str] = (),
+    database=None,
+    degraded: Optional[DegradedPolicy] = None,
+    accounts: Optional[List[WeChatAccount]] = None,
+    variants: Optional[Dict[str, str]] = None,
+    segmentation: str = 'node'
+) -> Pipeline:
+    """
+    构建每日工作流流水线
+
+    Args:
+        email_client: 邮箱客户端
+        sender_email: 发件人邮箱地址
+        auto_publish: 是否自动发布 (否则保存到草稿箱)
+        author: 文章作者
+        days_back: 搜索最近几天的邮件
+        max_workers: 并发执行的最大阶段数
+        image_workers: 预上传图片的并发数
+        streaming: 流式模式,逐块翻译并立即格式化 (翻译与格式化重叠)
+        translate_workers: 流式模式下同时翻译的块数
+        store: 产物存储;提供时 fetch/clip/translate/convert/publish 的输出按输入内容缓存,
+            图片上传结果按账号缓存,重跑时直接复用;并发执行的多个流水线计算同一产物时
+            只有一个执行,其余等待并复用其结果
+        refresh: 忽略缓存、强制重新执行的阶段
+        database: Database 实例;提供时每个翻译片段完成后立即写入检查点,
+            同一封邮件重跑时只翻译缺失的片段,发布成功后清理
+        degraded: 降级策略;提供时单个片段失败不会中断翻译,失败片段保留原文并在
+            主流程结束后重试,完成度低于阈值时不发布。为 None 时任何片段失败都会中断
+        accounts: 多账号发布;提供时翻译和格式化只执行一次 (图片保留原始地址),
+            每个账号并发获取 token、上传图片和封面、创建草稿,结果汇总在 publish_results 中。
+            为 None 时使用环境变量中的单个账号
+        variants: 中文变体 {变体名称: OpenCC 配置};账号的 variant 指向其中之一时,
+            该变体由简体译文本地转换后单独格式化,再发布到对应账号 (不额外调用 LLM)
+        segmentation: 翻译单元;'block' 时段落、列表项和标题整块翻译 (行内标签替换为占位符),
+            'node' 时逐个文本节点翻译
+
+    Returns:
+        Pipeline,执行结果的上下文中包含 publish_result、title、email_data 等
+    """
+    parser = EmailParser()
+    publisher = WeChatPublisher(auto_publish=auto_publish, artifact_store=store) if accounts is None else None
+    refresh = set(refresh)
+
+    # 只加载账号实际用到的变体
+    variants = variants or {}
+    needed_variants = {
+        account.variant for account in accounts or []
+        if account.variant and account.variant != BASE_VARIANT
+    }
+    unknown = needed_variants - set(variants)
+    if unknown:
+        raise ValueError(f"未配置的中文变体: {', '.join(sorted(unknown))} (translation.variants)")
+    converters = build_converters({name: variants[name] for name in needed_variants})
+
+    def variant_key(key: str, variant: Optional[str]) -> str:
+        """变体在上下文中的键,简体版本使用原始键"""
+        return f"{key}@{variant}" if variant in converters else key
+
+    def cached(
+        stage: str,
+        key: str,
+        compute: Callable[[], Any],
+        cacheable: Callable[[], bool] = lambda: True
+    ) -> Any:
+        """读取阶段产物,没有时计算并保存 (cacheable 为假时不保存),同时更新 latest 引用"""
+        if store is None:
+            return compute()
+
+        value = None if stage in refresh else store.get(stage, key)
+        if value is None:
+            with store.lock(stage, key):
+                # 等待期间其他流水线可能已经生成了该产物
+                value = None if stage in refresh else store.get(stage, key)
+                if value is None:
+                    metrics.ARTIFACT_CACHE.inc(stage=stage, result='miss')
+                    value = compute()
+                    if not cacheable():
+                        return value
+                    store.put(stage, key, value)
+                    store.set_ref('latest', stage, key)
+                    return value
+
+        metrics.ARTIFACT_CACHE.inc(stage=stage, result='hit')
+        logger.info(f"♻️ 复用已缓存的产物: {stage} ({key[:12]})")
+        store.set_ref('latest', stage, key)
+        return value
+
+    def cached_upload(target: WeChatPublisher, kind: str, source: str) -> Any:
+        """上传图片素材 (kind: image 正文图片 / thumb 封面),同一账号下相同图片只上传一次"""
+        upload = target.upload_thumb_image if kind == 'thumb' else target.upload_image
+        if store is None:
+            return upload(source)
+
+        source_path = Path(source)
+        identity = content_hash(source_path.read_bytes()) if source_path.exists() else source
+        key = store.make_key('upload', target.app_id, kind, identity)
+        media = store.get('upload', key)
+        if media is None:
+            with store.lock('upload', key):
+                media = store.get('upload', key)
+                if media is None:
+                    metrics.ARTIFACT_CACHE.inc(stage='upload', result='miss')
+                    media = upload(source)
+                    store.put('upload', key, media)
+                    return media
+        metrics.ARTIFACT_CACHE.inc(stage='upload', result='hit')
+        return media
+
+    class CachedUploader:
+        """供转换器使用的上传器,格式化时上传的图片同样走缓存"""
+
+        def upload_image(self, image_url: str) -> str:
+            return cached_upload(publisher, 'image', image_url)
+
+    class OriginalImages:
+        """多账号模式下格式化时不上传图片,保留原始地址,发布时再替换为各账号上传后的地址"""
+
+        def upload_image(self, image_url: str) -> str:
+            return image_url
+
+    uploader = CachedUploader() if accounts is None else OriginalImages()
+
+    def fetch_email():
+        logger.info(f"正在获取来自 {sender_email} 的最新邮件...")
+        message = email_client.get_latest_email(sender=sender_email, days_back=days_back)
+        if not message:
+            raise StopPipeline(f"未找到来自 {sender_email} 的邮件")
+
+        email_data = email_client.extract_email_data(message)
+        logger.info(f"📧 主题: {email_data['subject']}")
+        logger.info(f"👤 发件人: {email_data['sender']}")
+        logger.info(f"📅 日期: {email_data['date']}")
+
+        html_content = parser.parse_email(message).get('html')
+        if not html_content:
+            raise StopPipeline("邮件内容为空")
+
+        logger.info(f"✅ 邮件内容大小: {len(html_content)} 字符")
+        parser.save_html_to_file(html_content, "original_email", "data")
+        fetched = {'message': message, 'email_data': email_data, 'html_content': html_content}
+        if store is not None:
+            # 邮件总是重新获取 (需要知道最新的是哪一封),只记录产物供后续阶段重跑使用
+            key = store.make_key('fetch', email_data['id'])
+            store.put('fetch', key, fetched)
+            store.set_ref('latest', 'fetch', key)
+        return fetched
+
+    def init_translator():
+        return create_translator()
+
+    def fetch_access_token():
+        return publisher.get_access_token()
+
+    def clip(html_content):
+        clipped_html = cached(
+            'clip', store.make_key('clip', html_content) if store else '',
+            lambda: parser.clip_email_html(html_content)
+        )
+        logger.info(f"✅ 剪切后内容大小: {len(clipped_html)} 字符")
+        parser.save_html_to_file(clipped_html, "clipped_email", "data")
+        return clipped_html
+
+    def translate_key(clipped_html):
+        return store.make_key('translate', clipped_html, translator_fingerprint()) if store else ''
+
+    def open_checkpoint(email_data):
+        return TranslationCheckpoint(database, email_data['id']) if database is not None else None
+
+    def new_report():
+        return TranslationReport(degraded) if degraded is not None else None
+
+    def translate(clipped_html, translator, email_data):
+        report = new_report()
+
+        def compute():
+            translated_html = translate_html(
+                clean_greeting(clipped_html), translator, open_checkpoint(email_data), report, segmentation
+            )
+            if report is not None:
+                report.check()
+            return translated_html
+
+        # 降级结果 (有片段未翻译) 不缓存,重跑时借助检查点只补译失败的片段
+        translated_html = cached(
+            'translate', translate_key(clipped_html), compute,
+            cacheable=lambda: report is None or report.complete
+        )
+        parser.save_html_to_file(translated_html, "translated_email", "data")
+        return translated_html
+
+    def upload_banner(access_token):
+        if not TableBasedConverter.BANNER_PATH.exists():
+            return None
+        return cached_upload(publisher, 'image', str(TableBasedConverter.BANNER_PATH))
+
+    def prefetch_images(target, clipped_html):
+        # 图片 URL 不受翻译影响,可以在翻译期间并发上传
+        urls = list(dict.fromkeys(TableBasedConverter().collect_news_image_urls(clipped_html)))
+        logger.info(f"🖼️ 预上传 {len(urls)} 张新闻图片")
+
+        def upload(url):
+            try:
+                return url, cached_upload(target, 'image', url)
+            except Exception as e:
+                logger.warning(f"预上传图片失败,格式化时将重试: {e}")
+                return url, None
+
+        with ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix="image-prefetch-worker") as executor:
+            return {url: media_url for url, media_url in executor.map(upload, urls) if media_url}
+
+    def prepare_cover(clipped_html):
+        # 与格式化结果中的图片顺序一致: 跳过第一张图片(banner 图),使用第二张图片作为封面;
+        # 只有一张图片时也使用它
+        all_imgs = TableBasedConverter().collect_news_image_urls(clipped_html)
+        if TableBasedConverter.BANNER_PATH.exists():
+            all_imgs.insert(0, str(TableBasedConverter.BANNER_PATH))
+        if not all_imgs:
+            return None
+        cover_img = all_imgs[1] if len(all_imgs) >= 2 else all_imgs[0]
+        if cover_img == str(TableBasedConverter.BANNER_PATH):
+            return cover_img
+        logger.info(f"找到封面图片(第一条新闻): {cover_img[:80]}...")
+        if download_image(cover_img, TEMP_THUMB_PATH):
+            return str(TEMP_THUMB_PATH)
+        return None
+
+    def upload_cover(target, cover_path):
+        if not cover_path:
+            return None
+        thumb_media_id = cached_upload(target, 'thumb', cover_path)
+        logger.info("✅ 封面图上传成功")
+        return thumb_media_id
+
+    def convert_key(translated_html):
+        # 转换结果包含上传到该账号的图片地址 (多账号模式下保留原始地址,与账号无关)
+        scope = publisher.app_id if publisher is not None else 'original-images'
+        return store.make_key('convert', translated_html, scope) if store else ''
+
+    def new_formatter(uploaded_images=None, banner_url=None):
+        formatter = TableBasedConverter(publisher=uploader)
+        formatter.uploaded_images.update(uploaded_images or {})
+        if banner_url:
+            formatter.uploaded_images[str(TableBasedConverter.BANNER_PATH)] = banner_url
+        return formatter
+
+    def convert(translated_html, uploaded_images=None, banner_url=None, output_name="wechat_formatted"):
+        formatter = new_formatter(uploaded_images, banner_url)
+        formatted_html = cached('convert', convert_key(translated_html), lambda: formatter.convert(translated_html))
+        logger.info("✅ 格式化完成")
+        parser.save_html_to_file(formatted_html, output_name, "data")
+        return formatted_html
+
+    def translate_and_convert(clipped_html, translator, email_data, banner_url=None):
+        if store is None:
+            return stream_translate(clipped_html, translator, email_data, banner_url)
+
+        # 同一封邮件的并发运行只流式翻译一次,其余等待后复用译文
+        with store.lock('translate', translate_key(clipped_html)):
+            if 'translate' not in refresh and store.has('translate', translate_key(clipped_html)):
+                # 已有译文,无需流式翻译
+                translated_html = translate(clipped_html, translator, email_data)
+                return {'translated_html': translated_html, 'formatted_html': convert(translated_html, {}, banner_url)}
+            return stream_translate(clipped_html, translator, email_data, banner_url)
+
+    def stream_translate(clipped_html, translator, email_data, banner_url):
+        # 图片在格式化每个块时上传,与后续块的翻译重叠,不需要单独预上传
+        soup = BeautifulSoup(clean_greeting(clipped_html), 'html.parser')
+        formatter = new_formatter(banner_url=banner_url)
+
+        # 有 banner 时第一个片段是 banner,之后才是正文
+        first_body_part = 2 if TableBasedConverter.BANNER_PATH.exists() else 1
+        started = time.perf_counter()
+        parts = []
+        report = new_report()
+        blocks = translate_html_blocks(
+            soup, translator, max_workers=translate_workers, checkpoint=open_checkpoint(email_data), report=report,
+            segmentation=segmentation
+        )
+        for part in formatter.convert_stream(blocks):
+            parts.append(part)
+            if len(parts) == first_body_part:
+                logger.info(f"⚡ 首个正文片段格式化完成: {time.perf_counter() - started:.2f}s")
+
+        translated_html = str(soup)
+        formatted_html = '\n'.join(parts)
+        if report is not None:
+            report.check()
+            if report.recovered:
+                # 重试成功的片段出现在已格式化的块之后,重新格式化整篇 (图片已缓存)
+                formatted_html = formatter.convert(translated_html)
+        logger.info("✅ 翻译和格式化完成")
+        if store is not None and (report is None or report.complete):
+            for stage, key, value in (
+                ('translate', translate_key(clipped_html), translated_html),
+                ('convert', convert_key(translated_html), formatted_html)
+            ):
+                store.put(stage, key, value)
+                store.set_ref('latest', stage, key)
+        parser.save_html_to_file(translated_html, "translated_email", "data")
+        parser.save_html_to_file(formatted_html, "wechat_formatted", "data")
+        return {'translated_html': translated_html, 'formatted_html': formatted_html}
+
+    def title_digest(formatted_html):
+        title, digest = extract_title_and_digest(formatted_html)
+        if accounts is None:
+            # 多账号模式下各账号在发布时添加自己的标题前缀
+            title = get_title_with_prefix(title)
+        logger.info(f"标题: {title}")
+        logger.info(f"摘要: {digest}")
+        return {'title': title, 'digest': digest}
+
+    def publish_to(target, formatted_html, title, digest, thumb_media_id, article_author=None):
+        kwargs = {'author': article_author} if article_author else {}
+        # 相同内容已发布过时直接返回上次的结果,避免重跑产生重复草稿
+        key = store.make_key(
+            'publish', formatted_html, title, digest, article_author, target.app_id, target.auto_publish
+        ) if store else ''
+        return cached('publish', key, lambda: target.publish_article(
+            title=title,
+            content=formatted_html,
+            digest=digest,
+            thumb_media_id=thumb_media_id,
+            **kwargs
+        ))
+
+    def publish(formatted_html, title, digest, thumb_media_id, email_data):
+        logger.info("发布文章到微信公众号...")
+        result = publish_to(publisher, formatted_html, title, digest, thumb_media_id, article_author=author)
+        if database is not None:
+            database.delete_translation_segments(email_data['id'])
+        return result
+
+    def localize_images(target, formatted_html, uploaded_images):
+        """把格式化结果中的原始图片地址替换为该账号上传后的地址,上传失败的图片移除"""
+        for src in dict.fromkeys(re.findall(r'<img src="([^"]+)"', formatted_html)):
+            media_url = uploaded_images.get(src)
+            if media_url is None:
+                try:
+                    media_url = cached_upload(target, 'image', src)
+                except Exception as e:
+                    logger.error(f"上传图片失败: {e}")
+            if media_url:
+                formatted_html = formatted_html.replace(f'src="{src}"', f'src="{media_url}"')
+            else:
+                formatted_html = re.sub(rf'<p[^>]*><img src="{re.escape(src)}"[^>]*/?></p>', '', formatted_html)
+        return formatted_html
+
+    def account_stages(account):
+        """单个账号的阶段: 获取 token 后上传图片和封面 (与翻译并发),格式化完成后发布"""
+        target = WeChatPublisher(
+            app_id=account.app_id,
+            app_secret=account.app_secret,
+            auto_publish=auto_publish if account.auto_publish is None else account.auto_publish,
+            artifact_store=store
+        )
+        media_key = f"media@{account.name}"
+        converter = converters.get(account.variant)
+        content_key = variant_key('formatted_html', account.variant)
+        title_key = variant_key('title', account.variant)
+        digest_key = variant_key('digest', account.variant)
+
+        def prepare_media(clipped_html):
+            target.get_access_token()
+            uploaded_images = prefetch_images(target, clipped_html)
+            if TableBasedConverter.BANNER_PATH.exists():
+                banner = str(TableBasedConverter.BANNER_PATH)
+                uploaded_images[banner] = cached_upload(target, 'image', banner)
+            return uploaded_images
+
+        def publish_account(cover_path, **inputs):
+            logger.info(f"发布文章到微信公众号: {account.name}")
+            try:
+                content = localize_images(target, inputs[content_key], inputs[media_key] or {})
+                thumb_media_id = upload_cover(target, cover_path)
+                title = get_title_with_prefix(inputs[title_key], account.title_prefix)
+                if converter is not None:
+                    # 标题前缀来自配置,同样转换为对应变体
+                    title = converter.convert(title)
+                return publish_to(
+                    target, content, title, inputs[digest_key],
+                    thumb_media_id, article_author=account.author or author
+                )
+            except Exception as e:
+                # 单个账号失败不影响其他账号
+                logger.error(f"公众号 {account.name} 发布失败: {e}", exc_info=True)
+                return {'status': 'failed', 'error': str(e)}
+
+        return [
+            Stage(media_key, prepare_media, inputs=('clipped_html',), outputs=(media_key,), optional=True),
+            Stage(f"publish@{account.name}", publish_account,
+                  inputs=(content_key, title_key, digest_key, 'cover_path', media_key),
+                  outputs=(f"publish_result@{account.name}",)),
+        ]
+
+    def variant_stages(name, converter):
+        """单个变体的阶段: 由简体译文本地转换,再单独格式化并提取标题摘要"""
+        translated_key = f"translated_html@{name}"
+        formatted_key = f"formatted_html@{name}"
+
+        def derive(translated_html):
+            started = time.perf_counter()
+            variant_html = converter.convert_html(translated_html)
+            logger.info(f"✅ 已生成 {name} 版本 ({converter.config}): {(time.perf_counter() - started) * 1000:.0f}ms")
+            parser.save_html_to_file(variant_html, f"translated_email_{name}", "data")
+            return variant_html
+
+        def convert_variant(**inputs):
+            return convert(inputs[translated_key], output_name=f"wechat_formatted_{name}")
+
+        def title_digest_variant(**inputs):
+            title, digest = extract_title_and_digest(inputs[formatted_key])
+            return {f"title@{name}": title, f"digest@{name}": digest}
+
+        return [
+            Stage(f"variant@{name}", derive, inputs=('translated_html',), outputs=(translated_key,)),
+            Stage(f"convert@{name}", convert_variant, inputs=(translated_key,), outputs=(formatted_key,)),
+            Stage(f"title_digest@{name}", title_digest_variant, inputs=(formatted_key,),
+                  outputs=(f"title@{name}", f"digest@{name}")),
+        ]
+
+    def fan_in(email_data, **results):
+        publish_results = {account.name: results[f"publish_result@{account.name}"] for account in accounts}
+        succeeded = {name: r for name, r in publish_results.items() if r.get('status') != 'failed'}
+        for name, result in publish_results.items():
+            logger.info(f"  {name:<16} {result.get('status')} {result.get('media_id') or result.get('error', '')}")
+
+        if not succeeded:
+            raise RuntimeError(f"所有公众号发布失败: {', '.join(publish_results)}")
+        if database is not None and len(succeeded) == len(publish_results):
+            database.delete_translation_segments(email_data['id'])
+        return {'publish_results': publish_results, 'publish_result': next(iter(succeeded.values()))}
+
+    stages = [
+        Stage('fetch_email', fetch_email, outputs=('message', 'email_data', 'html_content')),
+        Stage('translator_init', init_translator, outputs=('translator',)),
+        Stage('clip', clip, inputs=('html_content',), outputs=('clipped_html',)),
+    ]
+
+    if accounts is not None:
+        # 翻译和格式化只执行一次,之后每个账号的上传和发布并发执行
+        if streaming:
+            stages.append(Stage('translate_convert', translate_and_convert,
+                                inputs=('clipped_html', 'translator', 'email_data'),
+                                outputs=('translated_html', 'formatted_html')))
+        else:
+            stages += [
+                Stage('translate', translate, inputs=('clipped_html', 'translator', 'email_data'),
+                      outputs=('translated_html',)),
+                Stage('convert', convert, inputs=('translated_html',), outputs=('formatted_html',)),
+            ]
+        stages += [
+            Stage('title_digest', title_digest, inputs=('formatted_html',), outputs=('title', 'digest')),
+            Stage('cover_image', prepare_cover, inputs=('clipped_html',), outputs=('cover_path',), optional=True),
+        ]
+        for name, converter in converters.items():
+            stages += variant_stages(name, converter)
+        for account in accounts:
+            stages += account_stages(account)
+        stages.append(Stage(
+            'fan_in', fan_in,
+            inputs=('email_data',) + tuple(f"publish_result@{account.name}" for account in accounts),
+            outputs=('publish_results', 'publish_result')
+        ))
+        return Pipeline(
+            stages, max_workers=max(max_workers, 3 + 2 * len(accounts) + len(converters)), name="daily"
+        )
+
+    stages += [
+        Stage('access_token', fetch_access_token, outputs=('access_token',)),
+        Stage('banner_upload', upload_banner, inputs=('access_token',), outputs=('banner_url',), optional=True),
+        Stage('cover_upload', lambda clipped_html, access_token: upload_cover(publisher, prepare_cover(clipped_html)),
+              inputs=('clipped_html', 'access_token'), outputs=('thumb_media_id',), optional=True),
+    ]
+
+    if streaming:
+        stages += [
+            Stage('translate_convert', translate_and_convert,
+                  inputs=('clipped_html', 'translator', 'email_data', 'banner_url'),
+                  outputs=('translated_html', 'formatted_html')),
+        ]
+    else:
+        stages += [
+            Stage('translate', translate, inputs=('clipped_html', 'translator', 'email_data'),
+                  outputs=('translated_html',)),
+            Stage('image_prefetch', lambda clipped_html, access_token: prefetch_images(publisher, clipped_html),
+                  inputs=('clipped_html', 'access_token'), outputs=('uploaded_images',), optional=True),
+            Stage('convert', convert, inputs=('translated_html', 'uploaded_images', 'banner_url'),
+                  outputs=('formatted_html',)),
+        ]
+
+    stages += [
+        Stage('title_digest', title_digest, inputs=('formatted_html',), outputs=('title', 'digest')),
+        Stage('publish', publish, inputs=('formatted_html', 'title', 'digest', 'thumb_media_id', 'email_data'),
+              outputs=('publish_result',)),
+    ]
+
+    return Pipeline(stages, max_workers=max_workers, name="daily")
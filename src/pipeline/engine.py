@@ -0,0 +1,359 @@
+"""
+阶段图 (DAG) 流水线引擎
+每个阶段声明输入和输出,输入全部就绪的阶段会在线程池中并发执行
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ..utils import metrics
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StopPipeline(Exception):
+    """阶段主动终止流水线 (例如没有新邮件),不视为失败"""
+
+
+class PipelineError(Exception):
+    """流水线定义或执行错误"""
+
+
+def failed_result(error: BaseException) -> Optional["PipelineResult"]:
+    """
+    Pipeline.run 抛出的异常所属运行的结果
+
+    阶段失败时异常上附带本次运行的结果 (含运行摘要);流水线定义错误等在记录运行前
+    抛出的异常没有结果,调用方不应把 metrics.latest_run() (上一次运行) 当作本次保存
+
+    Args:
+        error: Pipeline.run 抛出的异常
+
+    Returns:
+        PipelineResult,本次运行未记录摘要时返回 None
+    """
+    return getattr(error, 'pipeline_result', None)
+
+
+class Stage:
+    """流水线阶段"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        optional: bool = False
+    ):
+        """
+        初始化阶段
+
+        Args:
+            name: 阶段名称
+            func: 阶段函数,以输入名作为关键字参数调用;
+                只有一个输出时直接返回该值,有多个输出时返回 {输出名: 值} 字典
+            inputs: 依赖的上下文键
+            outputs: 产出的上下文键
+            optional: 可选阶段失败时输出置为 None,流水线继续执行
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.optional = optional
+
+    def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """执行阶段并把返回值整理为 {输出名: 值}"""
+        result = self.func(**{key: context[key] for key in self.inputs})
+
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if not isinstance(result, dict) or set(result) != set(self.outputs):
+            raise PipelineError(f"阶段 {self.name} 应返回包含 {self.outputs} 的字典")
+        return result
+
+    def __repr__(self):
+        return f"<Stage(name='{self.name}', inputs={self.inputs}, outputs={self.outputs})>"
+
+
+class StageTiming:
+    """阶段耗时记录 (相对流水线开始的秒数)"""
+
+    def __init__(self, name: str, start: float, end: float, status: str, cpu_seconds: float = 0.0):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.status = status  # success, failed, skipped
+        # 执行阶段的线程消耗的 CPU 时间 (不含阶段内部另开的线程)
+        self.cpu_seconds = cpu_seconds
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"<StageTiming(name='{self.name}', duration={self.duration:.3f}s, status='{self.status}')>"
+
+
+class PipelineResult:
+    """流水线执行结果"""
+
+    def __init__(
+        self,
+        context: Dict[str, Any],
+        timings: Dict[str, StageTiming],
+        critical_path: List[str],
+        total_seconds: float,
+        stopped: bool = False,
+        stop_reason: Optional[str] = None,
+        summary: Optional[Dict[str, Any]] = None
+    ):
+        self.context = context
+        self.timings = timings
+        self.critical_path = critical_path
+        self.total_seconds = total_seconds
+        self.stopped = stopped
+        self.stop_reason = stop_reason
+        # 运行摘要 (阶段耗时和本次运行的计数器增量),见 utils.metrics.record_run
+        self.summary = summary
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取上下文中的值"""
+        return self.context.get(key, default)
+
+
+class Pipeline:
+    """DAG 流水线"""
+
+    def __init__(self, stages: List[Stage], max_workers: int = 4, name: str = "pipeline"):
+        """
+        初始化流水线
+
+        Args:
+            stages: 阶段列表
+            max_workers: 并发执行的最大阶段数
+            name: 流水线名称 (用于日志)
+        """
+        self.stages = stages
+        self.max_workers = max_workers
+        self.name = name
+
+        # 输出键 -> 产出它的阶段
+        self.producers: Dict[str, Stage] = {}
+        names = set()
+        for stage in stages:
+            if stage.name in names:
+                raise PipelineError(f"阶段名称重复: {stage.name}")
+            names.add(stage.name)
+            for key in stage.outputs:
+                if key in self.producers:
+                    raise PipelineError(f"输出 {key} 同时由 {self.producers[key].name} 和 {stage.name} 产出")
+                self.producers[key] = stage
+
+    def plan(self, context: Dict[str, Any], targets: Optional[Iterable[str]] = None) -> List[Stage]:
+        """
+        计算需要执行的阶段
+
+        从目标输出向上游回溯,输出已在上下文中的阶段 (例如从缓存恢复的产物) 不再执行
+
+        Args:
+            context: 初始上下文
+            targets: 目标输出键,默认为所有未被其他阶段消费的输出 (最终产物)
+
+        Returns:
+            需要执行的阶段 (保持定义顺序)
+        """
+        if targets is None:
+            consumed = {key for stage in self.stages for key in stage.inputs}
+            targets = [key for stage in self.stages for key in stage.outputs if key not in consumed]
+
+        needed: Dict[str, Stage] = {}
+        stack = [key for key in targets if key not in context]
+        while stack:
+            key = stack.pop()
+            stage = self.producers.get(key)
+            if stage is None:
+                raise PipelineError(f"没有阶段产出 {key}")
+            if stage.name in needed:
+                continue
+            needed[stage.name] = stage
+            stack.extend(k for k in stage.inputs if k not in context)
+
+        return [stage for stage in self.stages if stage.name in needed]
+
+    def run(
+        self,
+        initial: Optional[Dict[str, Any]] = None,
+        targets: Optional[Iterable[str]] = None,
+        profiler=None
+    ) -> PipelineResult:
+        """
+        执行流水线
+
+        Args:
+            initial: 初始上下文 (不由任何阶段产出的输入,或已缓存的中间产物)
+            targets: 只执行产出这些键所需的阶段,默认执行到最终产物
+            profiler: 性能剖析器 (utils.profiling.PipelineProfiler),提供时剖析每个阶段,结束后写入结果
+
+        Returns:
+            PipelineResult
+
+        Raises:
+            PipelineError: 存在无法满足的依赖
+            Exception: 非可选阶段抛出的异常 (附带本次运行的结果,见 failed_result)
+        """
+        context: Dict[str, Any] = dict(initial or {})
+        timings: Dict[str, StageTiming] = {}
+        timings_lock = threading.Lock()
+        stages = self.plan(context, targets)
+        pending = {stage.name: stage for stage in stages}
+        running = {}
+        stopped = False
+        stop_reason = None
+        error: Optional[BaseException] = None
+
+        t0 = time.perf_counter()
+        started_at = time.time()
+        counters_before = metrics.snapshot()
+
+        def execute(stage: Stage, inputs: Dict[str, Any]) -> Dict[str, Any]:
+            start = time.perf_counter() - t0
+            cpu_start = time.thread_time()
+            status = 'failed'
+            try:
+                if profiler is not None:
+                    with profiler.stage(stage.name):
+                        outputs = stage.run(inputs)
+                else:
+                    outputs = stage.run(inputs)
+                status = 'success'
+                return outputs
+            except StopPipeline:
+                status = 'skipped'
+                raise
+            finally:
+                with timings_lock:
+                    timings[stage.name] = StageTiming(
+                        stage.name, start, time.perf_counter() - t0, status, time.thread_time() - cpu_start
+                    )
+
+        skipped = len(self.stages) - len(stages)
+        if skipped:
+            logger.info(f"🚦 流水线 {self.name} 开始: {len(stages)} 个阶段 (跳过 {skipped} 个已有产物或不需要的阶段)")
+        else:
+            logger.info(f"🚦 流水线 {self.name} 开始: {len(stages)} 个阶段")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        if profiler is not None:
+            profiler.start()
+        try:
+            while pending or running:
+                # 提交所有输入已就绪的阶段
+                for name, stage in list(pending.items()):
+                    if all(key in context for key in stage.inputs):
+                        del pending[name]
+                        inputs = {key: context[key] for key in stage.inputs}
+                        running[executor.submit(execute, stage, inputs)] = stage
+                        logger.info(f"▶ 阶段开始: {name}")
+
+                if not running:
+                    missing = {
+                        name: [key for key in stage.inputs if key not in context]
+                        for name, stage in pending.items()
+                    }
+                    raise PipelineError(f"存在无法满足的依赖: {missing}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        context.update(future.result())
+                        logger.info(f"✔ 阶段完成: {stage.name} ({timings[stage.name].duration:.2f}s)")
+                    except StopPipeline as e:
+                        stopped, stop_reason = True, str(e)
+                        logger.info(f"⏹ 阶段 {stage.name} 终止了流水线: {e}")
+                    except Exception as e:
+                        if stage.optional:
+                            logger.warning(f"可选阶段 {stage.name} 失败,继续执行: {e}")
+                            context.update({key: None for key in stage.outputs})
+                        elif error is None:
+                            logger.error(f"✘ 阶段失败: {stage.name}: {e}")
+                            error = e
+
+                if stopped or error is not None:
+                    # 不再提交新阶段,等待已在运行的阶段结束
+                    pending.clear()
+                    for future in list(running):
+                        try:
+                            context.update(future.result())
+                        except Exception:
+                            pass
+                    running.clear()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if profiler is not None:
+                profiler.stop()
+
+        total = time.perf_counter() - t0
+        result = PipelineResult(
+            context=context,
+            timings=timings,
+            critical_path=self._critical_path(timings),
+            total_seconds=total,
+            stopped=stopped,
+            stop_reason=stop_reason
+        )
+        self.log_timings(result)
+        result.summary = metrics.record_run(
+            self.name,
+            'failed' if error is not None else ('stopped' if stopped else 'success'),
+            started_at, total, timings, result.critical_path, counters_before,
+            error=str(error) if error is not None else stop_reason
+        )
+
+        if error is not None:
+            error.pipeline_result = result
+            raise error
+        return result
+
+    def _critical_path(self, timings: Dict[str, StageTiming]) -> List[str]:
+        """
+        计算关键路径: 从最后结束的阶段开始,沿着最晚就绪的输入回溯
+        """
+        if not timings:
+            return []
+
+        stages = {stage.name: stage for stage in self.stages}
+        current = max(timings.values(), key=lambda t: t.end).name
+        path = [current]
+
+        while True:
+            predecessors = [
+                self.producers[key].name for key in stages[current].inputs
+                if key in self.producers and self.producers[key].name in timings
+            ]
+            if not predecessors:
+                break
+            current = max(predecessors, key=lambda name: timings[name].end)
+            path.append(current)
+
+        return list(reversed(path))
+
+    def log_timings(self, result: PipelineResult) -> None:
+        """输出各阶段耗时和关键路径"""
+        logger.info(f"⏱️ 流水线 {self.name} 阶段耗时 (总计 {result.total_seconds:.2f}s):")
+        for timing in sorted(result.timings.values(), key=lambda t: t.start):
+            marker = "*" if timing.name in result.critical_path else " "
+            logger.info(
+                f"  {marker} {timing.name:<16} {timing.start:8.2f}s → {timing.end:8.2f}s "
+                f"({timing.duration:.2f}s, {timing.status})"
+            )
+        if result.critical_path:
+            path_seconds = sum(result.timings[name].duration for name in result.critical_path)
+            logger.info(f"  关键路径: {' → '.join(result.critical_path)} ({path_seconds:.2f}s)")
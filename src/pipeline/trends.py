@@ -0,0 +1,134 @@
+"""
+运行指标的按日趋势
+按日期汇总 run_metrics / stage_metrics (同一天多次运行取中位数),
+并标出相对前一天变化超过阈值的指标,版式或翻译服务商变化带来的性能退化可以第二天就发现
+"""
+
+import statistics
+from typing import Any, Dict, List, Optional
+
+# 参与按日对比的运行指标 -> 显示名称
+RUN_FIELDS = {
+    'duration_seconds': '总耗时(s)',
+    'segments': '片段',
+    'llm_calls': 'LLM调用',
+    'input_tokens': '输入tok',
+    'output_tokens': '输出tok',
+    'images_uploaded': '图片',
+    'image_bytes': '图片字节',
+    'original_html_bytes': '原始HTML',
+    'clipped_html_bytes': '剪切后',
+    'translated_html_bytes': '译文',
+    'formatted_html_bytes': '格式化后',
+}
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def _change(previous: Optional[float], current: Optional[float]) -> Optional[float]:
+    if previous is None or current is None or previous == 0:
+        return None
+    return (current - previous) / previous
+
+
+def daily_trends(runs: List[Any], stages: List[Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    按日期汇总运行指标
+
+    Args:
+        runs: RunMetric 列表 (按开始时间升序)
+        stages: 这些运行的 StageMetric 列表
+        threshold: 相对前一天的变化阈值 (0.2 表示 ±20%)
+
+    Returns:
+        每天一项: {'date', 'runs', 'failed', 'stopped', 'models', 'metrics', 'stages', 'cache_hit_ratio', 'changes'},
+        metrics / stages 只统计成功的运行
+    """
+    stages_by_run: Dict[str, List[Any]] = {}
+    for stage in stages:
+        stages_by_run.setdefault(stage.run_id, []).append(stage)
+
+    by_day: Dict[str, List[Any]] = {}
+    for run in runs:
+        by_day.setdefault(run.started_at.strftime('%Y-%m-%d'), []).append(run)
+
+    days = []
+    for date, day_runs in by_day.items():
+        succeeded = [run for run in day_runs if run.status == 'success']
+        stage_durations: Dict[str, List[float]] = {}
+        for run in succeeded:
+            for stage in stages_by_run.get(run.run_id, []):
+                if stage.status == 'success':
+                    stage_durations.setdefault(stage.stage, []).append(stage.duration_seconds)
+        hits = sum(run.translation_cache_hits or 0 for run in succeeded)
+        misses = sum(run.translation_cache_misses or 0 for run in succeeded)
+        days.append({
+            'date': date,
+            'runs': len(day_runs),
+            'failed': sum(1 for run in day_runs if run.status == 'failed'),
+            'stopped': sum(1 for run in day_runs if run.status == 'stopped'),
+            'models': sorted({f"{run.provider}/{run.model}" for run in succeeded if run.provider}),
+            'metrics': {field: _median([getattr(run, field) for run in succeeded]) for field in RUN_FIELDS},
+            'stages': {name: statistics.median(values) for name, values in stage_durations.items()},
+            'cache_hit_ratio': hits / (hits + misses) if hits + misses else None,
+            'changes': [],
+        })
+
+    # 与前一个有成功运行的日期对比
+    previous = None
+    for day in days:
+        if day['metrics']['duration_seconds'] is None:
+            continue
+        if previous is not None:
+            if day['models'] != previous['models']:
+                day['changes'].append(f"模型 {', '.join(previous['models'])} -> {', '.join(day['models'])}")
+            for label, current, before in (
+                [(RUN_FIELDS[f], day['metrics'][f], previous['metrics'][f]) for f in RUN_FIELDS]
+                + [(f"阶段 {name}", value, previous['stages'].get(name)) for name, value in day['stages'].items()]
+            ):
+                change = _change(before, current)
+                if change is not None and abs(change) > threshold and abs(current - before) >= 0.05:
+                    day['changes'].append(f"{label} {before:g} -> {current:g} ({change:+.0%})")
+        previous = day
+    return days
+
+
+def format_trends(days: List[Dict[str, Any]], max_stage_days: int = 7) -> str:
+    """把 daily_trends 的结果格式化为文本"""
+    if not days:
+        return "没有运行指标"
+
+    def number(value: Optional[float], scale: float = 1, digits: int = 0) -> str:
+        return f"{value / scale:.{digits}f}" if value is not None else "-"
+
+    lines = [
+        f"  {'日期':<12}{'运行':>5}{'失败':>5}{'总耗时(s)':>10}{'片段':>7}{'LLM调用':>8}{'输入tok':>9}{'输出tok':>9}"
+        f"{'缓存命中':>9}{'图片':>5}{'图片KB':>9}{'剪切后KB':>10}{'格式化KB':>10}  模型",
+    ]
+    for day in days:
+        metrics = day['metrics']
+        ratio = f"{day['cache_hit_ratio']:.0%}" if day['cache_hit_ratio'] is not None else "-"
+        lines.append(
+            f"  {day['date']:<12}{day['runs']:>5}{day['failed']:>5}{number(metrics['duration_seconds'], digits=1):>10}"
+            f"{number(metrics['segments']):>7}{number(metrics['llm_calls']):>8}{number(metrics['input_tokens']):>9}"
+            f"{number(metrics['output_tokens']):>9}{ratio:>9}{number(metrics['images_uploaded']):>5}"
+            f"{number(metrics['image_bytes'], 1024):>9}{number(metrics['clipped_html_bytes'], 1024):>10}"
+            f"{number(metrics['formatted_html_bytes'], 1024):>10}  {', '.join(day['models']) or '-'}"
+        )
+
+    recent = [day for day in days if day['stages']][-max_stage_days:]
+    if recent:
+        stage_names = sorted({name for day in recent for name in day['stages']},
+                             key=lambda name: -max(day['stages'].get(name, 0) for day in recent))
+        lines += ["", f"  {'阶段耗时(s)':<24}" + "".join(f"{day['date'][5:]:>9}" for day in recent)]
+        for name in stage_names:
+            lines.append(f"  {name:<24}" + "".join(f"{number(day['stages'].get(name), digits=2):>9}" for day in recent))
+
+    changes = [(day['date'], change) for day in days for change in day['changes']]
+    if changes:
+        lines += ["", "  ⚠️ 相对前一天的显著变化:"]
+        lines += [f"  {date}  {change}" for date, change in changes]
+    return "\n".join(lines)
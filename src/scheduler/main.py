@@ -23,275 +23,80 @@ load_dotenv(override=True)
 
 from src.scheduler.tasks import TaskScheduler
 from src.utils.logger import get_logger
-from src.email.factory import create_email_client
-from src.gmail.parser import EmailParser
-from src.translator.langchain_translator import LangChainTranslator
-from src.wechat.table_based_converter import TableBasedConverter
-from src.wechat.publisher import WeChatPublisher
-from bs4 import BeautifulSoup
-import re
-from datetime import datetime
-import pytz
-import requests
+from src.email.factory import get_shared_email_client, keepalive_shared_clients, close_shared_clients
 
 logger = get_logger(__name__)
 
 
-def download_image(url: str, save_path: Path) -> bool:
-    """下载图片"""
-    try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        return True
-    except Exception as e:
-        logger.error(f"下载图片失败: {e}")
-        return False
+def run_daily_workflow(profile: bool = False) -> bool:
+    """
+    执行每日工作流
 
+    Args:
+        profile: 剖析每个阶段,结果写入产物目录的 profiles/
 
-def clean_greeting(html_content: str) -> str:
-    """清理欢迎语中的个人称呼"""
-    patterns = [
-        r'Good morning,\s+\w+\.',
-        r'Good afternoon,\s+\w+\.',
-        r'Good evening,\s+\w+\.',
-        r'Hello,\s+\w+\.',
-        r'Hi,\s+\w+\.',
-    ]
-    for pattern in patterns:
-        html_content = re.sub(
-            pattern,
-            lambda m: m.group(0).split(',')[0] + '.',
-            html_content,
-            flags=re.IGNORECASE
-        )
-    return html_content
-
-
-def get_title_with_prefix(original_title: str) -> str:
-    """为标题添加日期前缀"""
-    config_path = Path("config/config.yaml")
-    if config_path.exists():
-        with open(config_path, 'r', encoding='utf-8') as f:
-            yaml_config = yaml.safe_load(f)
-            title_prefix_template = yaml_config.get('wechat', {}).get('title_prefix', '【{date}AI早报】')
-    else:
-        title_prefix_template = '【{date}AI早报】'
-    
-    beijing_tz = pytz.timezone('Asia/Shanghai')
-    now = datetime.now(beijing_tz)
-    date_str = now.strftime('%m月%d日').lstrip('0').replace('月0', '月')
-    title_prefix = title_prefix_template.replace('{date}', date_str)
-    return f"{title_prefix}{original_title}"
-
-
-def extract_title_and_digest(html_content: str) -> tuple[str, str]:
-    """从HTML中提取标题和摘要"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # 提取第一个h3作为标题
-    title_elem = soup.find('h3')
-    title = title_elem.get_text(strip=True) if title_elem else "AI早报"
-    
-    # 提取第一个段落作为摘要
-    first_p = soup.find('p')
-    digest = first_p.get_text(strip=True) if first_p else ""
-    
-    # 限制摘要长度
-    if len(digest) > 100:
-        digest = digest[:97] + "..."
-    
-    return title, digest
-
-
-def run_daily_workflow():
-    """执行每日工作流"""
+    Returns:
+        是否执行完成 (流水线主动终止也算完成);失败时为 False,错误已记录到日志
+    """
     logger.info("=" * 70)
     logger.info("🚀 开始执行每日工作流")
     logger.info("=" * 70)
-    
-    try:
-        # 第一步: 获取最新邮件
-        logger.info("\n📧 第一步: 获取最新邮件")
-        logger.info("-" * 70)
-
-        # 初始化邮箱客户端（根据配置自动选择 Gmail API 或 IMAP）
-        email_client = create_email_client()
-        parser = EmailParser()
-        
-        # 从配置读取发件人
-        config_path = Path("config/config.yaml")
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                yaml_config = yaml.safe_load(f)
-                sender_email = yaml_config.get('gmail', {}).get('sender_email', 'news@daily.therundown.ai')
-        else:
-            sender_email = 'news@daily.therundown.ai'
-        
-        logger.info(f"查找发件人: {sender_email}")
-        # 使用 get_latest_email 方法直接获取最新邮件
-        # 策略选项：
-        # - days_back=1: 获取最近1天内的最新邮件（更严格，确保是当天的）
-        # - days_back=7: 获取最近7天内的最新邮件（更宽松，避免漏掉邮件）
-        # email_data = email_client.get_latest_email(sender=sender_email, days_back=1)  # 原策略：最近1天
-        email_data = email_client.get_latest_email(sender=sender_email, days_back=7)  # 当前策略：最近7天
-
-        if not email_data:
-            logger.warning("未找到邮件,跳过本次执行")
-            return
-
-        logger.info("成功获取最新邮件")
-
-        # 解析邮件内容
-        parsed_email = parser.parse_email(email_data)
-        html_content = parsed_email.get('html')
-
-        if not html_content:
-            logger.error("邮件内容为空,跳过本次执行")
-            return
 
-        logger.info(f"✅ 邮件内容大小: {len(html_content)} 字符")
-
-        # 第二步: 剪切邮件内容
-        logger.info("\n✂️  第二步: 剪切邮件内容")
-        logger.info("-" * 70)
-
-        clipped_html = parser.clip_email_html(html_content)
-        logger.info(f"✅ 剪切后内容大小: {len(clipped_html)} 字符")
-        
-        # 保存剪切后的HTML
-        parser.save_html_to_file(clipped_html, "clipped_email", "data")
-        
-        # 第三步: 清理欢迎语并翻译
-        logger.info("\n🌐 第三步: 翻译内容")
-        logger.info("-" * 70)
-        
-        logger.info("清理欢迎语中的个人称呼...")
-        clipped_html = clean_greeting(clipped_html)
-        logger.info("✅ 欢迎语清理完成")
-        
-        # 初始化翻译器
-        translator = LangChainTranslator()
-        
-        # 分块翻译
-        from bs4 import NavigableString
-        soup = BeautifulSoup(clipped_html, 'html.parser')
-        
-        # 找到所有文本节点
-        text_nodes = []
-        for elem in soup.find_all(string=True):
-            if elem.parent.name in ['script', 'style', '[document]', 'head', 'title', 'meta']:
-                continue
-            text = str(elem).strip()
-            if text and len(text) > 3 and any(c.isalpha() for c in text):
-                text_nodes.append(elem)
-        
-        logger.info(f"📝 找到 {len(text_nodes)} 个需要翻译的文本节点")
-
-        # 固定标题映射
-        fixed_titles = {
-            "LATEST DEVELOPMENTS": os.getenv("SECTION_TITLE_LATEST_DEVELOPMENTS", "今日要闻"),
-            "QUICK HITS": os.getenv("SECTION_TITLE_QUICK_HITS", "其他要闻"),
-            "Trending AI Tools": os.getenv("SUBSECTION_TITLE_TRENDING_TOOLS", "🛠️ 热门 AI 工具"),
-            "Everything else in AI today": os.getenv("SUBSECTION_TITLE_EVERYTHING_ELSE", "📰 今天人工智能领域的其他一切"),
-        }
+    # 流水线依赖 (bs4、SQLAlchemy、翻译器等) 在第一次运行时才导入,调度器和健康检查可以尽快启动
+    from src.pipeline import build_daily_pipeline, failed_result
+    from src.pipeline.daily import (
+        load_yaml_config, get_pipeline_options, get_artifact_store, get_wechat_accounts, open_database,
+        save_run_metrics, create_profiler
+    )
 
-        # 翻译每个文本节点
-        for i, text_node in enumerate(text_nodes, 1):
-            original_text = str(text_node).strip()
+    try:
+        # 获取共享邮箱客户端（根据配置自动选择 Gmail API 或 IMAP）
+        # 调度器进程内复用同一个已认证的会话,不必每次运行重新登录
+        email_client = get_shared_email_client()
 
-            if i % 10 == 0 or i == 1:
-                logger.info(f"[{i}/{len(text_nodes)}] 翻译中...")
+        yaml_config = load_yaml_config()
+        sender_email = yaml_config.get('gmail', {}).get('sender_email', 'news@daily.therundown.ai')
+        auto_publish = yaml_config.get('wechat', {}).get('auto_publish', False)
 
-            # 检查是否是固定标题
-            if original_text in fixed_titles:
-                translated_text = fixed_titles[original_text]
-                logger.info(f"使用固定翻译: {original_text} -> {translated_text}")
-            else:
-                translated_text = translator.translate(original_text)
-
-            text_node.replace_with(NavigableString(translated_text))
-        
-        translated_html = str(soup)
-        logger.info("✅ 翻译完成")
-        
-        # 保存翻译后的HTML
-        parser.save_html_to_file(translated_html, "translated_email", "data")
-        
-        # 第四步: 格式化为微信格式
-        logger.info("\n📝 第四步: 格式化为微信公众号格式")
-        logger.info("-" * 70)
-        
-        # 从YAML配置读取是否自动发布
-        auto_publish = False
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                yaml_config = yaml.safe_load(f)
-                auto_publish = yaml_config.get('wechat', {}).get('auto_publish', False)
-        
-        publisher = WeChatPublisher(auto_publish=auto_publish)
-        formatter = TableBasedConverter(publisher=publisher)
-        formatted_html = formatter.convert(translated_html)
-        
-        logger.info(f"✅ 格式化完成")
-        
-        # 保存格式化后的HTML
-        parser.save_html_to_file(formatted_html, "wechat_formatted", "data")
-        
-        # 第五步: 推送到微信公众号
-        logger.info("\n📤 第五步: 推送到微信公众号")
-        logger.info("-" * 70)
-        
-        # 提取标题和摘要
-        title, digest = extract_title_and_digest(formatted_html)
-        title = get_title_with_prefix(title)
-        
-        logger.info(f"标题: {title}")
-        logger.info(f"摘要: {digest}")
-        
-        # 提取第一条新闻的图片作为封面(跳过 banner 图)
-        soup = BeautifulSoup(formatted_html, 'html.parser')
-        all_imgs = soup.find_all('img')
-
-        # 跳过第一张图片(banner 图),使用第二张图片作为封面
-        thumb_media_id = None
-        cover_img = None
-
-        if len(all_imgs) >= 2:
-            # 使用第二张图片(第一条新闻的图片)
-            cover_img = all_imgs[1]
-        elif len(all_imgs) == 1:
-            # 如果只有一张图片,也使用它
-            cover_img = all_imgs[0]
-
-        if cover_img:
-            img_url = cover_img.get('src', '')
-            if img_url and 'http' in img_url:
-                logger.info(f"找到封面图片(第一条新闻): {img_url[:80]}...")
-
-                # 下载图片
-                temp_thumb_path = Path("data/assets/temp_thumb.jpg")
-                if download_image(img_url, temp_thumb_path):
-                    # 上传封面图
-                    thumb_media_id = publisher.upload_thumb_image(str(temp_thumb_path))
-                    logger.info(f"✅ 封面图上传成功")
-        
         # 从Config读取作者名称
         from src.utils.config import Config
-        config = Config()
-        author = config.wechat_author
-        
-        # 发布文章
-        result = publisher.publish_article(
-            title=title,
-            content=formatted_html,
+        author = Config().wechat_author
+
+        logger.info(f"查找发件人: {sender_email}")
+        # 获取邮件 -> 剪切 -> 翻译 -> 格式化 -> 推送,互不依赖的步骤并发执行
+        # 策略选项：
+        # - days_back=1: 获取最近1天内的最新邮件（更严格，确保是当天的）
+        # - days_back=7: 获取最近7天内的最新邮件（更宽松，避免漏掉邮件）
+        store = get_artifact_store()
+        database = open_database()
+        pipeline = build_daily_pipeline(
+            email_client=email_client,
+            sender_email=sender_email,
+            auto_publish=auto_publish,
             author=author,
-            digest=digest,
-            thumb_media_id=thumb_media_id
+            days_back=7,  # 当前策略：最近7天
+            store=store,
+            database=database,
+            accounts=get_wechat_accounts(),
+            **get_pipeline_options()
         )
-        
+        try:
+            run = pipeline.run(profiler=create_profiler(store) if profile else None)
+        except Exception as e:
+            # 失败的运行同样记录阶段耗时和计数器,便于对比 (记录运行前就失败时没有摘要)
+            failed = failed_result(e)
+            if failed is not None:
+                save_run_metrics(database, failed.summary, failed.context)
+            raise
+        save_run_metrics(database, run.summary, run.context)
+        store.evict()
+
+        if run.stopped:
+            logger.warning(f"{run.stop_reason},跳过本次执行")
+            return True
+
+        result = run.get('publish_result')
+
         logger.info("=" * 70)
         if result.get('status') == 'published':
             logger.info("🎉 文章发布成功!")
@@ -301,14 +106,64 @@ def run_daily_workflow():
             logger.info("🎉 草稿创建成功!")
             logger.info(f"Media ID: {result.get('media_id')}")
             logger.info("✅ 请登录微信公众号后台查看草稿箱")
+        for name, account_result in (run.get('publish_results') or {}).items():
+            logger.info(f"  {name}: {account_result.get('status')} "
+                        f"{account_result.get('media_id') or account_result.get('error', '')}")
         logger.info("=" * 70)
-        
+        return True
+
     except Exception as e:
         logger.error(f"工作流执行失败: {e}", exc_info=True)
+        return False
+
 
+def poll_new_emails(profile: bool = False):
+    """
+    增量轮询新邮件,有新邮件时立即执行工作流
 
-def main():
-    """主函数"""
+    仅 Gmail API 支持基于 historyId 的增量同步;每次轮询只返回
+    上次同步之后到达的邮件,足够便宜,可以替代固定时间的 cron
+
+    Args:
+        profile: 剖析触发的工作流
+    """
+    from src.utils.database import Database
+
+    try:
+        email_client = get_shared_email_client()
+        if not hasattr(email_client, 'sync_new_messages'):
+            logger.warning("当前邮箱服务不支持增量同步,跳过轮询")
+            return
+
+        config_path = Path("config/config.yaml")
+        sender_email = 'news@daily.therundown.ai'
+        if config_path.exists():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                yaml_config = yaml.safe_load(f)
+                sender_email = yaml_config.get('gmail', {}).get('sender_email', sender_email)
+
+        # historyId 在工作流成功后才写回,失败时下次轮询重新返回这些邮件
+        database = Database()
+        new_messages = email_client.sync_new_messages(sender_email, database, commit=False)
+        if new_messages:
+            logger.info(f"📬 发现 {len(new_messages)} 封新邮件,开始执行工作流")
+            if not run_daily_workflow(profile=profile):
+                logger.warning("工作流未成功完成,保留同步位置,下次轮询重试")
+                return
+        else:
+            logger.info("没有新邮件")
+        email_client.commit_sync(database)
+    except Exception as e:
+        logger.error(f"轮询新邮件失败: {e}", exc_info=True)
+
+
+def main(profile: bool = False):
+    """
+    主函数
+
+    Args:
+        profile: 剖析每次工作流运行,结果写入产物目录的 profiles/
+    """
     logger.info("🚀 Plab-Rundown 定时任务启动")
 
     # 加载配置
@@ -317,11 +172,13 @@ def main():
         with open(config_path, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
             scheduler_config = config.get('scheduler', {})
+            email_config = config.get('email', {})
     else:
         scheduler_config = {
             'timezone': 'Asia/Shanghai',
             'cron': {'hour': 9, 'minute': 0}
         }
+        email_config = {}
 
     # 创建调度器
     timezone = scheduler_config.get('timezone', 'Asia/Shanghai')
@@ -332,14 +189,36 @@ def main():
     hour = cron_config.get('hour', 9)
     minute = cron_config.get('minute', 0)
 
-    scheduler.add_daily_task(
-        task_func=run_daily_workflow,
-        hour=hour,
-        minute=minute,
-        task_id='daily_rundown'
-    )
+    poll_config = scheduler_config.get('poll', {})
+    if poll_config.get('enabled', False):
+        # 增量轮询模式: 新邮件到达后立即处理,替代固定时间任务
+        interval_minutes = poll_config.get('interval_minutes', 10)
+        scheduler.add_interval_task(
+            task_func=poll_new_emails,
+            kwargs={'profile': profile},
+            minutes=interval_minutes,
+            task_id='poll_rundown'
+        )
+        logger.info(f"✅ 已设置增量轮询任务: 每 {interval_minutes} 分钟")
+    else:
+        scheduler.add_daily_task(
+            task_func=run_daily_workflow,
+            kwargs={'profile': profile},
+            hour=hour,
+            minute=minute,
+            task_id='daily_rundown'
+        )
 
-    logger.info(f"✅ 已设置每日任务: {hour:02d}:{minute:02d} ({timezone})")
+        logger.info(f"✅ 已设置每日任务: {hour:02d}:{minute:02d} ({timezone})")
+
+    # IMAP 共享连接保活 (服务器通常会在约 30 分钟空闲后断开)
+    if email_config.get('provider') == 'imap':
+        keepalive_interval = email_config.get('imap', {}).get('keepalive_interval', 600)
+        scheduler.add_interval_task(
+            task_func=keepalive_shared_clients,
+            seconds=keepalive_interval,
+            task_id='email_keepalive'
+        )
 
     # 启动调度器
     scheduler.start()
@@ -350,21 +229,37 @@ def main():
 
     # 保持运行
     logger.info("✅ 调度器运行中,按 Ctrl+C 退出")
-    scheduler.keep_alive()
+    try:
+        scheduler.keep_alive()
+    finally:
+        close_shared_clients()
 
 
 def start_health_server(port: int, scheduler: TaskScheduler):
-    """启动健康检查HTTP服务器"""
-    from http.server import HTTPServer, BaseHTTPRequestHandler
+    """
+    启动健康检查HTTP服务器
+
+    - /health, /: 调度器状态
+    - /metrics: Prometheus 指标 (阶段耗时、LLM 请求/token、缓存命中、上传字节数、最近运行状态)
+    - /runs/latest: 最近一次流水线运行的摘要 (JSON)
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    import json
     import threading
+    from src.utils import metrics
 
     class HealthHandler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            if self.path == '/health' or self.path == '/':
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
+        def _send(self, code: int, body: str, content_type: str = 'application/json'):
+            payload = body.encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
 
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == '/health' or path == '/':
                 # 获取调度器状态
                 jobs = scheduler.scheduler.get_jobs()
                 status = {
@@ -380,9 +275,15 @@ def start_health_server(port: int, scheduler: TaskScheduler):
                         for job in jobs
                     ]
                 }
-
-                import json
-                self.wfile.write(json.dumps(status, indent=2).encode())
+                self._send(200, json.dumps(status, indent=2))
+            elif path == '/metrics':
+                self._send(200, metrics.REGISTRY.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            elif path == '/runs/latest':
+                latest = metrics.latest_run()
+                if latest is None:
+                    self._send(404, json.dumps({'error': '本进程尚未运行过流水线'}, ensure_ascii=False))
+                else:
+                    self._send(200, json.dumps(latest, ensure_ascii=False, indent=2))
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -392,8 +293,10 @@ def start_health_server(port: int, scheduler: TaskScheduler):
             pass
 
     def run_server():
-        server = HTTPServer(('0.0.0.0', port), HealthHandler)
-        logger.info(f"✅ 健康检查服务器启动: http://0.0.0.0:{port}/health")
+        # 多线程处理请求,慢速抓取不会阻塞健康检查
+        server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
+        server.daemon_threads = True
+        logger.info(f"✅ 健康检查服务器启动: http://0.0.0.0:{port}/health (指标: /metrics, 最近运行: /runs/latest)")
         server.serve_forever()
 
     # 在后台线程运行HTTP服务器
@@ -402,5 +305,10 @@ def start_health_server(port: int, scheduler: TaskScheduler):
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plab-Rundown 定时任务")
+    parser.add_argument('--profile', action='store_true',
+                        help="剖析每次工作流运行,profile 文件和火焰图折叠栈写入产物目录的 profiles/")
+    main(profile=parser.parse_args().profile)
 
@@ -4,7 +4,7 @@
 
 import time
 from datetime import datetime
-from typing import Callable, Optional
+from typing import Any, Callable, Dict, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pytz
@@ -35,7 +35,8 @@ class TaskScheduler:
         task_func: Callable,
         hour: int,
         minute: int = 0,
-        task_id: str = "daily_task"
+        task_id: str = "daily_task",
+        kwargs: Optional[Dict[str, Any]] = None
     ) -> None:
         """
         添加每日定时任务
@@ -45,6 +46,7 @@ class TaskScheduler:
             hour: 小时 (0-23)
             minute: 分钟 (0-59)
             task_id: 任务 ID
+            kwargs: 传给任务函数的关键字参数
         """
         trigger = CronTrigger(
             hour=hour,
@@ -55,6 +57,7 @@ class TaskScheduler:
         self.scheduler.add_job(
             task_func,
             trigger=trigger,
+            kwargs=kwargs,
             id=task_id,
             name=f"Daily task at {hour:02d}:{minute:02d}",
             replace_existing=True
@@ -68,7 +71,8 @@ class TaskScheduler:
         hours: int = 0,
         minutes: int = 0,
         seconds: int = 0,
-        task_id: str = "interval_task"
+        task_id: str = "interval_task",
+        kwargs: Optional[Dict[str, Any]] = None
     ) -> None:
         """
         添加间隔执行任务
@@ -79,6 +83,7 @@ class TaskScheduler:
             minutes: 间隔分钟数
             seconds: 间隔秒数
             task_id: 任务 ID
+            kwargs: 传给任务函数的关键字参数
         """
         self.scheduler.add_job(
             task_func,
@@ -86,6 +91,7 @@ class TaskScheduler:
             hours=hours,
             minutes=minutes,
             seconds=seconds,
+            kwargs=kwargs,
             id=task_id,
             replace_existing=True
         )
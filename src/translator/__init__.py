@@ -2,7 +2,27 @@
 AI 翻译模块
 """
 
-from .langchain_translator import LangChainTranslator
+from importlib import import_module
 
-__all__ = ["LangChainTranslator"]
+# 按需导入: 使用检查点、变体等子模块时不必加载 LangChain
+_EXPORTS = {
+    "LangChainTranslator": ".langchain_translator",
+    "TranslationCheckpoint": ".checkpoint",
+    "TranslationMemory": ".memory",
+    "RateLimiter": ".rate_limit",
+    "RateLimitedTranslator": ".rate_limit",
+    "ChineseConverter": ".variants",
+    "FakeChatModel": ".fake_llm",
+    "OpenAIHTTPChatModel": ".openai_http",
+    "LocalMTModel": ".local_mt",
+    "ModelRouter": ".router",
+    "Segment": ".segmenter",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
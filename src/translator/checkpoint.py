@@ -0,0 +1,79 @@
+"""
+翻译检查点
+每个文本片段翻译完成后立即写入数据库,同一封邮件重跑时只翻译缺失的片段
+"""
+
+import hashlib
+import threading
+from typing import Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranslationCheckpoint:
+    """按邮件 ID 保存的片段级翻译检查点"""
+
+    def __init__(self, database, email_id: str):
+        """
+        初始化检查点并加载已完成的片段
+
+        Args:
+            database: Database 实例
+            email_id: 邮件 ID
+        """
+        self.database = database
+        self.email_id = email_id
+        self._lock = threading.Lock()
+        self._segments = database.get_translation_segments(email_id)
+
+        if self._segments:
+            logger.info(f"♻️ 加载翻译检查点: {email_id} 已完成 {len(self._segments)} 个片段")
+
+    @staticmethod
+    def segment_hash(text: str) -> str:
+        """片段哈希 (相同原文共用同一条译文)"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, text: str) -> Optional[str]:
+        """
+        读取片段译文
+
+        Args:
+            text: 原文
+
+        Returns:
+            译文,未完成时返回 None
+        """
+        with self._lock:
+            return self._segments.get(self.segment_hash(text))
+
+    def __contains__(self, text: str) -> bool:
+        """片段是否已完成"""
+        return self.get(text) is not None
+
+    def put(self, text: str, translation: str) -> None:
+        """
+        保存片段译文 (立即提交)
+
+        Args:
+            text: 原文
+            translation: 译文
+        """
+        segment_hash = self.segment_hash(text)
+        self.database.save_translation_segment(self.email_id, segment_hash, text, translation)
+        with self._lock:
+            self._segments[segment_hash] = translation
+
+    def clear(self) -> None:
+        """删除该邮件的检查点 (文章发布后不再需要)"""
+        count = self.database.delete_translation_segments(self.email_id)
+        with self._lock:
+            self._segments.clear()
+        if count:
+            logger.info(f"已清理翻译检查点: {self.email_id} ({count} 个片段)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._segments)
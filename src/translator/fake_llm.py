@@ -0,0 +1,218 @@
+"""
+确定性的模拟 LLM (provider: fake)
+不调用任何外部服务,返回由原文确定的伪译文;可配置延迟分布、429/超时注入率,
+并统计 token 用量和延迟分位数,用于离线测量并发、限速和重试行为
+"""
+
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict, Field
+
+from .tracing import percentile
+
+LATENCY_DISTRIBUTIONS = ("fixed", "lognormal", "heavy_tail")
+
+# 翻译提示词中原文所在的位置 (与 LangChainTranslator 的模板对应)
+SOURCE_PATTERN = re.compile(r"原文：\s*(.*?)\s*翻译结果：", re.S)
+WORD_PATTERN = re.compile(r"[A-Za-z]+|[^A-Za-z]+")
+
+
+class FakeRateLimitError(Exception):
+    """模拟的 429 Too Many Requests"""
+
+    status_code = 429
+
+
+class FakeTimeoutError(TimeoutError):
+    """模拟的请求超时"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数: 中文约 1 字 1 token,其他字符约 4 个 1 token"""
+    cjk = sum(1 for c in text if '一' <= c <= '鿿')
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def pseudo_translate(text: str) -> str:
+    """
+    生成确定性的伪译文
+
+    英文单词按哈希映射为长度相近的汉字,首字母大写的词 (专有名词) 和数字、标点保持不变,
+    相同原文总是得到相同结果
+
+    Args:
+        text: 原文
+
+    Returns:
+        伪译文
+    """
+    parts = []
+    for token in WORD_PATTERN.findall(text):
+        if not token.isalpha() or token[0].isupper():
+            parts.append(token)
+            continue
+        seed = zlib.crc32(token.lower().encode('utf-8'))
+        length = max(1, len(token) // 3)
+        parts.append(''.join(chr(0x4e00 + (seed >> (i * 3)) % 0x51a5) for i in range(length)))
+    # 中文不需要单词间的空格
+    return re.sub(r'(?<=[一-鿿]) (?=[一-鿿])', '', ''.join(parts))
+
+
+class FakeLLMStats:
+    """模拟 LLM 的调用统计 (线程安全)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._occurrences: Dict[str, int] = {}
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: List[float] = []
+
+    def next_occurrence(self, prompt: str) -> int:
+        """同一提示词的第几次调用 (重试时抽取不同的随机数)"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            count = self._occurrences.get(digest, 0)
+            self._occurrences[digest] = count + 1
+            return count
+
+    def record(self, latency: float, input_tokens: int, output_tokens: int = 0, error: Optional[str] = None) -> None:
+        """记录一次调用"""
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency)
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """延迟分位数 (秒)"""
+        with self._lock:
+            latencies = list(self.latencies)
+        return percentile(latencies, q)
+
+    def summary(self) -> Dict[str, Any]:
+        """统计摘要"""
+        return {
+            'calls': self.calls,
+            'errors': dict(self.errors),
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'p50_seconds': self.percentile(50),
+            'p95_seconds': self.percentile(95),
+            'p99_seconds': self.percentile(99),
+            'max_seconds': self.percentile(100),
+        }
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    确定性的模拟聊天模型
+
+    每次调用的随机数由 "种子 + 提示词 + 该提示词的调用次数" 决定,
+    与线程调度顺序无关,同样的输入和配置总是得到同样的延迟和错误序列
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str = "fake-translator"
+    latency: str = "fixed"
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.5
+    tail_alpha: float = 1.5
+    ms_per_output_token: float = 0.0
+    rate_limit_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    seed: int = 0
+    stats: FakeLLMStats = Field(default_factory=FakeLLMStats)
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"不支持的延迟分布: {self.latency},支持: {', '.join(LATENCY_DISTRIBUTIONS)}")
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-translator"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            'model_name': self.model_name,
+            'latency': self.latency,
+            'latency_ms': self.latency_ms,
+            'seed': self.seed,
+        }
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """
+        按配置的分布抽取延迟 (秒)
+
+        - fixed: 固定为 latency_ms
+        - lognormal: 中位数为 latency_ms、对数标准差为 latency_sigma 的对数正态分布
+        - heavy_tail: 最小值为 latency_ms、形状参数为 tail_alpha 的帕累托分布 (偶发极慢请求)
+        """
+        base = self.latency_ms / 1000
+        if self.latency == "lognormal":
+            return rng.lognormvariate(math.log(base), self.latency_sigma) if base > 0 else 0.0
+        if self.latency == "heavy_tail":
+            return base * rng.paretovariate(self.tail_alpha)
+        return base
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = random.Random(f"{self.seed}:{prompt}:{self.stats.next_occurrence(prompt)}")
+        input_tokens = estimate_tokens(prompt)
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            self.stats.record(0.0, input_tokens, error='rate_limit')
+            raise FakeRateLimitError("Error code: 429 - Rate limit reached (fake)")
+
+        source = messages[-1].content if messages else ""
+        match = SOURCE_PATTERN.search(str(source))
+        translated = pseudo_translate(match.group(1) if match else str(source))
+        output_tokens = estimate_tokens(translated)
+
+        delay = self.sample_latency(rng) + output_tokens * self.ms_per_output_token / 1000
+        if roll < self.rate_limit_rate + self.timeout_rate or delay > self.timeout_seconds:
+            time.sleep(self.timeout_seconds)
+            self.stats.record(self.timeout_seconds, input_tokens, error='timeout')
+            raise FakeTimeoutError(f"Request timed out after {self.timeout_seconds}s (fake)")
+
+        time.sleep(delay)
+        self.stats.record(delay, input_tokens, output_tokens)
+
+        usage = {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens
+        }
+        message = AIMessage(
+            content=translated,
+            usage_metadata=usage,
+            response_metadata={'model_name': self.model_name, 'finish_reason': 'stop'}
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={'token_usage': usage, 'model_name': self.model_name}
+        )
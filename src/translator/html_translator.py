@@ -0,0 +1,579 @@
+"""
+HTML 文本节点翻译
+遍历 HTML 中需要翻译的文本节点并逐个替换为译文;按块翻译时 (segmentation='block')
+同一段落的文本节点合并为一个带行内标签占位符的片段,见 segmenter.py
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from .checkpoint import TranslationCheckpoint
+from .segmenter import Segment, group_segments
+from ..utils import metrics
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 这些标签中的文本不翻译
+SKIP_PARENT_TAGS = ['script', 'style', '[document]', 'head', 'title', 'meta']
+
+# 标题标签,以及判断加粗文字是否独占一块时的块级标签
+HEADLINE_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+BLOCK_TAGS = HEADLINE_TAGS | {'p', 'li', 'td', 'div'}
+# 计入标记密度的行内标签 (span 在邮件里包裹所有文字,不计入)
+MARKUP_TAGS = ['a', 'b', 'strong', 'i', 'em', 'u', 'code']
+
+# 翻译单元: node 逐个文本节点翻译; block 按段落/列表项/标题整块翻译,行内标签替换为占位符
+SEGMENTATION_MODES = ('node', 'block')
+
+# 翻译单元: 文本节点或整块片段
+TranslationUnit = Union[NavigableString, Segment]
+
+
+class TranslationIncompleteError(Exception):
+    """翻译完成度低于发布阈值"""
+
+
+class DegradedPolicy:
+    """降级翻译策略: 失败的片段先保留原文,主流程结束后按退避间隔重试"""
+
+    def __init__(
+        self,
+        retry_rounds: int = 3,
+        retry_delay: float = 5.0,
+        min_completeness: float = 0.95,
+        failed_marker: str = ""
+    ):
+        """
+        初始化降级策略
+
+        Args:
+            retry_rounds: 重试队列的最大轮数
+            retry_delay: 第一轮重试前的等待秒数,之后每轮翻倍
+            min_completeness: 允许发布的最低完成度 (0~1)
+            failed_marker: 仍未翻译成功的片段前添加的标记 (为空则只保留原文)
+        """
+        self.retry_rounds = retry_rounds
+        self.retry_delay = retry_delay
+        self.min_completeness = min_completeness
+        self.failed_marker = failed_marker
+
+
+class TranslationReport:
+    """
+    翻译完成度统计和重试队列
+
+    传入翻译函数后进入降级模式: 单个片段失败不再中断整个翻译,
+    而是保留原文并加入重试队列
+    """
+
+    def __init__(self, policy: Optional[DegradedPolicy] = None):
+        self.policy = policy or DegradedPolicy()
+        self.total = 0
+        self.recovered = 0
+        self.retry_queue: List[tuple] = []  # (文本节点, 原文)
+        self._lock = threading.Lock()
+
+    def add_total(self, count: int) -> None:
+        with self._lock:
+            self.total += count
+
+    def add_failure(self, text_node: NavigableString, original_text: str, error: Exception) -> None:
+        logger.warning(f"片段翻译失败,保留原文并加入重试队列: {original_text[:50]}... ({error})")
+        with self._lock:
+            self.retry_queue.append((text_node, original_text))
+
+    @property
+    def failed(self) -> int:
+        return len(self.retry_queue)
+
+    @property
+    def completeness(self) -> float:
+        if self.total == 0:
+            return 1.0
+        return (self.total - self.failed) / self.total
+
+    @property
+    def complete(self) -> bool:
+        return not self.retry_queue
+
+    def drain(self, translator, checkpoint: Optional[TranslationCheckpoint] = None) -> None:
+        """
+        按退避间隔重试失败的片段,最多 retry_rounds 轮
+
+        Args:
+            translator: 翻译器
+            checkpoint: 翻译检查点 (可选)
+        """
+        for round_index in range(self.policy.retry_rounds):
+            if not self.retry_queue:
+                break
+
+            wait_time = self.policy.retry_delay * (2 ** round_index)
+            logger.info(f"🔁 重试队列第 {round_index + 1}/{self.policy.retry_rounds} 轮: "
+                        f"{len(self.retry_queue)} 个片段, {wait_time:.0f}秒后开始")
+            time.sleep(wait_time)
+
+            pending, self.retry_queue = self.retry_queue, []
+            for text_node, original_text in pending:
+                try:
+                    translated_text = translator.translate(original_text)
+                except Exception as e:
+                    logger.warning(f"重试失败: {original_text[:50]}... ({e})")
+                    self.retry_queue.append((text_node, original_text))
+                    continue
+
+                save_checkpoint(checkpoint, original_text, translated_text)
+                text_node.replace_with(NavigableString(translated_text))
+                self.recovered += 1
+
+        # 仍失败的片段按策略添加标记
+        if self.retry_queue and self.policy.failed_marker:
+            marked = []
+            for text_node, original_text in self.retry_queue:
+                marked_node = NavigableString(f"{self.policy.failed_marker}{original_text}")
+                text_node.replace_with(marked_node)
+                marked.append((marked_node, original_text))
+            self.retry_queue = marked
+
+    def check(self) -> None:
+        """
+        检查完成度是否达到发布阈值
+
+        Raises:
+            TranslationIncompleteError: 完成度低于阈值
+        """
+        if self.complete:
+            return
+
+        message = (f"翻译完成度 {self.completeness:.1%} ({self.failed}/{self.total} 个片段未翻译), "
+                   f"发布阈值 {self.policy.min_completeness:.0%}")
+        if self.completeness < self.policy.min_completeness:
+            raise TranslationIncompleteError(message)
+        logger.warning(f"⚠️ 降级发布: {message}")
+
+
+def save_checkpoint(checkpoint: Optional[TranslationCheckpoint], original_text: str, translated_text: str) -> None:
+    """
+    写入检查点;写入失败只记录警告 (译文已经得到,检查点只影响重跑时能否复用)
+
+    Args:
+        checkpoint: 翻译检查点 (为 None 时不写入)
+        original_text: 原文
+        translated_text: 译文
+    """
+    if checkpoint is None:
+        return
+    try:
+        checkpoint.put(original_text, translated_text)
+    except Exception as e:
+        logger.warning(f"⚠️ 写入翻译检查点失败,继续翻译: {original_text[:50]}... ({e})")
+
+
+def get_fixed_titles() -> Dict[str, str]:
+    """固定标题映射 (不经过 LLM,直接使用配置的译文)"""
+    return {
+        "LATEST DEVELOPMENTS": os.getenv("SECTION_TITLE_LATEST_DEVELOPMENTS", "今日要闻"),
+        "QUICK HITS": os.getenv("SECTION_TITLE_QUICK_HITS", "其他要闻"),
+        "Trending AI Tools": os.getenv("SUBSECTION_TITLE_TRENDING_TOOLS", "🛠️ 热门 AI 工具"),
+        "Everything else in AI today": os.getenv("SUBSECTION_TITLE_EVERYTHING_ELSE", "📰 今天人工智能领域的其他一切"),
+    }
+
+
+def extract_text_nodes(soup) -> List[NavigableString]:
+    """
+    找到所有需要翻译的文本节点
+
+    Args:
+        soup: BeautifulSoup 文档或其中的某个元素
+
+    Returns:
+        文本节点列表 (按文档顺序)
+    """
+    text_nodes = []
+    for elem in soup.find_all(string=True):
+        if elem.parent.name in SKIP_PARENT_TAGS:
+            continue
+        text = str(elem).strip()
+        if text and len(text) > 3 and any(c.isalpha() for c in text):
+            text_nodes.append(elem)
+    return text_nodes
+
+
+def group_units(
+    text_nodes: List[NavigableString],
+    segmentation: str = 'node',
+    fixed_titles: Optional[Dict[str, str]] = None
+) -> List[TranslationUnit]:
+    """
+    把文本节点组织为翻译单元
+
+    Args:
+        text_nodes: extract_text_nodes 的结果
+        segmentation: 'node' 或 'block'
+        fixed_titles: 固定标题映射;包含固定标题的块 (如 "🛠️ <b>Trending AI Tools</b>")
+            仍逐个文本节点翻译,标题继续使用固定译文
+
+    Returns:
+        翻译单元列表 (按文档顺序)
+    """
+    if segmentation not in SEGMENTATION_MODES:
+        raise ValueError(f"未知的翻译单元: {segmentation} (可选: {', '.join(SEGMENTATION_MODES)})")
+    if segmentation == 'node':
+        return list(text_nodes)
+
+    units: List[TranslationUnit] = []
+    for unit in group_segments(text_nodes):
+        if isinstance(unit, Segment) and unit.text not in (fixed_titles or {}) and any(
+            str(text_node).strip() in (fixed_titles or {}) for text_node in unit.text_nodes
+        ):
+            units.extend(unit.text_nodes)
+        else:
+            units.append(unit)
+    return units
+
+
+def unit_text(unit: TranslationUnit) -> str:
+    """翻译单元的原文 (片段为带占位符的文本)"""
+    if isinstance(unit, Segment):
+        return unit.text
+    return str(unit).strip()
+
+
+def _lookup_translation(
+    original_text: str,
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint] = None
+) -> Tuple[str, bool]:
+    """
+    取得译文: 固定标题 > 检查点 > 调用翻译器
+
+    Returns:
+        (译文, 是否为新译文 (需要写入检查点))
+    """
+    # 检查是否是固定标题
+    if original_text in fixed_titles:
+        translated_text = fixed_titles[original_text]
+        logger.info(f"使用固定翻译: {original_text} -> {translated_text}")
+        return translated_text, False
+
+    metrics.TRANSLATION_SEGMENTS.inc()
+    translated_text = checkpoint.get(original_text) if checkpoint is not None else None
+    if checkpoint is not None:
+        metrics.TRANSLATION_CACHE.inc(result='hit' if translated_text is not None else 'miss')
+    if translated_text is not None:
+        tracer = getattr(translator, 'tracer', None)
+        if tracer is not None:
+            tracer.record_cache_hit(original_text)
+        return translated_text, False
+    return translator.translate(original_text), True
+
+
+# 对文档的一次修改 (替换文本节点或还原整块),由 prepare_text_nodes 生成
+Edit = Callable[[], None]
+
+
+def _translate_node(
+    text_node: NavigableString,
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint],
+    report: Optional[TranslationReport]
+) -> List[Edit]:
+    original_text = str(text_node).strip()
+    try:
+        translated_text, is_new = _lookup_translation(original_text, translator, fixed_titles, checkpoint)
+    except Exception as e:
+        if report is None:
+            raise
+        report.add_failure(text_node, original_text, e)
+        return []
+    if is_new:
+        save_checkpoint(checkpoint, original_text, translated_text)
+    return [lambda: text_node.replace_with(NavigableString(translated_text))]
+
+
+def _translate_segment(
+    segment: Segment,
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint],
+    report: Optional[TranslationReport]
+) -> List[Edit]:
+    """整块翻译;占位符无法还原 (或降级模式下翻译失败) 时退回逐个文本节点翻译"""
+    try:
+        translated_text, is_new = _lookup_translation(segment.text, translator, fixed_titles, checkpoint)
+    except Exception as e:
+        if report is None:
+            raise
+        logger.warning(f"块翻译失败,改为逐个文本节点翻译: {segment.text[:50]}... ({e})")
+        reason = 'error'
+    else:
+        tree = segment.parse(translated_text)
+        if tree is not None:
+            # 只保存还原成功的译文,检查点中不会有占位符错乱的结果
+            if is_new:
+                save_checkpoint(checkpoint, segment.text, translated_text)
+            return [lambda: segment.apply(tree)]
+        logger.warning(f"译文中的占位符无法还原,改为逐个文本节点翻译: {segment.text[:50]}... -> {translated_text[:50]}...")
+        reason = 'placeholders'
+
+    metrics.TRANSLATION_SEGMENT_FALLBACKS.inc(reason=reason)
+    if report is not None:
+        # 完成度按翻译单元统计,退回后该块按文本节点计数
+        report.add_total(len(segment.text_nodes) - 1)
+    edits: List[Edit] = []
+    for text_node in segment.text_nodes:
+        edits.extend(_translate_node(text_node, translator, fixed_titles, checkpoint, report))
+    return edits
+
+
+def prepare_text_nodes(
+    text_nodes: List[TranslationUnit],
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint] = None,
+    report: Optional[TranslationReport] = None
+) -> List[Edit]:
+    """
+    翻译文本节点,但不修改文档
+
+    BeautifulSoup 的文档树不是线程安全的: 多线程翻译时各线程只调用本函数,
+    返回的修改由一个线程按文档顺序依次执行
+
+    Args:
+        text_nodes: 需要翻译的文本节点或整块片段 (group_units 的结果)
+        translator: 翻译器 (需提供 translate 方法)
+        fixed_titles: 固定标题映射
+        checkpoint: 翻译检查点;已完成的片段直接复用,新译文逐条保存
+        report: 提供时进入降级模式,失败的片段保留原文并加入重试队列;
+            否则异常直接抛出
+
+    Returns:
+        对文档的修改 (按顺序调用)
+    """
+    if report is not None:
+        report.add_total(len(text_nodes))
+
+    edits: List[Edit] = []
+    for unit in text_nodes:
+        if isinstance(unit, Segment):
+            edits.extend(_translate_segment(unit, translator, fixed_titles, checkpoint, report))
+        else:
+            edits.extend(_translate_node(unit, translator, fixed_titles, checkpoint, report))
+    return edits
+
+
+def apply_edits(edits: List[Edit]) -> None:
+    """按顺序执行 prepare_text_nodes 返回的修改"""
+    for edit in edits:
+        edit()
+
+
+def translate_text_nodes(
+    text_nodes: List[TranslationUnit],
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint] = None,
+    report: Optional[TranslationReport] = None
+) -> None:
+    """
+    翻译文本节点并原地替换
+
+    Args:
+        text_nodes: 需要翻译的文本节点或整块片段 (group_units 的结果)
+        translator: 翻译器 (需提供 translate 方法)
+        fixed_titles: 固定标题映射
+        checkpoint: 翻译检查点;已完成的片段直接复用,新译文逐条保存
+        report: 提供时进入降级模式,失败的片段保留原文并加入重试队列;
+            否则异常直接抛出
+    """
+    apply_edits(prepare_text_nodes(text_nodes, translator, fixed_titles, checkpoint, report))
+
+
+def segment_hints(text_node: TranslationUnit) -> Dict[str, Any]:
+    """
+    片段的路由提示
+
+    - headline: 位于 h1-h6 中,或加粗/链接中的文字就是所在块的全部文字 (文章标题、小标题)
+    - markup_density: 所在块中链接、加粗等行内标签数 / 单词数 (标签越密,按文本节点拆开后越缺上下文)
+
+    Args:
+        text_node: 文本节点或整块片段 (按块中第一个文本节点判断)
+
+    Returns:
+        {'headline': bool, 'markup_density': float}
+    """
+    if isinstance(text_node, Segment):
+        text_node = text_node.text_nodes[0]
+    emphasis = None
+    for parent in text_node.parents:
+        if parent.name in HEADLINE_TAGS:
+            return {'headline': True, 'markup_density': 0.0}
+        if parent.name in ('b', 'strong') and emphasis is None:
+            emphasis = parent
+        if parent.name in BLOCK_TAGS:
+            block_text = parent.get_text(" ", strip=True)
+            words = max(1, len(block_text.split()))
+            return {
+                'headline': emphasis is not None and emphasis.get_text(" ", strip=True) == block_text,
+                'markup_density': len(parent.find_all(MARKUP_TAGS)) / words,
+            }
+    return {'headline': False, 'markup_density': 0.0}
+
+
+def prefetch_text_nodes(
+    text_nodes: List[TranslationUnit],
+    translator,
+    fixed_titles: Dict[str, str],
+    checkpoint: Optional[TranslationCheckpoint] = None
+) -> None:
+    """
+    支持批量推理的翻译器 (本地模型、模型路由器) 先一次性提交所有未缓存的片段
+
+    固定标题和检查点中已有的片段不参与;翻译器没有 prefetch 方法时什么也不做。
+    片段的路由提示 (是否为标题、标记密度) 一并传给翻译器
+
+    Args:
+        text_nodes: 需要翻译的文本节点或整块片段
+        translator: 翻译器
+        fixed_titles: 固定标题映射
+        checkpoint: 翻译检查点 (可选)
+    """
+    prefetch = getattr(translator, 'prefetch', None)
+    if prefetch is None or not getattr(translator, 'supports_batch', False):
+        return
+    texts = []
+    hints = {}
+    for text_node in text_nodes:
+        text = unit_text(text_node)
+        # 只判断是否已有译文 (不计入翻译记忆的命中率,翻译时才计数)
+        if text in fixed_titles or (checkpoint is not None and text in checkpoint):
+            continue
+        texts.append(text)
+        hints[text] = segment_hints(text_node)
+    prefetch(texts, hints)
+
+
+def translate_html(
+    html_content: str,
+    translator,
+    checkpoint: Optional[TranslationCheckpoint] = None,
+    report: Optional[TranslationReport] = None,
+    segmentation: str = 'node'
+) -> str:
+    """
+    翻译 HTML 中的所有文本节点,保留原有结构
+
+    Args:
+        html_content: 要翻译的 HTML
+        translator: 翻译器 (需提供 translate 方法)
+        checkpoint: 翻译检查点 (可选)
+        report: 降级模式的完成度统计 (可选),主流程结束后会排空重试队列
+        segmentation: 翻译单元,'node' 逐个文本节点翻译,'block' 按块翻译
+
+    Returns:
+        翻译后的 HTML
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    text_nodes = extract_text_nodes(soup)
+    fixed_titles = get_fixed_titles()
+    units = group_units(text_nodes, segmentation, fixed_titles)
+    logger.info(f"📝 找到 {len(text_nodes)} 个需要翻译的文本节点"
+                + (f",合并为 {len(units)} 个翻译单元" if len(units) != len(text_nodes) else ""))
+
+    prefetch_text_nodes(units, translator, fixed_titles, checkpoint)
+
+    # 翻译每个单元
+    for i, unit in enumerate(units, 1):
+        if i % 10 == 0 or i == 1:
+            logger.info(f"[{i}/{len(units)}] 翻译中...")
+        translate_text_nodes([unit], translator, fixed_titles, checkpoint, report)
+
+    if report is not None:
+        report.drain(translator, checkpoint)
+
+    logger.info("✅ 翻译完成")
+    return str(soup)
+
+
+def translate_html_blocks(
+    soup: BeautifulSoup,
+    translator,
+    max_workers: int = 1,
+    checkpoint: Optional[TranslationCheckpoint] = None,
+    report: Optional[TranslationReport] = None,
+    segmentation: str = 'node'
+) -> Iterator[Tag]:
+    """
+    以顶层 TR 为单位翻译,按文档顺序逐块产出已翻译的 TR
+
+    调用方可以在后续块仍在翻译时格式化已完成的块;生成器结束后
+    soup 即为完整的译文 (与 translate_html 的结果一致)
+
+    Args:
+        soup: 要翻译的文档 (原地修改)
+        translator: 翻译器 (需提供 translate 方法)
+        max_workers: 同时翻译的块数
+        checkpoint: 翻译检查点 (可选)
+        report: 降级模式的完成度统计 (可选);重试队列在所有块产出之后排空,
+            因此重试成功的片段只体现在 soup 中,已产出的块需要调用方重新处理
+        segmentation: 翻译单元,'node' 逐个文本节点翻译,'block' 按块翻译
+
+    Yields:
+        已翻译的顶层 TR 元素
+    """
+    fixed_titles = get_fixed_titles()
+    body = soup.find('body')
+    blocks = body.find_all('tr', recursive=False) if body else []
+
+    block_nodes = [extract_text_nodes(tr) for tr in blocks]
+    in_blocks = {id(node) for nodes in block_nodes for node in nodes}
+    # 不属于任何顶层 TR 的文本节点 (如 body 中的零散文本) 在最后统一翻译
+    remaining_nodes = [node for node in extract_text_nodes(soup) if id(node) not in in_blocks]
+
+    total = sum(len(nodes) for nodes in block_nodes) + len(remaining_nodes)
+    block_units = [group_units(nodes, segmentation, fixed_titles) for nodes in block_nodes]
+    remaining_units = group_units(remaining_nodes, segmentation, fixed_titles)
+    unit_count = sum(len(units) for units in block_units) + len(remaining_units)
+    logger.info(f"📝 找到 {total} 个需要翻译的文本节点,分为 {len(blocks)} 个块"
+                + (f",合并为 {unit_count} 个翻译单元" if unit_count != total else ""))
+    prefetch_text_nodes([unit for units in block_units for unit in units] + remaining_units,
+                        translator, fixed_titles, checkpoint)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="translate-block") as executor:
+        # 各线程只翻译,文档由当前 (消费方) 线程按块的顺序修改
+        futures = [
+            executor.submit(prepare_text_nodes, units, translator, fixed_titles, checkpoint, report)
+            for units in block_units
+        ]
+        remaining_future = executor.submit(
+            prepare_text_nodes, remaining_units, translator, fixed_titles, checkpoint, report
+        )
+
+        try:
+            for i, (tr, future) in enumerate(zip(blocks, futures), 1):
+                apply_edits(future.result())
+                logger.info(f"[{i}/{len(blocks)}] 块翻译完成")
+                yield tr
+            apply_edits(remaining_future.result())
+        finally:
+            # 消费方提前退出或出错时不再翻译剩余的块
+            for future in futures:
+                future.cancel()
+            remaining_future.cancel()
+            cancel_prefetch = getattr(translator, 'cancel_prefetch', None)
+            if cancel_prefetch is not None:
+                cancel_prefetch()
+
+    if report is not None:
+        report.drain(translator, checkpoint)
+
+    logger.info("✅ 翻译完成")
@@ -1,22 +1,26 @@
 """
 基于 LangChain 的翻译器
 使用 OpenAI 或其他 LLM 进行英译中
-支持多个 AI 服务商：OpenAI, Vertex AI, Google AI Studio
+支持多个 AI 服务商：OpenAI, Vertex AI, Google AI Studio,本地 CPU 机器翻译 (local),以及用于离线测试的模拟 LLM (fake)
+OpenAI 默认直连 /chat/completions (openai_http),其余服务商经 LangChain
 """
 
-from typing import Optional, List, Union
+from typing import Dict, Optional, List
 import os
+import re
+import threading
+import time
 
-from langchain_openai import ChatOpenAI
-from langchain_google_vertexai import ChatVertexAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
-
+from ..utils import metrics
 from ..utils.logger import get_logger
 from ..utils.config import get_config
+from .tracing import LLMCallTracer, token_usage
 
 logger = get_logger(__name__)
 
+# 按块翻译时的行内标签占位符 (<1>…</1>、<2/>),与 segmenter.PLACEHOLDER_PATTERN 一致 (这里不导入 bs4)
+PLACEHOLDER_PATTERN = re.compile(r'</?\d+/?>')
+
 
 class LangChainTranslator:
     """
@@ -28,6 +32,12 @@ class LangChainTranslator:
     DEFAULT_SYSTEM_PROMPT = """你是一位专业的 AI 领域翻译专家，精通英文和中文。
 你的任务是将英文内容准确、流畅地翻译成中文。"""
 
+    # 原文带占位符时追加到系统提示词
+    PLACEHOLDER_PROMPT = """
+原文中的 <1>…</1>、<2/> 等编号标记代表链接、加粗等格式，不是 HTML 标签：
+- 每个标记必须原样保留在译文中，编号不变，不增不减
+- 成对标记包住对应的译文词语，语序调整时可以随译文移动位置"""
+
     DEFAULT_TRANSLATION_TEMPLATE = """请将以下英文内容翻译成中文。
 
 ⚠️ 重要要求：
@@ -50,6 +60,7 @@ class LangChainTranslator:
     def __init__(
         self,
         provider: Optional[str] = None,
+        model: Optional[str] = None,
         temperature: float = 0.3,
         max_tokens: int = 4000,
         chunk_size: int = 3000,
@@ -60,7 +71,8 @@ class LangChainTranslator:
         初始化翻译器
 
         Args:
-            provider: AI 服务商 (openai, vertex_ai, google_ai)，如果为 None 则从配置读取
+            provider: AI 服务商 (openai, vertex_ai, google_ai, local, fake)，如果为 None 则从配置读取
+            model: 模型名称 (local 为模型目录),如果为 None 则使用该服务商的配置
             temperature: 温度参数，控制输出的随机性
             max_tokens: 最大生成 token 数
             chunk_size: 分段翻译的字符数阈值
@@ -72,51 +84,86 @@ class LangChainTranslator:
 
         # 确定使用的服务商
         self.provider = provider or config.ai_provider
+        self.model_override = model
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.chunk_size = chunk_size
 
         # 根据服务商初始化 LLM
         self.llm = self._init_llm(config)
+        self.model = getattr(self.llm, 'model_name', None) or getattr(self.llm, 'model', None)
+
+        # 每次 LLM 调用写入追踪文件 (LLM_TRACE_FILE 为空时不追踪)
+        self.tracer = (
+            LLMCallTracer(config.llm_trace_file, self.provider, self.model)
+            if config.llm_trace_file else None
+        )
 
         # 设置提示词
         self.system_prompt = system_prompt or self.DEFAULT_SYSTEM_PROMPT
         self.translation_template = translation_template or self.DEFAULT_TRANSLATION_TEMPLATE
 
+        # prefetch 批量翻译的结果 (原文 -> 译文)
+        self._prefetched: Dict[str, str] = {}
+        self._prefetch_lock = threading.Lock()
+
         logger.info(f"翻译器初始化成功: provider={self.provider}, temperature={temperature}")
 
-    def _init_llm(self, config) -> Union[ChatOpenAI, ChatVertexAI, ChatGoogleGenerativeAI]:
+    def _init_llm(self, config):
         """
         根据配置初始化 LLM
 
+        各服务商的 SDK 只在选中时导入 (Vertex AI 的依赖链导入一次要好几秒)
+
         Args:
             config: 配置对象
 
         Returns:
-            初始化的 LLM 实例
+            初始化的 LLM 实例 (LangChain BaseChatModel,或 OpenAI 直连后端 OpenAIHTTPChatModel)
         """
         if self.provider == "openai":
+            model = self.model_override or config.openai_model
             if not config.openai_api_key:
                 raise ValueError("未设置 OPENAI_API_KEY")
 
-            logger.info(f"使用 OpenAI: model={config.openai_model}")
+            logger.info(f"使用 OpenAI: model={model}, backend={config.openai_backend}")
             print(f"DEBUG: 正在使用的API Key为: '{config.openai_api_key}'")
 
+            if config.openai_backend == "http":
+                from .openai_http import OpenAIHTTPChatModel
+
+                return OpenAIHTTPChatModel(
+                    api_key=config.openai_api_key,
+                    model=model,
+                    base_url=config.openai_base_url,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    http2=config.openai_http2,
+                    max_connections=config.openai_max_connections
+                )
+            if config.openai_backend != "langchain":
+                raise ValueError(f"不支持的 OPENAI_BACKEND: {config.openai_backend},支持: http, langchain")
+
+            from langchain_openai import ChatOpenAI
+
             return ChatOpenAI(
                 api_key=config.openai_api_key,
-                model=config.openai_model,
+                model=model,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 base_url=config.openai_base_url
             )
 
         elif self.provider == "vertex_ai":
+            from langchain_google_vertexai import ChatVertexAI
+
+            model = self.model_override or config.vertex_ai_model
             if not config.vertex_ai_project_id:
                 raise ValueError("未设置 VERTEX_AI_PROJECT_ID")
 
-            logger.info(f"使用 Vertex AI: model={config.vertex_ai_model}, project={config.vertex_ai_project_id}")
+            logger.info(f"使用 Vertex AI: model={model}, project={config.vertex_ai_project_id}")
             return ChatVertexAI(
-                model=config.vertex_ai_model,
+                model=model,
                 project=config.vertex_ai_project_id,
                 location=config.vertex_ai_location,
                 temperature=self.temperature,
@@ -124,19 +171,57 @@ class LangChainTranslator:
             )
 
         elif self.provider == "google_ai":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            model = self.model_override or config.google_ai_model
             if not config.google_ai_api_key:
                 raise ValueError("未设置 GOOGLE_AI_API_KEY")
 
-            logger.info(f"使用 Google AI Studio: model={config.google_ai_model}")
+            logger.info(f"使用 Google AI Studio: model={model}")
             return ChatGoogleGenerativeAI(
-                model=config.google_ai_model,
+                model=model,
                 google_api_key=config.google_ai_api_key,
                 temperature=self.temperature,
                 max_output_tokens=self.max_tokens
             )
 
+        elif self.provider == "local":
+            from .local_mt import LocalMTModel
+
+            model_dir = self.model_override or config.local_mt_model_dir
+            logger.info(f"使用本地机器翻译: model_dir={model_dir}")
+            return LocalMTModel(
+                model_dir=model_dir,
+                compute_type=config.local_mt_compute_type,
+                threads=config.local_mt_threads,
+                beam_size=config.local_mt_beam_size,
+                max_batch_size=config.local_mt_batch_size,
+                source_prefix=config.local_mt_source_prefix.split(),
+                target_prefix=config.local_mt_target_prefix.split()
+            )
+
+        elif self.provider == "fake":
+            from .fake_llm import FakeChatModel
+
+            logger.info(
+                f"使用模拟 LLM: latency={config.fake_llm_latency} ({config.fake_llm_latency_ms}ms), "
+                f"429={config.fake_llm_rate_limit_rate:.0%}, timeout={config.fake_llm_timeout_rate:.0%}"
+            )
+            return FakeChatModel(
+                model_name=self.model_override or "fake-translator",
+                latency=config.fake_llm_latency,
+                latency_ms=config.fake_llm_latency_ms,
+                latency_sigma=config.fake_llm_latency_sigma,
+                tail_alpha=config.fake_llm_tail_alpha,
+                ms_per_output_token=config.fake_llm_ms_per_token,
+                rate_limit_rate=config.fake_llm_rate_limit_rate,
+                timeout_rate=config.fake_llm_timeout_rate,
+                timeout_seconds=config.fake_llm_timeout_seconds,
+                seed=config.fake_llm_seed
+            )
+
         else:
-            raise ValueError(f"不支持的 AI 服务商: {self.provider}，支持的服务商: openai, vertex_ai, google_ai")
+            raise ValueError(f"不支持的 AI 服务商: {self.provider}，支持的服务商: openai, vertex_ai, google_ai, local, fake")
     
     def translate(self, text: str) -> str:
         """
@@ -151,7 +236,11 @@ class LangChainTranslator:
         if not text or not text.strip():
             logger.warning("输入文本为空")
             return ""
-        
+
+        prefetched = self._prefetched.get(text)
+        if prefetched is not None:
+            return prefetched
+
         # 如果文本较短，直接翻译
         if len(text) <= self.chunk_size:
             return self._translate_chunk(text)
@@ -171,21 +260,32 @@ class LangChainTranslator:
         Returns:
             翻译结果
         """
-        import time
+        if self.supports_batch:
+            # 本地模型直接翻译原文,不经过提示词,也没有需要重试的网络错误
+            return self._translate_local([text])[0]
 
         for attempt in range(max_retries):
             try:
                 # 构建提示词
                 prompt = self.translation_template.format(content=text)
 
-                # 调用 LLM
+                # 调用 LLM (LangChain 聊天模型和直连后端都接受 role/content 字典)
+                system_prompt = self.system_prompt
+                if PLACEHOLDER_PATTERN.search(text):
+                    system_prompt += self.PLACEHOLDER_PROMPT
                 messages = [
-                    SystemMessage(content=self.system_prompt),
-                    HumanMessage(content=prompt)
+                    {'role': 'system', 'content': system_prompt},
+                    {'role': 'user', 'content': prompt}
                 ]
 
                 logger.info(f"开始翻译 ({len(text)} 字符)...")
-                response = self.llm.invoke(messages)
+                started = time.perf_counter()
+                try:
+                    response = self.llm.invoke(messages)
+                except Exception as e:
+                    self._record_call(text, attempt + 1, time.perf_counter() - started, error=e)
+                    raise
+                self._record_call(text, attempt + 1, time.perf_counter() - started, response=response)
 
                 translated = response.content.strip()
                 logger.info(f"翻译完成 ({len(translated)} 字符)")
@@ -195,12 +295,75 @@ class LangChainTranslator:
             except Exception as e:
                 if attempt < max_retries - 1:
                     wait_time = (attempt + 1) * 2  # 2秒, 4秒, 6秒
-                    logger.warning(f"翻译失败 (尝试 {attempt + 1}/{max_retries}): {e}, {wait_time}秒后重试...")
+                    # 429/503 带 Retry-After 时至少等待服务端要求的时间 (OpenAIHTTPError.retry_after)
+                    retry_after = getattr(e, 'retry_after', None)
+                    if retry_after:
+                        wait_time = max(wait_time, retry_after)
+                    logger.warning(f"翻译失败 (尝试 {attempt + 1}/{max_retries}): {e}, {wait_time:g}秒后重试...")
                     time.sleep(wait_time)
                 else:
                     logger.error(f"翻译失败 (已重试 {max_retries} 次): {e}")
                     raise
     
+    @property
+    def supports_batch(self) -> bool:
+        """是否支持批量推理 (本地模型)"""
+        return hasattr(self.llm, 'translate_batch')
+
+    def prefetch(self, texts: List[str], hints: Optional[Dict[str, Dict]] = None) -> None:
+        """
+        一次性批量翻译一篇文档的片段,之后 translate() 直接返回结果
+
+        只对支持批量推理的本地模型生效;远程 LLM 仍由调用方逐条并发翻译。
+        批量翻译失败时只记录警告,片段回到逐条翻译
+
+        Args:
+            texts: 原文片段 (与之后传给 translate 的文本一致)
+            hints: 片段的路由提示 (供 ModelRouter 使用,这里不需要)
+        """
+        if not self.supports_batch:
+            return
+        pending = [text for text in dict.fromkeys(texts) if text and text not in self._prefetched]
+        if not pending:
+            return
+
+        logger.info(f"本地批量翻译 {len(pending)} 个片段...")
+        try:
+            translations = self._translate_local(pending)
+        except Exception as e:
+            logger.warning(f"批量翻译失败,改为逐条翻译: {e}")
+            return
+        with self._prefetch_lock:
+            self._prefetched.update(zip(pending, translations))
+
+    def _translate_local(self, texts: List[str]) -> List[str]:
+        """用本地模型批量翻译,每个片段按平摊的耗时记录指标和追踪"""
+        started = time.perf_counter()
+        try:
+            results = self.llm.translate_batch(texts)
+        except Exception as e:
+            latency = (time.perf_counter() - started) / len(texts)
+            for text in texts:
+                self._record_call(text, 1, latency, error=e)
+            raise
+        latency = (time.perf_counter() - started) / len(texts)
+        for text, result in zip(texts, results):
+            self._record_call(text, 1, latency, response=result)
+        logger.info(f"本地翻译完成: {len(texts)} 个片段, {latency * len(texts):.2f}s")
+        return [result.content for result in results]
+
+    def _record_call(self, text: str, attempt: int, latency: float, response=None, error=None) -> None:
+        """更新 LLM 请求/token 指标,并写入调用追踪"""
+        labels = {'provider': self.provider, 'model': self.model or ''}
+        metrics.LLM_REQUESTS.inc(status='error' if error is not None else 'ok', **labels)
+        if error is None:
+            metrics.LLM_LATENCY.observe(latency, **labels)
+            usage = token_usage(response)
+            metrics.LLM_TOKENS.inc(usage['input_tokens'] or 0, type='input', **labels)
+            metrics.LLM_TOKENS.inc(usage['output_tokens'] or 0, type='output', **labels)
+        if self.tracer is not None:
+            self.tracer.record_call(text, attempt, latency, response=response, error=error)
+
     def _translate_long_text(self, text: str) -> str:
         """
         分段翻译长文本
@@ -0,0 +1,167 @@
+"""
+本地 CPU 机器翻译 (provider: local)
+用 CTranslate2 加载转换后的 Marian / NLLB 英译中模型,不访问网络,延迟可预期。
+一篇文档的所有片段先按句子切分,再按长度排序后批量推理,一次调用即可用满所有 CPU 核心
+
+模型准备 (以 Helsinki-NLP/opus-mt-en-zh 为例):
+    pip install ctranslate2 sentencepiece transformers
+    ct2-transformers-converter --model Helsinki-NLP/opus-mt-en-zh --output_dir models/opus-mt-en-zh \
+        --quantization int8 --copy_files source.spm target.spm
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 句子边界: 句末标点后跟空白和大写字母/引号/数字
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=["\'“A-Z0-9])')
+
+# 模型目录中 SentencePiece 模型的常见文件名: (源语言, 目标语言)
+_SPM_FILES = [
+    ('source.spm', 'target.spm'),                          # Marian
+    ('sentencepiece.bpe.model', 'sentencepiece.bpe.model'),  # NLLB
+    ('spm.model', 'spm.model'),
+]
+
+
+def split_sentences(text: str) -> List[str]:
+    """按句子切分段落 (Marian 等模型以句子为单位训练,整段输入容易漏译)"""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+class LocalTranslation:
+    """本地翻译结果,字段与 LLM 响应一致 (content / usage_metadata),便于复用指标和追踪"""
+
+    def __init__(self, content: str, input_tokens: int, output_tokens: int):
+        self.content = content
+        self.usage_metadata = {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+        }
+        self.response_metadata: Dict[str, str] = {}
+
+
+class LocalMTModel:
+    """CTranslate2 英译中模型"""
+
+    def __init__(
+        self,
+        model_dir: str,
+        compute_type: str = "int8",
+        threads: int = 0,
+        beam_size: int = 2,
+        max_batch_size: int = 32,
+        source_prefix: Optional[List[str]] = None,
+        target_prefix: Optional[List[str]] = None
+    ):
+        """
+        加载模型
+
+        Args:
+            model_dir: ct2-transformers-converter 转换后的模型目录 (需包含 SentencePiece 模型)
+            compute_type: 计算精度 (int8 / int8_float32 / float32)
+            threads: 推理线程数,0 表示使用全部 CPU 核心
+            beam_size: 束搜索宽度 (1 为贪心解码,最快)
+            max_batch_size: 单批最多句子数
+            source_prefix: 源句前添加的 token,如 opus-mt-en-zh 的 >>cmn_Hans<<、NLLB 的 eng_Latn
+            target_prefix: 译文的起始 token,如 NLLB 的 zho_Hans
+        """
+        try:
+            import ctranslate2
+            import sentencepiece
+        except ImportError as e:
+            raise ImportError(
+                "本地翻译需要安装 ctranslate2 和 sentencepiece: pip install ctranslate2 sentencepiece"
+            ) from e
+
+        path = Path(model_dir)
+        if not path.is_dir():
+            raise ValueError(f"本地翻译模型目录不存在: {model_dir}")
+        spm_files = next(
+            ((path / source, path / target) for source, target in _SPM_FILES if (path / source).exists()),
+            None
+        )
+        if spm_files is None:
+            raise ValueError(f"模型目录中没有 SentencePiece 模型 ({', '.join(s for s, _ in _SPM_FILES)}): {model_dir}")
+
+        self.model_name = path.name
+        self.beam_size = beam_size
+        self.max_batch_size = max_batch_size
+        self.source_prefix = list(source_prefix or [])
+        self.target_prefix = list(target_prefix or [])
+        threads = threads or os.cpu_count() or 1
+
+        self._translator = ctranslate2.Translator(
+            str(path), device="cpu", compute_type=compute_type, inter_threads=1, intra_threads=threads
+        )
+        self._source_sp = sentencepiece.SentencePieceProcessor(model_file=str(spm_files[0]))
+        self._target_sp = (
+            self._source_sp if spm_files[1] == spm_files[0]
+            else sentencepiece.SentencePieceProcessor(model_file=str(spm_files[1]))
+        )
+        # SentencePieceProcessor 不保证线程安全,分词/解码加锁 (耗时远小于推理)
+        self._sp_lock = threading.Lock()
+
+        logger.info(f"本地翻译模型已加载: {path} (compute_type={compute_type}, threads={threads}, beam={beam_size})")
+
+    def _encode(self, sentence: str) -> List[str]:
+        with self._sp_lock:
+            pieces = self._source_sp.encode(sentence, out_type=str)
+        return self.source_prefix + pieces + ['</s>']
+
+    def _decode(self, tokens: List[str]) -> str:
+        if self.target_prefix and tokens[:len(self.target_prefix)] == self.target_prefix:
+            tokens = tokens[len(self.target_prefix):]
+        with self._sp_lock:
+            return self._target_sp.decode(tokens)
+
+    def translate_batch(self, texts: List[str]) -> List[LocalTranslation]:
+        """
+        批量翻译
+
+        所有文本先切成句子,按 token 数排序后分批推理 (同一批长度相近,填充最少),再按原顺序拼回
+
+        Args:
+            texts: 英文片段列表
+
+        Returns:
+            与 texts 一一对应的翻译结果
+        """
+        sentences: List[List[str]] = []
+        owners: List[int] = []
+        for index, text in enumerate(texts):
+            for sentence in split_sentences(text):
+                sentences.append(self._encode(sentence))
+                owners.append(index)
+
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        results = self._translator.translate_batch(
+            [sentences[i] for i in order],
+            target_prefix=[self.target_prefix] * len(order) if self.target_prefix else None,
+            beam_size=self.beam_size,
+            max_batch_size=self.max_batch_size,
+        )
+
+        parts: List[List[str]] = [[] for _ in texts]
+        input_tokens = [0] * len(texts)
+        output_tokens = [0] * len(texts)
+        decoded: Dict[int, List[str]] = {}
+        for i, result in zip(order, results):
+            decoded[i] = result.hypotheses[0]
+        for i, owner in enumerate(owners):
+            parts[owner].append(self._decode(decoded[i]))
+            input_tokens[owner] += len(sentences[i])
+            output_tokens[owner] += len(decoded[i])
+
+        # 中文句子之间不加空格
+        return [
+            LocalTranslation(''.join(parts[index]).strip(), input_tokens[index], output_tokens[index])
+            for index in range(len(texts))
+        ]
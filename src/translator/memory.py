@@ -0,0 +1,110 @@
+"""
+翻译记忆
+跨邮件共享的片段译文库: newsletter 中反复出现的固定文案 (栏目说明、赞助语、署名等)
+只翻译一次,之后直接复用
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from ..utils.artifacts import content_hash
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranslationMemory:
+    """
+    按 "翻译配置指纹 + 原文哈希" 检索的翻译记忆
+
+    接口与 TranslationCheckpoint 一致 (get / put),可直接作为 checkpoint 参数传给
+    translate_html 等函数;模型或固定标题变化时指纹不同,不会复用旧译文
+    """
+
+    def __init__(self, database, fingerprint: Dict[str, Any]):
+        """
+        初始化翻译记忆
+
+        Args:
+            database: Database 实例
+            fingerprint: 影响译文的翻译配置 (如 translator_fingerprint() 的结果)
+        """
+        self.database = database
+        self.fingerprint = content_hash(fingerprint)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = {}
+        # 尚未写入数据库的命中次数 (flush 时一次提交,查询本身不写数据库)
+        self._pending_hits: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def source_hash(text: str) -> str:
+        """原文哈希"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _lookup(self, source_hash: str) -> Optional[str]:
+        with self._lock:
+            translation = self._cache.get(source_hash)
+        if translation is None:
+            translation = self.database.get_translation_memory(self.fingerprint, source_hash)
+            if translation is not None:
+                with self._lock:
+                    self._cache[source_hash] = translation
+        return translation
+
+    def __contains__(self, text: str) -> bool:
+        """是否已有译文 (预取时判断是否需要翻译,不计入命中率)"""
+        return self._lookup(self.source_hash(text)) is not None
+
+    def get(self, text: str) -> Optional[str]:
+        """
+        查询译文
+
+        Args:
+            text: 原文
+
+        Returns:
+            译文,未命中时返回 None
+        """
+        source_hash = self.source_hash(text)
+        translation = self._lookup(source_hash)
+
+        with self._lock:
+            if translation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._pending_hits[source_hash] = self._pending_hits.get(source_hash, 0) + 1
+        return translation
+
+    def put(self, text: str, translation: str) -> None:
+        """
+        保存译文 (立即提交,其他进程和后续运行可见)
+
+        Args:
+            text: 原文
+            translation: 译文
+        """
+        source_hash = self.source_hash(text)
+        self.database.save_translation_memory(self.fingerprint, source_hash, text, translation)
+        with self._lock:
+            self._cache[source_hash] = translation
+
+    def flush(self) -> None:
+        """把累计的命中次数一次写入数据库 (写入失败只记录警告)"""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+        try:
+            self.database.add_translation_memory_hits(self.fingerprint, pending)
+        except Exception as e:
+            logger.warning(f"保存翻译记忆命中次数失败: {e}")
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,260 @@
+"""
+直连 OpenAI 兼容接口的轻量聊天模型 (OPENAI_BACKEND=http)
+翻译只用到 invoke([system, user]),不需要 LangChain 的整套抽象:
+直接请求 {base_url}/chat/completions,进程内共用 httpx 连接池 (安装 h2 时走 HTTP/2,
+多个翻译线程复用同一连接),支持流式 (SSE) 和 asyncio。
+响应对象带 content / usage_metadata / response_metadata,与 LangChain 的 AIMessage 字段一致,
+指标和调用追踪不需要区分后端
+"""
+
+import importlib.util
+import json
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# LangChain 消息类型 -> OpenAI 角色
+_ROLES = {'system': 'system', 'human': 'user', 'user': 'user', 'ai': 'assistant', 'assistant': 'assistant'}
+
+# 进程内共用的同步连接池: (base_url, http2, max_connections) -> Client
+_clients: Dict[tuple, httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+
+class OpenAIHTTPError(Exception):
+    """接口返回非 2xx 状态码"""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ChatResponse:
+    """一次聊天补全的结果 (流式时为一个增量块)"""
+
+    def __init__(
+        self,
+        content: str,
+        usage_metadata: Optional[Dict[str, int]] = None,
+        response_metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.content = content
+        self.usage_metadata = usage_metadata
+        self.response_metadata = response_metadata or {}
+
+    def __repr__(self) -> str:
+        return f"ChatResponse(content={self.content[:40]!r}, usage={self.usage_metadata})"
+
+
+def http2_available() -> bool:
+    """是否安装了 HTTP/2 依赖 (h2)"""
+    return importlib.util.find_spec('h2') is not None
+
+
+def _usage(usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    if not usage:
+        return None
+    return {
+        'input_tokens': usage.get('prompt_tokens') or 0,
+        'output_tokens': usage.get('completion_tokens') or 0,
+        'total_tokens': usage.get('total_tokens') or 0,
+    }
+
+
+def _error(response: httpx.Response) -> OpenAIHTTPError:
+    try:
+        message = response.json().get('error', {}).get('message') or response.text
+    except ValueError:
+        message = response.text
+    return OpenAIHTTPError(response.status_code, message[:500], _retry_after(response.headers.get('retry-after')))
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头 (秒数或 HTTP 日期),返回需要等待的秒数"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIHTTPChatModel:
+    """OpenAI 兼容的 /chat/completions 客户端,接口与 LangChain 聊天模型的 invoke/stream/ainvoke/astream 对应"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "https://api.openai.com/v1",
+        temperature: float = 0.3,
+        max_tokens: int = 4000,
+        timeout: float = 60.0,
+        http2: bool = True,
+        max_connections: int = 20
+    ):
+        """
+        初始化客户端
+
+        Args:
+            api_key: API Key
+            model: 模型名称
+            base_url: 接口地址 (OPENAI_BASE_URL),兼容 OpenAI 协议的代理或自建服务均可
+            temperature: 温度参数
+            max_tokens: 最大生成 token 数
+            timeout: 单次请求超时 (秒)
+            http2: 是否使用 HTTP/2 (未安装 h2 时退回 HTTP/1.1 长连接)
+            max_connections: 连接池最大连接数
+        """
+        if http2 and not http2_available():
+            logger.info("未安装 h2 (pip install 'httpx[http2]'),使用 HTTP/1.1 长连接")
+            http2 = False
+
+        self.model_name = model
+        self.base_url = base_url.rstrip('/')
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.http2 = http2
+        self.max_connections = max_connections
+        self._headers = {'Authorization': f"Bearer {api_key}"}
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def _client(self) -> httpx.Client:
+        key = (self.base_url, self.http2, self.max_connections)
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(http2=self.http2, limits=self._limits())
+                _clients[key] = client
+            return client
+
+    def _aclient(self) -> httpx.AsyncClient:
+        # 异步客户端绑定在创建它的事件循环上,不在实例之间共用
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(http2=self.http2, limits=self._limits())
+        return self._async_client
+
+    def _payload(self, messages: List[Any], stream: bool) -> Dict[str, Any]:
+        payload = {
+            'model': self.model_name,
+            'messages': [self._message(message) for message in messages],
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+        }
+        if stream:
+            payload['stream'] = True
+            payload['stream_options'] = {'include_usage': True}
+        return payload
+
+    @staticmethod
+    def _message(message: Any) -> Dict[str, str]:
+        """{'role', 'content'} 字典原样使用,LangChain 消息按 type 转换角色"""
+        if isinstance(message, dict):
+            return {'role': _ROLES.get(message['role'], message['role']), 'content': message['content']}
+        return {'role': _ROLES.get(message.type, message.type), 'content': message.content}
+
+    def _response(self, data: Dict[str, Any]) -> ChatResponse:
+        choice = (data.get('choices') or [{}])[0]
+        return ChatResponse(
+            content=(choice.get('message') or {}).get('content') or '',
+            usage_metadata=_usage(data.get('usage')),
+            response_metadata={
+                'id': data.get('id'),
+                'model_name': data.get('model', self.model_name),
+                'finish_reason': choice.get('finish_reason'),
+                'token_usage': data.get('usage') or {},
+            }
+        )
+
+    def _chunk(self, line: str) -> Optional[ChatResponse]:
+        """解析一行 SSE,非数据行和 [DONE] 返回 None"""
+        if not line.startswith('data:'):
+            return None
+        data = line[5:].strip()
+        if not data or data == '[DONE]':
+            return None
+        event = json.loads(data)
+        choice = (event.get('choices') or [{}])[0]
+        return ChatResponse(
+            content=(choice.get('delta') or {}).get('content') or '',
+            usage_metadata=_usage(event.get('usage')),
+            response_metadata={'finish_reason': choice.get('finish_reason')} if choice.get('finish_reason') else None
+        )
+
+    def invoke(self, messages: List[Any]) -> ChatResponse:
+        """
+        同步请求一次补全
+
+        Args:
+            messages: [{'role', 'content'}] 或 LangChain 消息列表
+
+        Returns:
+            ChatResponse
+        """
+        response = self._client().post(
+            self.url, json=self._payload(messages, stream=False), headers=self._headers, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise _error(response)
+        return self._response(response.json())
+
+    def stream(self, messages: List[Any]) -> Iterator[ChatResponse]:
+        """流式补全,逐块返回增量内容;最后一块带 usage_metadata"""
+        with self._client().stream(
+            'POST', self.url, json=self._payload(messages, stream=True), headers=self._headers, timeout=self.timeout
+        ) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise _error(response)
+            for line in response.iter_lines():
+                chunk = self._chunk(line)
+                if chunk is not None:
+                    yield chunk
+
+    async def ainvoke(self, messages: List[Any]) -> ChatResponse:
+        """异步请求一次补全"""
+        response = await self._aclient().post(
+            self.url, json=self._payload(messages, stream=False), headers=self._headers, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise _error(response)
+        return self._response(response.json())
+
+    async def astream(self, messages: List[Any]) -> AsyncIterator[ChatResponse]:
+        """异步流式补全"""
+        async with self._aclient().stream(
+            'POST', self.url, json=self._payload(messages, stream=True), headers=self._headers, timeout=self.timeout
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise _error(response)
+            async for line in response.aiter_lines():
+                chunk = self._chunk(line)
+                if chunk is not None:
+                    yield chunk
+
+    async def aclose(self) -> None:
+        """关闭异步客户端 (同步连接池在进程内共用,随进程退出)"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
@@ -0,0 +1,91 @@
+"""
+LLM 调用限速
+多个邮件并发翻译时共用同一个令牌桶,保证总请求速率不超过服务商限额
+"""
+
+import threading
+import time
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        初始化限速器
+
+        Args:
+            requests_per_minute: 每分钟允许的请求数 (<= 0 表示不限速)
+            burst: 允许的突发请求数
+        """
+        self.requests_per_minute = requests_per_minute
+        self.burst = max(1, burst)
+        self._rate = requests_per_minute / 60.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self) -> float:
+        """
+        获取一个令牌,令牌不足时阻塞等待
+
+        Returns:
+            本次等待的秒数
+        """
+        if self._rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # 先预占令牌再在锁外等待,等待中的请求按到达顺序排队
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimitedTranslator:
+    """为翻译器的每次调用加上限速 (接口与被包装的翻译器一致)"""
+
+    def __init__(self, translator, limiter: RateLimiter):
+        """
+        Args:
+            translator: 翻译器实例 (需要提供 translate 方法);模型路由器的限速加在各个远程层上
+            limiter: 共享的限速器
+        """
+        self.translator = translator
+        self.limiter = limiter
+        # 模型路由器: 预取在各层线程池中并发调用,限速必须加在层上,不能只加在入口
+        limit_tiers = getattr(translator, 'limit_tiers', None)
+        self._per_tier = limit_tiers is not None
+        if self._per_tier:
+            limit_tiers(limiter)
+
+    def translate(self, text: str) -> str:
+        """限速后翻译文本"""
+        if not self._per_tier:
+            self.limiter.acquire()
+        return self.translator.translate(text)
+
+    @property
+    def supports_batch(self) -> bool:
+        """
+        是否允许预取: 单个翻译器只保留不调用远程接口的本地模型批量翻译 (预取会绕过入口的限速);
+        模型路由器的每次远程调用都在层上限速,预取不受影响
+        """
+        if self._per_tier:
+            return self.translator.supports_batch
+        return getattr(self.translator, 'provider', None) == 'local'
+
+    def __getattr__(self, name):
+        return getattr(self.translator, name)
@@ -0,0 +1,254 @@
+"""
+按片段复杂度路由翻译模型
+从 4 个字符的标签到 600 个字符的段落原本都交给同一个模型。路由器按长度、行内标记密度和
+是否为标题给片段分层: 标题、长段落和标记多的片段交给强模型,其余短片段交给快速便宜的模型
+(或本地模型)。每层有独立的并发池,快速层的大量短请求不会占满强模型的并发
+"""
+
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ..utils import metrics
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STRONG_TIER = "strong"
+FAST_TIER = "fast"
+
+# 片段文本中的行内标签占位符 (只计开始标签 <1> 和自闭合标签 <1/>)
+PLACEHOLDER_PATTERN = re.compile(r'<\d+/?>')
+
+
+class Tier:
+    """一层模型: 翻译器和并发上限"""
+
+    def __init__(self, name: str, translator, max_workers: int = 4):
+        self.name = name
+        self.translator = translator
+        self.max_workers = max(1, max_workers)
+        # 直接调用 (未预取的片段、降级重试) 和预取线程池共用同一个并发上限
+        self.semaphore = threading.BoundedSemaphore(self.max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"translate-{self.name}"
+                )
+            return self._executor
+
+    def translate(self, text: str) -> str:
+        with self.semaphore:
+            return self.translator.translate(text)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class ModelRouter:
+    """
+    模型路由器,接口与 LangChainTranslator 相同 (translate / prefetch),可直接替换
+
+    路由规则 (按顺序):
+    1. 标题 -> strong (标题质量最显眼)
+    2. 超过 short_chars 个字符 -> strong
+    3. 行内标记密度 (所在块每个单词的链接/加粗等标签数) 超过 max_markup_density -> strong
+    4. 其余 -> fast
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, Tier],
+        short_chars: int = 120,
+        max_markup_density: float = 0.1
+    ):
+        """
+        初始化路由器
+
+        Args:
+            tiers: 层名 -> Tier,必须包含 strong;没有 fast 时所有片段都交给 strong
+            short_chars: 短片段的最大字符数
+            max_markup_density: 快速层允许的最大标记密度
+        """
+        if STRONG_TIER not in tiers:
+            raise ValueError(f"路由配置缺少 {STRONG_TIER} 层")
+        self.tiers = tiers
+        self.short_chars = short_chars
+        self.max_markup_density = max_markup_density
+
+        self._lock = threading.Lock()
+        self._hints: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+
+        # 各层的调用追踪共用一个运行 ID,便于按运行汇总
+        run_id = None
+        for tier in tiers.values():
+            tracer = getattr(tier.translator, 'tracer', None)
+            if tracer is not None:
+                run_id = run_id or tracer.run_id
+                tracer.run_id = run_id
+
+        logger.info("模型路由: " + ", ".join(
+            f"{name}={tier.translator.provider}/{tier.translator.model} (并发 {tier.max_workers})"
+            for name, tier in tiers.items()
+        ))
+
+    @classmethod
+    def from_config(cls, routing_config: Dict[str, Any]) -> "ModelRouter":
+        """
+        按 config.yaml 的 translation.routing 创建路由器
+
+        Args:
+            routing_config: {'short_chars', 'max_markup_density', 'tiers': {层名: {'provider', 'model', 'max_workers'}}}
+
+        Returns:
+            ModelRouter
+        """
+        from .langchain_translator import LangChainTranslator
+
+        tiers = {}
+        for name, tier_config in (routing_config.get('tiers') or {}).items():
+            tier_config = tier_config or {}
+            translator = LangChainTranslator(provider=tier_config.get('provider'), model=tier_config.get('model'))
+            tiers[name] = Tier(name, translator, tier_config.get('max_workers', 4))
+        return cls(
+            tiers,
+            short_chars=routing_config.get('short_chars', 120),
+            max_markup_density=routing_config.get('max_markup_density', 0.1)
+        )
+
+    @property
+    def provider(self) -> str:
+        return self.tiers[STRONG_TIER].translator.provider
+
+    @property
+    def model(self) -> str:
+        """各层模型,如 fast:gpt-4.1-nano,strong:gpt-4o-mini (写入运行指标,换模型时趋势报告会标出)"""
+        return ",".join(f"{name}:{tier.translator.model}" for name, tier in sorted(self.tiers.items()))
+
+    @property
+    def tracer(self):
+        return getattr(self.tiers[STRONG_TIER].translator, 'tracer', None)
+
+    @property
+    def supports_batch(self) -> bool:
+        """路由器总是支持预取 (按层并发提交)"""
+        return True
+
+    def route(self, text: str) -> str:
+        """
+        片段所属的层
+
+        Args:
+            text: 原文片段
+
+        Returns:
+            层名
+        """
+        hint = self._hints.get(text, {})
+        if FAST_TIER not in self.tiers or hint.get('headline') or len(text) > self.short_chars:
+            return STRONG_TIER
+        density = max(hint.get('markup_density', 0.0),
+                      len(PLACEHOLDER_PATTERN.findall(text)) / max(1, len(text.split())))
+        if density > self.max_markup_density:
+            return STRONG_TIER
+        return FAST_TIER
+
+    def prefetch(self, texts: List[str], hints: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """
+        把一篇文档的片段按层提交到各层的线程池,立即返回
+
+        之后 translate() 等待对应的结果;流式模式下前面的块不必等整篇翻译完
+
+        Args:
+            texts: 原文片段
+            hints: 原文 -> {'headline': 是否为标题, 'markup_density': 所在块的行内标记密度}
+        """
+        with self._lock:
+            self._hints.update(hints or {})
+        by_tier: Dict[str, List[str]] = {}
+        for text in dict.fromkeys(texts):
+            if text and text not in self._futures:
+                by_tier.setdefault(self.route(text), []).append(text)
+
+        for name, tier_texts in by_tier.items():
+            tier = self.tiers[name]
+            metrics.TRANSLATION_ROUTED.inc(len(tier_texts), tier=name)
+            if getattr(tier.translator, 'supports_batch', False):
+                # 本地模型: 整层一次批量推理,之后 translate 命中预取结果
+                batch = tier.executor.submit(tier.translator.prefetch, tier_texts)
+                futures = {text: batch for text in tier_texts}
+            else:
+                futures = {text: tier.executor.submit(tier.translate, text) for text in tier_texts}
+            with self._lock:
+                self._futures.update(futures)
+        if by_tier:
+            logger.info("片段路由: " + ", ".join(f"{name} {len(texts)}" for name, texts in by_tier.items()))
+
+    def translate(self, text: str) -> str:
+        """
+        翻译片段: 已预取的等待结果,否则按路由直接调用对应层
+
+        Args:
+            text: 原文片段
+
+        Returns:
+            译文
+        """
+        with self._lock:
+            future = self._futures.get(text)
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception:
+                # 失败的结果不保留,降级重试时重新调用
+                with self._lock:
+                    if self._futures.get(text) is future:
+                        del self._futures[text]
+                raise
+            if isinstance(result, str):
+                return result
+        else:
+            metrics.TRANSLATION_ROUTED.inc(tier=self.route(text))
+        return self.tiers[self.route(text)].translate(text)
+
+    def limit_tiers(self, limiter) -> None:
+        """
+        给调用远程接口的层加上共享限速 (RateLimitedTranslator 包装路由器时调用)
+
+        本地模型层不限速,仍然整层批量推理
+
+        Args:
+            limiter: RateLimiter
+        """
+        from .rate_limit import RateLimitedTranslator
+
+        for tier in self.tiers.values():
+            if tier.translator.provider != 'local' and not isinstance(tier.translator, RateLimitedTranslator):
+                tier.translator = RateLimitedTranslator(tier.translator, limiter)
+
+    def cancel_prefetch(self) -> None:
+        """取消尚未开始的预取 (消费方提前结束时调用)"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+
+    def close(self) -> None:
+        """关闭各层线程池"""
+        for tier in self.tiers.values():
+            tier.shutdown()
+
+    def __getattr__(self, name):
+        # translate_with_context 等其余方法交给强模型
+        if name.startswith('_') or name == 'tiers':
+            raise AttributeError(name)
+        return getattr(self.tiers[STRONG_TIER].translator, name)
@@ -0,0 +1,272 @@
+"""
+按块翻译的片段切分 (translation.segmentation: block)
+按文本节点翻译时,一句话会在每个 <a>、<b>、<span> 处断开,拆成 3-6 次互不相干的 LLM 调用。
+这里把每个块级元素 (p、li、h1-h6) 作为一个翻译单元,行内标签替换为紧凑的编号占位符:
+
+    The Rundown: Amazon founder Jeff Bezos is reportedly <a href="...">returning</a> from ...
+    -> <1>The Rundown:</1> Amazon founder Jeff Bezos is reportedly <2>returning</2> from ...
+
+译文中的占位符还原为原来的标签 (属性不变)。占位符不能完整配对时返回失败,
+调用方对该块退回逐个文本节点翻译
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from bs4 import Comment, NavigableString, Tag
+
+# 作为翻译单元的块级元素
+SEGMENT_TAGS = ['p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+# 可以出现在翻译单元内部的行内元素;其他元素 (表格、列表、div 等) 出现时该块不作为单元
+INLINE_TAGS = {'a', 'b', 'strong', 'i', 'em', 'u', 's', 'span', 'font', 'code', 'sup', 'sub', 'small', 'mark'}
+VOID_TAGS = {'br', 'img'}
+
+# 没有属性 (或只有空 style/class) 的 span/font 不影响显示,不生成占位符
+TRANSPARENT_TAGS = {'span', 'font'}
+
+# 占位符: <1> </1> <1/>
+PLACEHOLDER_PATTERN = re.compile(r'<(/?)(\d+)(/?)>')
+WHITESPACE = re.compile(r'[ \t\r\n]+')
+
+
+class Segment:
+    """一个块级翻译单元"""
+
+    def __init__(self, block: Tag, root: Tag, text: str, tags: Dict[int, List[Tag]]):
+        """
+        Args:
+            block: 块级元素
+            root: 译文替换的位置 (包裹整块内容的行内元素会保留在外层,不进入占位符)
+            text: 带占位符的原文
+            tags: 占位符编号 -> 元素链 (只有一个子元素的嵌套行内元素合并为一个占位符)
+        """
+        self.block = block
+        self.root = root
+        self.text = text
+        self.tags = tags
+        # 块内需要翻译的文本节点 (由 group_segments 填入,退回逐节点翻译时使用)
+        self.text_nodes: List[NavigableString] = []
+
+    def __repr__(self) -> str:
+        return f"Segment({self.block.name}, {self.text[:40]!r})"
+
+    def restore(self, translated: str) -> bool:
+        """
+        用译文替换块内容,占位符还原为原来的标签
+
+        译文中的占位符必须与原文一一对应且正确嵌套 (顺序可以改变),也不能出现其他尖括号;
+        校验通过前不修改文档
+
+        Args:
+            translated: 带占位符的译文
+
+        Returns:
+            是否还原成功
+        """
+        tree = self.parse(translated)
+        if tree is None:
+            return False
+        self.apply(tree)
+        return True
+
+    def apply(self, tree: List) -> None:
+        """
+        按 parse 的结果替换块内容 (修改文档,多线程翻译时只在一个线程中调用)
+
+        Args:
+            tree: parse 返回的译文结构
+        """
+        # 先取下元素链,清空后按译文的结构重新组装
+        for chain in self.tags.values():
+            for tag in chain:
+                tag.extract()
+                tag.clear()
+        self.root.clear()
+        for node in self._build(tree):
+            self.root.append(node)
+
+    def parse(self, translated: str) -> Optional[List]:
+        """
+        校验译文中的占位符并解析为 [文本 | (编号, 子节点列表)] (不修改文档)
+
+        Args:
+            translated: 带占位符的译文
+
+        Returns:
+            译文结构,占位符不配对时返回 None
+        """
+        stack: List[Tuple[Optional[int], List]] = [(None, [])]
+        seen = set()
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(translated):
+            text = translated[position:match.start()]
+            if '<' in text or '>' in text:
+                return None
+            if text:
+                stack[-1][1].append(text)
+            position = match.end()
+
+            closing, number, self_closing = match.group(1), int(match.group(2)), match.group(3)
+            if number not in self.tags or (closing and self_closing):
+                return None
+            is_void = self.tags[number][0].name in VOID_TAGS
+            if closing:
+                if len(stack) == 1 or stack[-1][0] != number:
+                    return None
+                number, children = stack.pop()
+                stack[-1][1].append((number, children))
+            else:
+                if number in seen or is_void != bool(self_closing):
+                    return None
+                seen.add(number)
+                if self_closing:
+                    stack[-1][1].append((number, []))
+                else:
+                    stack.append((number, []))
+
+        tail = translated[position:]
+        if '<' in tail or '>' in tail or len(stack) != 1 or seen != set(self.tags):
+            return None
+        if tail:
+            stack[0][1].append(tail)
+        return stack[0][1]
+
+    def _build(self, children: List) -> List[Union[NavigableString, Tag]]:
+        nodes = []
+        for child in children:
+            if isinstance(child, str):
+                nodes.append(NavigableString(child))
+                continue
+            number, grandchildren = child
+            chain = self.tags[number]
+            for outer, inner in zip(chain, chain[1:]):
+                outer.append(inner)
+            for node in self._build(grandchildren):
+                chain[-1].append(node)
+            nodes.append(chain[0])
+        return nodes
+
+
+def _is_transparent(tag: Tag) -> bool:
+    return tag.name in TRANSPARENT_TAGS and not any(tag.attrs.values())
+
+
+def _significant_children(tag: Tag) -> List:
+    return [
+        child for child in tag.children
+        if not isinstance(child, Comment) and not (isinstance(child, NavigableString) and not child.strip())
+    ]
+
+
+def _content_root(block: Tag) -> Tag:
+    """包裹整块内容的行内元素 (如整段加粗) 保留在外层,从最内层的包裹元素开始切分"""
+    root = block
+    while True:
+        children = _significant_children(root)
+        if len(children) != 1 or not isinstance(children[0], Tag) or children[0].name not in INLINE_TAGS:
+            return root
+        root = children[0]
+
+
+def build_segment(block: Tag) -> Optional[Segment]:
+    """
+    把块级元素转换为翻译单元
+
+    Args:
+        block: p / li / h1-h6 元素
+
+    Returns:
+        Segment;块内有非行内元素、原文含尖括号或没有可翻译的文字时返回 None
+    """
+    root = _content_root(block)
+    tags: Dict[int, List[Tag]] = {}
+
+    def walk(tag: Tag) -> Optional[str]:
+        parts = []
+        for child in tag.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                if '<' in child or '>' in child:
+                    return None
+                parts.append(str(child))
+                continue
+            if child.name in VOID_TAGS:
+                number = len(tags) + 1
+                tags[number] = [child]
+                parts.append(f"<{number}/>")
+                continue
+            if child.name not in INLINE_TAGS:
+                return None
+            if not child.get_text().strip() and child.find(VOID_TAGS) is None:
+                # 只包含空白的行内元素 (如 <b>&nbsp;</b>) 不影响显示,只保留空白
+                parts.append(child.get_text())
+                continue
+            if _is_transparent(child):
+                inner = walk(child)
+                if inner is None:
+                    return None
+                parts.append(inner)
+                continue
+
+            # 只有一个子元素的嵌套行内元素 (如 <b><a><span>标题</span></a></b>) 合并为一个占位符,
+            # 中间的透明元素不进入元素链
+            chain = [child]
+            node = child
+            while True:
+                children = _significant_children(node)
+                if len(children) != 1 or not isinstance(children[0], Tag) or children[0].name not in INLINE_TAGS:
+                    break
+                node = children[0]
+                if not _is_transparent(node):
+                    chain.append(node)
+            number = len(tags) + 1
+            tags[number] = chain
+            inner = walk(chain[-1])
+            if inner is None:
+                return None
+            parts.append(f"<{number}>{inner}</{number}>")
+        return ''.join(parts)
+
+    raw = walk(root)
+    if raw is None:
+        return None
+    text = WHITESPACE.sub(' ', raw).strip()
+    plain = PLACEHOLDER_PATTERN.sub('', text).strip()
+    if len(plain) <= 3 or not any(c.isalpha() for c in plain):
+        return None
+    return Segment(block, root, text, tags)
+
+
+def group_segments(text_nodes: List[NavigableString]) -> List[Union[Segment, NavigableString]]:
+    """
+    把文本节点按所在的块合并为翻译单元
+
+    文本节点最近的块级祖先是 p / li / h1-h6、其中没有嵌套的块级元素、且可以转换为 Segment 时,
+    该块的所有文本节点替换为一个 Segment;其余文本节点保持不变。顺序与文本节点一致
+
+    Args:
+        text_nodes: extract_text_nodes 的结果
+
+    Returns:
+        Segment 和文本节点的列表
+    """
+    units: List[Union[Segment, NavigableString]] = []
+    segments: Dict[int, Optional[Segment]] = {}
+    for text_node in text_nodes:
+        block = text_node.find_parent(SEGMENT_TAGS)
+        if block is None:
+            units.append(text_node)
+            continue
+        key = id(block)
+        if key not in segments:
+            segment = build_segment(block) if block.find(SEGMENT_TAGS) is None else None
+            segments[key] = segment
+            if segment is not None:
+                units.append(segment)
+        if segments[key] is None:
+            units.append(text_node)
+        else:
+            segments[key].text_nodes.append(text_node)
+    return units
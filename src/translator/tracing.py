@@ -0,0 +1,278 @@
+"""
+LLM 调用追踪
+每次 LLM 调用 (含失败和重试) 以及检查点/翻译记忆命中写入一行 JSON 事件,
+离线分析延迟分位数、每次运行的 token 用量、费用估算和最慢的片段
+"""
+
+import hashlib
+import json
+import math
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 同一进程内多个翻译器可能写同一个文件
+_write_lock = threading.Lock()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数 (q 为 0-100),空列表返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def token_usage(response) -> Dict[str, Optional[int]]:
+    """
+    从 LLM 响应中读取 token 用量
+
+    优先使用 LangChain 统一的 usage_metadata,其次是 OpenAI 风格的 response_metadata['token_usage']
+
+    Returns:
+        {'input_tokens': ..., 'output_tokens': ...},服务商未返回时为 None
+    """
+    usage = getattr(response, 'usage_metadata', None) or {}
+    if usage:
+        return {'input_tokens': usage.get('input_tokens'), 'output_tokens': usage.get('output_tokens')}
+    legacy = (getattr(response, 'response_metadata', None) or {}).get('token_usage') or {}
+    return {'input_tokens': legacy.get('prompt_tokens'), 'output_tokens': legacy.get('completion_tokens')}
+
+
+class LLMCallTracer:
+    """LLM 调用追踪器,事件追加写入 JSONL 文件"""
+
+    def __init__(self, path: str, provider: str, model: Optional[str] = None, run_id: Optional[str] = None):
+        """
+        初始化追踪器
+
+        Args:
+            path: JSONL 文件路径
+            provider: AI 服务商
+            model: 模型名称
+            run_id: 运行 ID,同一个翻译器的所有事件共用,默认自动生成
+        """
+        self.path = Path(path)
+        self.provider = provider
+        self.model = model
+        self.run_id = run_id or f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        try:
+            with _write_lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            # 追踪失败不影响翻译
+            logger.warning(f"写入 LLM 调用追踪失败: {e}")
+
+    def _event(self, text: str, **fields: Any) -> Dict[str, Any]:
+        return {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'run_id': self.run_id,
+            'provider': self.provider,
+            'model': self.model,
+            'segment': hashlib.sha256(text.encode('utf-8')).hexdigest()[:12],
+            'preview': text[:80],
+            'input_chars': len(text),
+            **fields
+        }
+
+    def record_call(
+        self,
+        text: str,
+        attempt: int,
+        latency: float,
+        response=None,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """
+        记录一次 LLM 调用
+
+        Args:
+            text: 原文片段
+            attempt: 第几次尝试 (从 1 开始)
+            latency: 调用耗时 (秒)
+            response: LLM 响应 (成功时)
+            error: 异常 (失败时)
+        """
+        usage = token_usage(response) if response is not None else {'input_tokens': None, 'output_tokens': None}
+        content = getattr(response, 'content', None)
+        self._write(self._event(
+            text,
+            attempt=attempt,
+            status='error' if error is not None else 'ok',
+            error=f"{type(error).__name__}: {str(error)[:200]}" if error is not None else None,
+            latency_ms=round(latency * 1000, 1),
+            output_chars=len(content) if isinstance(content, str) else None,
+            cache_hit=False,
+            **usage
+        ))
+
+    def record_cache_hit(self, text: str) -> None:
+        """记录检查点/翻译记忆命中 (没有调用 LLM)"""
+        self._write(self._event(text, attempt=0, status='ok', error=None, latency_ms=0.0,
+                                output_chars=None, cache_hit=True, input_tokens=0, output_tokens=0))
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    """读取追踪事件,跳过无法解析的行"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int, prices: Dict[str, Dict[str, float]]) -> Optional[float]:
+    """按每百万 token 单价估算费用 (美元),没有该模型的单价时返回 None"""
+    price = prices.get(model or '')
+    if price is None:
+        return None
+    return (input_tokens * price.get('input', 0) + output_tokens * price.get('output', 0)) / 1_000_000
+
+
+def analyze(
+    events: Iterable[Dict[str, Any]],
+    prices: Optional[Dict[str, Dict[str, float]]] = None,
+    slowest: int = 10,
+    last_runs: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    汇总追踪事件
+
+    Args:
+        events: 追踪事件
+        prices: {模型: {'input': 每百万输入 token 单价, 'output': 每百万输出 token 单价}}
+        slowest: 列出最慢的片段数
+        last_runs: 只统计最近的 N 次运行
+
+    Returns:
+        {'models': 按服务商/模型的统计, 'runs': 每次运行的统计, 'slowest': 最慢的调用}
+    """
+    prices = prices or {}
+    events = list(events)
+
+    # 按运行分组 (保持首次出现的顺序)
+    by_run: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        by_run.setdefault(event.get('run_id'), []).append(event)
+    run_order = list(by_run)
+    if last_runs:
+        run_order = run_order[-last_runs:]
+        events = [e for run_id in run_order for e in by_run[run_id]]
+
+    calls = [e for e in events if not e.get('cache_hit')]
+    ok_calls = [e for e in calls if e.get('status') == 'ok']
+
+    models: Dict[str, Dict[str, Any]] = {}
+    for event in events:
+        name = f"{event.get('provider')}/{event.get('model')}"
+        entry = models.setdefault(name, {
+            'model': event.get('model'), 'calls': 0, 'errors': 0, 'retries': 0, 'cache_hits': 0,
+            'input_tokens': 0, 'output_tokens': 0, 'latencies': []
+        })
+        if event.get('cache_hit'):
+            entry['cache_hits'] += 1
+            continue
+        entry['calls'] += 1
+        entry['retries'] += 1 if (event.get('attempt') or 1) > 1 else 0
+        if event.get('status') != 'ok':
+            entry['errors'] += 1
+            continue
+        entry['input_tokens'] += event.get('input_tokens') or 0
+        entry['output_tokens'] += event.get('output_tokens') or 0
+        entry['latencies'].append(event.get('latency_ms') or 0.0)
+
+    for entry in models.values():
+        latencies = entry.pop('latencies')
+        entry.update({
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'cost_usd': estimate_cost(entry['model'], entry['input_tokens'], entry['output_tokens'], prices),
+        })
+
+    runs = []
+    for run_id in run_order:
+        run_events = by_run[run_id]
+        run_ok = [e for e in run_events if not e.get('cache_hit') and e.get('status') == 'ok']
+        input_tokens = sum(e.get('input_tokens') or 0 for e in run_ok)
+        output_tokens = sum(e.get('output_tokens') or 0 for e in run_ok)
+        costs = [
+            estimate_cost(e.get('model'), e.get('input_tokens') or 0, e.get('output_tokens') or 0, prices)
+            for e in run_ok
+        ]
+        runs.append({
+            'run_id': run_id,
+            'started': run_events[0].get('ts'),
+            'model': run_events[0].get('model'),
+            'calls': sum(1 for e in run_events if not e.get('cache_hit')),
+            'errors': sum(1 for e in run_events if not e.get('cache_hit') and e.get('status') != 'ok'),
+            'cache_hits': sum(1 for e in run_events if e.get('cache_hit')),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'llm_seconds': round(sum(e.get('latency_ms') or 0 for e in run_events) / 1000, 2),
+            'cost_usd': None if any(c is None for c in costs) else sum(costs),
+        })
+
+    return {
+        'calls': len(calls),
+        'p50_ms': percentile([e.get('latency_ms') or 0.0 for e in ok_calls], 50),
+        'p95_ms': percentile([e.get('latency_ms') or 0.0 for e in ok_calls], 95),
+        'p99_ms': percentile([e.get('latency_ms') or 0.0 for e in ok_calls], 99),
+        'models': models,
+        'runs': runs,
+        'slowest': sorted(ok_calls, key=lambda e: e.get('latency_ms') or 0.0, reverse=True)[:slowest],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """把 analyze 的结果格式化为文本"""
+
+    def cost(value: Optional[float]) -> str:
+        return f"${value:.4f}" if value is not None else "-"
+
+    lines = [
+        f"📈 LLM 调用 {report['calls']} 次: p50 {report['p50_ms']:.0f}ms / "
+        f"p95 {report['p95_ms']:.0f}ms / p99 {report['p99_ms']:.0f}ms",
+        "",
+        f"  {'服务商/模型':<36}{'调用':>6}{'失败':>6}{'重试':>6}{'缓存':>6}{'p50':>8}{'p95':>8}{'p99':>8}"
+        f"{'输入tok':>10}{'输出tok':>10}{'费用':>10}",
+    ]
+    for name, entry in report['models'].items():
+        lines.append(
+            f"  {name:<36}{entry['calls']:>6}{entry['errors']:>6}{entry['retries']:>6}{entry['cache_hits']:>6}"
+            f"{entry['p50_ms']:>8.0f}{entry['p95_ms']:>8.0f}{entry['p99_ms']:>8.0f}"
+            f"{entry['input_tokens']:>10}{entry['output_tokens']:>10}{cost(entry['cost_usd']):>10}"
+        )
+
+    lines += ["", f"  {'运行':<24}{'开始时间':<26}{'调用':>6}{'失败':>6}{'缓存':>6}{'输入tok':>10}{'输出tok':>10}"
+                  f"{'LLM耗时':>10}{'费用':>10}"]
+    for run in report['runs']:
+        lines.append(
+            f"  {run['run_id']:<24}{(run['started'] or '')[:19]:<26}{run['calls']:>6}{run['errors']:>6}"
+            f"{run['cache_hits']:>6}{run['input_tokens']:>10}{run['output_tokens']:>10}"
+            f"{run['llm_seconds']:>9.1f}s{cost(run['cost_usd']):>10}"
+        )
+
+    if report['slowest']:
+        lines += ["", "  最慢的片段:"]
+        for event in report['slowest']:
+            lines.append(
+                f"  {event.get('latency_ms', 0):>9.0f}ms  {event.get('segment')}  "
+                f"{event.get('output_tokens') or '-':>5} tok  {event.get('preview', '')[:60]!r}"
+            )
+    return "\n".join(lines)
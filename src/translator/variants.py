@@ -0,0 +1,84 @@
+"""
+中文输出变体
+繁体等变体由简体译文本地转换 (OpenCC 词典),不需要再调用一轮 LLM
+"""
+
+from typing import Dict
+
+from bs4 import BeautifulSoup, Comment
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# LLM 直接输出的变体
+BASE_VARIANT = "zh-Hans"
+
+# 不转换的标签内容
+SKIP_TAGS = {'script', 'style'}
+
+
+class ChineseConverter:
+    """基于 OpenCC 词典的简繁转换器"""
+
+    def __init__(self, config: str = "s2t"):
+        """
+        初始化转换器
+
+        Args:
+            config: OpenCC 转换配置,如 s2t (简→繁)、s2tw (简→台湾正体)、
+                s2twp (简→台湾正体并转换常用词汇)、s2hk (简→香港繁体)
+        """
+        try:
+            from opencc import OpenCC
+        except ImportError as e:
+            raise ImportError(
+                "简繁转换需要安装 opencc-python-reimplemented: pip install opencc-python-reimplemented"
+            ) from e
+
+        self.config = config
+        self._converter = OpenCC(config)
+
+    def convert(self, text: str) -> str:
+        """转换纯文本"""
+        return self._converter.convert(text)
+
+    def convert_html(self, html_content: str) -> str:
+        """
+        转换 HTML 中的文本节点,标签、属性和链接保持不变
+
+        Args:
+            html_content: 简体 HTML
+
+        Returns:
+            转换后的 HTML
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for node in soup.find_all(string=True):
+            if isinstance(node, Comment) or not node.strip():
+                continue
+            if node.parent is not None and node.parent.name in SKIP_TAGS:
+                continue
+            converted = self.convert(str(node))
+            if converted != node:
+                node.replace_with(converted)
+        return str(soup)
+
+
+def build_converters(variants: Dict[str, str]) -> Dict[str, ChineseConverter]:
+    """
+    按配置创建各变体的转换器
+
+    Args:
+        variants: {变体名称: OpenCC 配置},如 {"zh-Hant": "s2twp"}
+
+    Returns:
+        {变体名称: ChineseConverter}
+    """
+    converters = {}
+    for name, config in (variants or {}).items():
+        if name == BASE_VARIANT:
+            continue
+        converters[name] = ChineseConverter(config)
+        logger.info(f"已加载中文变体: {name} ({config})")
+    return converters
@@ -2,17 +2,30 @@
 工具模块
 """
 
+from importlib import import_module
+
 from .logger import get_logger, setup_logging
-from .database import Database, ProcessedEmail, ExecutionLog
-from .config import Config, get_config
 
-__all__ = [
-    "get_logger",
-    "setup_logging",
-    "Database",
-    "ProcessedEmail",
-    "ExecutionLog",
-    "Config",
-    "get_config"
-]
+# 按需导入: 只用日志时不必加载 SQLAlchemy 和 pydantic-settings
+_EXPORTS = {
+    "Database": ".database",
+    "ProcessedEmail": ".database",
+    "ExecutionLog": ".database",
+    "SyncState": ".database",
+    "TranslationSegment": ".database",
+    "TranslationMemoryEntry": ".database",
+    "BackfillItem": ".database",
+    "RunMetric": ".database",
+    "StageMetric": ".database",
+    "Config": ".config",
+    "get_config": ".config",
+    "ArtifactStore": ".artifacts",
+}
+
+__all__ = ["get_logger", "setup_logging", *_EXPORTS]
+
 
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
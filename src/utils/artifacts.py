@@ -0,0 +1,326 @@
+"""
+阶段产物存储
+按 "阶段 + 阶段版本 + 输入内容哈希" 寻址,gzip 压缩保存每个阶段的输出,
+后期阶段失败后重跑时可以直接复用上游产物,无需重新抓取和翻译
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 阶段版本: 阶段逻辑 (剪切规则、提示词、转换样式等) 变化时递增,使旧产物失效
+STAGE_VERSIONS = {
+    'fetch': 1,
+    'clip': 1,
+    'translate': 1,
+    'convert': 1,
+    'publish': 1,
+    'debug': 1,
+}
+
+
+def content_hash(value: Any) -> str:
+    """
+    计算内容哈希
+
+    Args:
+        value: 字符串、字节或可 JSON 序列化的对象
+
+    Returns:
+        sha256 十六进制摘要
+    """
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+    else:
+        data = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtifactStore:
+    """
+    阶段产物存储
+
+    目录结构:
+        <root>/objects/<stage>/<key[:2]>/<key>.json.gz   产物内容
+        <root>/refs/<name>.json                          命名引用 {stage: key}
+    """
+
+    def __init__(self, root: str = "data/artifacts", retention_days: int = 14):
+        """
+        初始化产物存储
+
+        Args:
+            root: 存储根目录
+            retention_days: 保留天数,超过该天数未访问且未被引用的产物会被清理
+        """
+        self.root = Path(root)
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.RLock] = {}
+        # 当前线程持有的产物锁的重入深度 (只有持有对应 RLock 的线程会修改)
+        self._held: Dict[str, int] = {}
+
+    def make_key(self, stage: str, *inputs: Any) -> str:
+        """
+        生成产物键
+
+        Args:
+            stage: 阶段名称
+            *inputs: 影响阶段输出的全部输入
+
+        Returns:
+            产物键
+        """
+        parts = [stage, str(STAGE_VERSIONS.get(stage, 1))]
+        parts.extend(content_hash(value) for value in inputs)
+        return content_hash('\n'.join(parts))
+
+    def _object_path(self, stage: str, key: str) -> Path:
+        return self.root / "objects" / stage / key[:2] / f"{key}.json.gz"
+
+    def _ref_path(self, name: str) -> Path:
+        safe_name = "".join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+        return self.root / "refs" / f"{safe_name}.json"
+
+    def has(self, stage: str, key: str) -> bool:
+        """检查产物是否存在"""
+        return self._object_path(stage, key).exists()
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """
+        读取产物
+
+        Args:
+            stage: 阶段名称
+            key: 产物键
+
+        Returns:
+            产物内容,不存在时返回 None
+        """
+        path = self._object_path(stage, key)
+        if not path.exists():
+            return None
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                record = json.load(f)
+            # 更新访问时间,保留期按最后访问计算
+            os.utime(path, None)
+            return record['value']
+        except Exception as e:
+            logger.warning(f"读取产物失败 {stage}/{key[:12]}: {e}")
+            return None
+
+    def put(self, stage: str, key: str, value: Any) -> Path:
+        """
+        保存产物 (先写临时文件再原子替换)
+
+        Args:
+            stage: 阶段名称
+            key: 产物键
+            value: 可 JSON 序列化的内容
+
+        Returns:
+            产物文件路径
+        """
+        path = self._object_path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        record = {
+            'stage': stage,
+            'version': STAGE_VERSIONS.get(stage, 1),
+            'created_at': datetime.now().isoformat(),
+            'value': value
+        }
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        logger.debug(f"已保存产物: {stage}/{key[:12]}")
+        return path
+
+    @contextmanager
+    def lock(
+        self,
+        stage: str,
+        key: str,
+        poll_interval: float = 1.0,
+        stale_seconds: float = 1800
+    ) -> Iterator[None]:
+        """
+        产物级互斥锁 (single-flight): 同一产物同一时间只有一个执行者计算,
+        其他执行者等待锁释放后直接读取其结果
+
+        进程内用可重入的线程锁 (持有锁的线程再次获取同一产物锁时直接进入,
+        如 translate_and_convert 内部调用的 cached),跨进程用 O_EXCL 创建的锁文件。
+        持有期间每 stale_seconds / 3 秒更新一次锁文件的修改时间,持有进程崩溃后
+        锁文件超过 stale_seconds 未更新即视为失效
+
+        Args:
+            stage: 阶段名称
+            key: 产物键
+            poll_interval: 等待其他进程时的轮询间隔 (秒)
+            stale_seconds: 锁文件失效时间 (秒)
+        """
+        name = f"{stage}/{key}"
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.RLock())
+
+        with key_lock:
+            if self._held.get(name):
+                # 重入: 锁文件已由当前线程持有
+                self._held[name] += 1
+                try:
+                    yield
+                finally:
+                    self._held[name] -= 1
+                return
+
+            path = self.root / "locks" / f"{stage}-{key}.lock"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            waited = False
+            while True:
+                try:
+                    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    os.write(fd, str(os.getpid()).encode())
+                    os.close(fd)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - path.stat().st_mtime > stale_seconds:
+                            logger.warning(f"清理失效的产物锁: {stage}/{key[:12]}")
+                            path.unlink()
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    if not waited:
+                        logger.info(f"⏳ 其他进程正在生成 {stage}/{key[:12]},等待其完成")
+                        waited = True
+                    time.sleep(poll_interval)
+
+            # 长时间的计算 (如整篇翻译) 期间保持锁文件新鲜,其他进程不会把它当作失效锁
+            stop_heartbeat = threading.Event()
+
+            def heartbeat():
+                while not stop_heartbeat.wait(stale_seconds / 3):
+                    try:
+                        os.utime(path)
+                    except FileNotFoundError:
+                        return
+
+            threading.Thread(target=heartbeat, name=f"artifact-lock-{stage}", daemon=True).start()
+            self._held[name] = 1
+            try:
+                yield
+            finally:
+                self._held.pop(name, None)
+                stop_heartbeat.set()
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def set_ref(self, name: str, stage: str, key: str) -> None:
+        """
+        更新命名引用中某个阶段指向的产物
+
+        Args:
+            name: 引用名称 (如 latest 或邮件 ID)
+            stage: 阶段名称
+            key: 产物键
+        """
+        with self._lock:
+            refs = self.get_refs(name)
+            refs[stage] = key
+            path = self._ref_path(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(refs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+
+    def get_refs(self, name: str) -> Dict[str, str]:
+        """读取命名引用 {stage: key},不存在时返回空字典"""
+        path = self._ref_path(name)
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_ref(self, name: str, stage: str) -> Optional[Any]:
+        """读取命名引用中某个阶段的产物"""
+        key = self.get_refs(name).get(stage)
+        return self.get(stage, key) if key else None
+
+    def put_debug(self, name: str, payload: Any) -> str:
+        """
+        保存调试数据 (如发送给微信的请求体),同时更新 debug 引用
+
+        Args:
+            name: 调试数据名称
+            payload: 可 JSON 序列化的内容
+
+        Returns:
+            产物键
+        """
+        key = self.make_key('debug', name, payload)
+        path = self.put('debug', key, payload)
+        self.set_ref('debug', name, key)
+        logger.info(f"已保存调试数据到: {path}")
+        return key
+
+    def evict(self, retention_days: Optional[int] = None) -> int:
+        """
+        清理过期产物: 超过保留天数未访问,且未被任何引用指向
+
+        Args:
+            retention_days: 保留天数,默认使用初始化时的配置
+
+        Returns:
+            删除的产物数量
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        objects_dir = self.root / "objects"
+        if not objects_dir.exists():
+            return 0
+
+        referenced = set()
+        refs_dir = self.root / "refs"
+        if refs_dir.exists():
+            for ref_file in refs_dir.glob("*.json"):
+                try:
+                    with open(ref_file, 'r', encoding='utf-8') as f:
+                        referenced.update(json.load(f).values())
+                except Exception as e:
+                    logger.warning(f"读取引用失败 {ref_file}: {e}")
+
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        freed = 0
+        for path in objects_dir.rglob("*.json.gz"):
+            key = path.name[:-len(".json.gz")]
+            if key in referenced:
+                continue
+            stat = path.stat()
+            if stat.st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+                freed += stat.st_size
+
+        if removed:
+            logger.info(f"🧹 已清理 {removed} 个过期产物,释放 {freed / 1024:.1f} KB")
+        return removed
@@ -54,6 +54,19 @@ class Config(BaseSettings):
         default=4000,
         alias="OPENAI_MAX_TOKENS"
     )
+    # http: 直连 /chat/completions (不加载 LangChain); langchain: 使用 langchain-openai
+    openai_backend: str = Field(
+        default="http",
+        alias="OPENAI_BACKEND"
+    )
+    openai_http2: bool = Field(
+        default=True,
+        alias="OPENAI_HTTP2"
+    )
+    openai_max_connections: int = Field(
+        default=20,
+        alias="OPENAI_MAX_CONNECTIONS"
+    )
 
     # Vertex AI 配置
     vertex_ai_project_id: Optional[str] = Field(default=None, alias="VERTEX_AI_PROJECT_ID")
@@ -73,6 +86,75 @@ class Config(BaseSettings):
         alias="GOOGLE_AI_MODEL"
     )
 
+    # 本地 CPU 机器翻译配置 (AI_PROVIDER=local,CTranslate2 转换后的 Marian / NLLB 模型)
+    local_mt_model_dir: str = Field(
+        default="models/opus-mt-en-zh",
+        alias="LOCAL_MT_MODEL_DIR"
+    )
+    local_mt_compute_type: str = Field(
+        default="int8",
+        alias="LOCAL_MT_COMPUTE_TYPE"
+    )
+    local_mt_threads: int = Field(
+        default=0,
+        alias="LOCAL_MT_THREADS"
+    )
+    local_mt_beam_size: int = Field(
+        default=2,
+        alias="LOCAL_MT_BEAM_SIZE"
+    )
+    local_mt_batch_size: int = Field(
+        default=32,
+        alias="LOCAL_MT_BATCH_SIZE"
+    )
+    # 以空格分隔的 token,opus-mt-en-zh 需要 >>cmn_Hans<<,NLLB 为 eng_Latn / zho_Hans
+    local_mt_source_prefix: str = Field(
+        default=">>cmn_Hans<<",
+        alias="LOCAL_MT_SOURCE_PREFIX"
+    )
+    local_mt_target_prefix: str = Field(
+        default="",
+        alias="LOCAL_MT_TARGET_PREFIX"
+    )
+
+    # 模拟 LLM 配置 (AI_PROVIDER=fake,离线测试和基准测试使用)
+    fake_llm_latency: str = Field(
+        default="fixed",
+        alias="FAKE_LLM_LATENCY"
+    )
+    fake_llm_latency_ms: float = Field(
+        default=500.0,
+        alias="FAKE_LLM_LATENCY_MS"
+    )
+    fake_llm_latency_sigma: float = Field(
+        default=0.5,
+        alias="FAKE_LLM_LATENCY_SIGMA"
+    )
+    fake_llm_tail_alpha: float = Field(
+        default=1.5,
+        alias="FAKE_LLM_TAIL_ALPHA"
+    )
+    fake_llm_ms_per_token: float = Field(
+        default=0.0,
+        alias="FAKE_LLM_MS_PER_TOKEN"
+    )
+    fake_llm_rate_limit_rate: float = Field(
+        default=0.0,
+        alias="FAKE_LLM_RATE_LIMIT_RATE"
+    )
+    fake_llm_timeout_rate: float = Field(
+        default=0.0,
+        alias="FAKE_LLM_TIMEOUT_RATE"
+    )
+    fake_llm_timeout_seconds: float = Field(
+        default=30.0,
+        alias="FAKE_LLM_TIMEOUT_SECONDS"
+    )
+    fake_llm_seed: int = Field(
+        default=0,
+        alias="FAKE_LLM_SEED"
+    )
+
     # 翻译配置
     translation_chunk_size: int = Field(
         default=3000,
@@ -146,6 +228,11 @@ class Config(BaseSettings):
         default="logs/app.log",
         alias="LOG_FILE"
     )
+    # LLM 调用追踪 (JSONL,为空时不追踪),分析: python -m src.pipeline.cli trace
+    llm_trace_file: str = Field(
+        default="logs/llm_calls.jsonl",
+        alias="LLM_TRACE_FILE"
+    )
 
     # 应用配置
     app_env: str = Field(
@@ -6,8 +6,9 @@
 
 import os
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean
+from typing import Any, Optional, List, Dict
+from sqlalchemy import create_engine, event, func, Column, Integer, Float, String, DateTime, Text, Boolean, UniqueConstraint
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
@@ -55,6 +56,128 @@ class ExecutionLog(Base):
         return f"<ExecutionLog(time='{self.execution_time}', status='{self.status}')>"
 
 
+class SyncState(Base):
+    """增量同步状态 (如 Gmail historyId)"""
+    
+    __tablename__ = "sync_states"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(255), unique=True, nullable=False, index=True)
+    value = Column(String(255))
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<SyncState(key='{self.key}', value='{self.value}')>"
+
+
+class TranslationSegment(Base):
+    """翻译检查点: 已完成的单个文本片段译文"""
+    
+    __tablename__ = "translation_segments"
+    __table_args__ = (UniqueConstraint("email_id", "segment_hash", name="uq_translation_segment"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    email_id = Column(String(255), nullable=False, index=True)
+    segment_hash = Column(String(64), nullable=False)
+    source_text = Column(Text)
+    translated_text = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    
+    def __repr__(self):
+        return f"<TranslationSegment(email_id='{self.email_id}', segment_hash='{self.segment_hash[:12]}')>"
+
+
+class TranslationMemoryEntry(Base):
+    """翻译记忆: 跨邮件共享的片段译文 (按原文哈希和翻译配置指纹检索)"""
+    
+    __tablename__ = "translation_memory"
+    __table_args__ = (UniqueConstraint("fingerprint", "source_hash", name="uq_translation_memory"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fingerprint = Column(String(64), nullable=False, index=True)
+    source_hash = Column(String(64), nullable=False)
+    source_text = Column(Text)
+    translated_text = Column(Text)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    
+    def __repr__(self):
+        return f"<TranslationMemoryEntry(source_hash='{self.source_hash[:12]}', hits={self.hit_count})>"
+
+
+class BackfillItem(Base):
+    """历史回填进度"""
+    
+    __tablename__ = "backfill_items"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    email_id = Column(String(255), unique=True, nullable=False, index=True)
+    subject = Column(String(500))
+    received_date = Column(String(255))
+    status = Column(String(50))  # done, failed
+    output_path = Column(String(500))
+    error_message = Column(Text)
+    duration_seconds = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<BackfillItem(email_id='{self.email_id}', status='{self.status}')>"
+
+
+class RunMetric(Base):
+    """单次流水线运行的指标"""
+    
+    __tablename__ = "run_metrics"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(64), unique=True, nullable=False, index=True)
+    pipeline = Column(String(100))
+    started_at = Column(DateTime, index=True)
+    finished_at = Column(DateTime)
+    status = Column(String(50))  # success, stopped, failed
+    error_message = Column(Text)
+    email_id = Column(String(255))
+    subject = Column(String(500))
+    provider = Column(String(100))
+    model = Column(String(255))
+    duration_seconds = Column(Float)
+    segments = Column(Integer)
+    llm_calls = Column(Integer)
+    llm_errors = Column(Integer)
+    input_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    translation_cache_hits = Column(Integer)
+    translation_cache_misses = Column(Integer)
+    artifact_cache_hits = Column(Integer)
+    artifact_cache_misses = Column(Integer)
+    images_uploaded = Column(Integer)
+    image_bytes = Column(Integer)
+    original_html_bytes = Column(Integer)
+    clipped_html_bytes = Column(Integer)
+    translated_html_bytes = Column(Integer)
+    formatted_html_bytes = Column(Integer)
+    
+    def __repr__(self):
+        return f"<RunMetric(run_id='{self.run_id}', status='{self.status}')>"
+
+
+class StageMetric(Base):
+    """单次运行中各阶段的耗时"""
+    
+    __tablename__ = "stage_metrics"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(64), nullable=False, index=True)
+    stage = Column(String(255), nullable=False)
+    status = Column(String(50))  # success, failed, skipped
+    start_seconds = Column(Float)
+    duration_seconds = Column(Float)
+    cpu_seconds = Column(Float)
+    
+    def __repr__(self):
+        return f"<StageMetric(run_id='{self.run_id}', stage='{self.stage}')>"
+
+
 class Database:
     """数据库管理类 - 支持 Supabase PostgreSQL"""
 
@@ -97,6 +220,15 @@ class Database:
                 echo=False,
                 connect_args={"check_same_thread": False}  # SQLite 特定配置
             )
+
+            # WAL 模式: 逐条写入检查点时不阻塞读取,进程被杀也不会损坏已提交的数据
+            @event.listens_for(self.engine, "connect")
+            def _set_sqlite_pragma(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
             logger.info(f"数据库初始化成功 (SQLite): {db_path}")
         else:
             # PostgreSQL 配置（Render PostgreSQL）
@@ -118,7 +250,11 @@ class Database:
     
     def _create_tables(self):
         """创建数据表"""
-        Base.metadata.create_all(self.engine)
+        try:
+            Base.metadata.create_all(self.engine)
+        except OperationalError:
+            # 多个进程同时首次建表时,另一个进程可能刚刚创建了同一张表,重新检查一次即可
+            Base.metadata.create_all(self.engine)
         logger.info("数据表创建完成")
     
     def get_session(self) -> Session:
@@ -275,3 +411,354 @@ class Database:
         finally:
             session.close()
 
+    def save_run_metrics(
+        self,
+        run: Dict[str, Any],
+        stages: List[Dict[str, Any]],
+        email_count: int = 0
+    ) -> None:
+        """
+        在同一个事务中写入运行指标、各阶段耗时和执行日志
+        
+        Args:
+            run: RunMetric 的字段 (需包含 run_id、status、started_at、duration_seconds)
+            stages: StageMetric 的字段列表
+            email_count: 处理邮件数量 (写入执行日志)
+        """
+        session = self.get_session()
+        try:
+            session.add(RunMetric(**run))
+            session.add_all(StageMetric(run_id=run['run_id'], **stage) for stage in stages)
+            session.add(ExecutionLog(
+                execution_time=run['started_at'],
+                status=run['status'],
+                email_count=email_count,
+                error_message=run.get('error_message'),
+                duration_seconds=round(run['duration_seconds'])
+            ))
+            session.commit()
+            logger.info(f"已记录运行指标: {run['run_id']} ({len(stages)} 个阶段)")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"记录运行指标失败: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_run_metrics(self, since: datetime, pipeline: Optional[str] = None) -> List[RunMetric]:
+        """
+        获取运行指标 (按开始时间升序)
+        
+        Args:
+            since: 起始时间
+            pipeline: 只返回该流水线的运行
+        
+        Returns:
+            RunMetric 列表
+        """
+        session = self.get_session()
+        try:
+            query = session.query(RunMetric).filter(RunMetric.started_at >= since)
+            if pipeline:
+                query = query.filter_by(pipeline=pipeline)
+            return query.order_by(RunMetric.started_at).all()
+        finally:
+            session.close()
+    
+    def get_stage_metrics(self, run_ids: List[str]) -> List[StageMetric]:
+        """
+        获取指定运行的阶段耗时
+        
+        Args:
+            run_ids: 运行 ID 列表
+        
+        Returns:
+            StageMetric 列表
+        """
+        if not run_ids:
+            return []
+        session = self.get_session()
+        try:
+            return session.query(StageMetric).filter(StageMetric.run_id.in_(run_ids)).all()
+        finally:
+            session.close()
+
+    def get_sync_state(self, key: str) -> Optional[str]:
+        """
+        读取增量同步状态
+        
+        Args:
+            key: 状态键
+        
+        Returns:
+            状态值，不存在时返回 None
+        """
+        session = self.get_session()
+        try:
+            result = session.query(SyncState).filter_by(key=key).first()
+            return result.value if result else None
+        finally:
+            session.close()
+    
+    def set_sync_state(self, key: str, value: str) -> None:
+        """
+        写入增量同步状态 (存在则更新)
+        
+        Args:
+            key: 状态键
+            value: 状态值
+        """
+        session = self.get_session()
+        try:
+            state = session.query(SyncState).filter_by(key=key).first()
+            if state:
+                state.value = value
+            else:
+                session.add(SyncState(key=key, value=value))
+            session.commit()
+            logger.info(f"已更新同步状态: {key}={value}")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"更新同步状态失败: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def delete_sync_state(self, key: str) -> None:
+        """
+        删除增量同步状态
+        
+        Args:
+            key: 状态键
+        """
+        session = self.get_session()
+        try:
+            session.query(SyncState).filter_by(key=key).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"删除同步状态失败: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_translation_segments(self, email_id: str) -> Dict[str, str]:
+        """
+        读取邮件的翻译检查点
+        
+        Args:
+            email_id: 邮件 ID
+        
+        Returns:
+            {片段哈希: 译文}
+        """
+        session = self.get_session()
+        try:
+            rows = session.query(TranslationSegment).filter_by(email_id=email_id).all()
+            return {row.segment_hash: row.translated_text for row in rows}
+        finally:
+            session.close()
+    
+    def save_translation_segment(
+        self,
+        email_id: str,
+        segment_hash: str,
+        source_text: str,
+        translated_text: str
+    ) -> None:
+        """
+        保存单个片段的译文 (已存在则更新)
+        
+        Args:
+            email_id: 邮件 ID
+            segment_hash: 片段哈希
+            source_text: 原文
+            translated_text: 译文
+        """
+        session = self.get_session()
+        try:
+            segment = session.query(TranslationSegment).filter_by(
+                email_id=email_id, segment_hash=segment_hash
+            ).first()
+            if segment:
+                segment.translated_text = translated_text
+            else:
+                session.add(TranslationSegment(
+                    email_id=email_id,
+                    segment_hash=segment_hash,
+                    source_text=source_text,
+                    translated_text=translated_text
+                ))
+            session.commit()
+        except IntegrityError:
+            # 并发翻译时相同原文 (如 "The Rundown:") 同时写入,保留先写入的译文
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"保存翻译检查点失败: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def delete_translation_segments(self, email_id: str) -> int:
+        """
+        删除邮件的翻译检查点
+        
+        Args:
+            email_id: 邮件 ID
+        
+        Returns:
+            删除的片段数量
+        """
+        session = self.get_session()
+        try:
+            count = session.query(TranslationSegment).filter_by(email_id=email_id).delete()
+            session.commit()
+            return count
+        except Exception as e:
+            session.rollback()
+            logger.error(f"删除翻译检查点失败: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_translation_memory(self, fingerprint: str, source_hash: str) -> Optional[str]:
+        """
+        查询翻译记忆 (只读;命中次数由 add_translation_memory_hits 批量累加)
+        
+        Args:
+            fingerprint: 翻译配置指纹
+            source_hash: 原文哈希
+        
+        Returns:
+            译文,未命中时返回 None
+        """
+        session = self.get_session()
+        try:
+            entry = session.query(TranslationMemoryEntry).filter_by(
+                fingerprint=fingerprint, source_hash=source_hash
+            ).first()
+            return entry.translated_text if entry is not None else None
+        finally:
+            session.close()
+    
+    def add_translation_memory_hits(self, fingerprint: str, hits: Dict[str, int]) -> None:
+        """
+        批量累加翻译记忆的命中次数 (一个事务)
+        
+        Args:
+            fingerprint: 翻译配置指纹
+            hits: {原文哈希: 本次累计的命中次数}
+        """
+        session = self.get_session()
+        try:
+            for source_hash, count in hits.items():
+                session.query(TranslationMemoryEntry).filter_by(
+                    fingerprint=fingerprint, source_hash=source_hash
+                ).update(
+                    {TranslationMemoryEntry.hit_count: func.coalesce(TranslationMemoryEntry.hit_count, 0) + count},
+                    synchronize_session=False
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"保存翻译记忆命中次数失败: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def save_translation_memory(
+        self,
+        fingerprint: str,
+        source_hash: str,
+        source_text: str,
+        translated_text: str
+    ) -> None:
+        """
+        保存翻译记忆 (已存在则更新)
+        
+        Args:
+            fingerprint: 翻译配置指纹
+            source_hash: 原文哈希
+            source_text: 原文
+            translated_text: 译文
+        """
+        session = self.get_session()
+        try:
+            entry = session.query(TranslationMemoryEntry).filter_by(
+                fingerprint=fingerprint, source_hash=source_hash
+            ).first()
+            if entry:
+                entry.translated_text = translated_text
+            else:
+                session.add(TranslationMemoryEntry(
+                    fingerprint=fingerprint,
+                    source_hash=source_hash,
+                    source_text=source_text,
+                    translated_text=translated_text
+                ))
+            session.commit()
+        except IntegrityError:
+            # 其他线程/进程同时写入了同一片段,保留先写入的译文
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"保存翻译记忆失败: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_backfill_statuses(self) -> Dict[str, str]:
+        """
+        读取历史回填进度
+        
+        Returns:
+            {邮件 ID: 状态}
+        """
+        session = self.get_session()
+        try:
+            return {row.email_id: row.status for row in session.query(BackfillItem).all()}
+        finally:
+            session.close()
+    
+    def save_backfill_item(
+        self,
+        email_id: str,
+        status: str,
+        subject: Optional[str] = None,
+        received_date: Optional[str] = None,
+        output_path: Optional[str] = None,
+        error_message: Optional[str] = None,
+        duration_seconds: Optional[int] = None
+    ) -> None:
+        """
+        记录单封邮件的回填结果 (已存在则更新)
+        
+        Args:
+            email_id: 邮件 ID
+            status: 状态 (done, failed)
+            subject: 邮件主题
+            received_date: 邮件日期
+            output_path: 归档文件路径
+            error_message: 错误信息
+            duration_seconds: 处理时长（秒）
+        """
+        session = self.get_session()
+        try:
+            item = session.query(BackfillItem).filter_by(email_id=email_id).first()
+            if item is None:
+                item = BackfillItem(email_id=email_id)
+                session.add(item)
+            item.status = status
+            item.subject = subject
+            item.received_date = received_date
+            item.output_path = output_path
+            item.error_message = error_message
+            item.duration_seconds = duration_seconds
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"记录回填进度失败: {e}")
+            raise
+        finally:
+            session.close()
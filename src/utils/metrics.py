@@ -0,0 +1,281 @@
+"""
+进程内运行指标
+计数器、仪表和直方图按 Prometheus 文本格式导出 (健康检查服务器的 /metrics),
+并保存最近一次流水线运行的摘要 (/runs/latest)
+"""
+
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 阶段耗时直方图的桶 (秒)
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类,按标签值保存样本"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Tuple[str, str], ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames},实际为 {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self, **match: Any) -> float:
+        """匹配给定标签的样本之和"""
+        with self._lock:
+            return sum(
+                value for labels, value in self._values.items()
+                if all(dict(labels).get(k) == str(v) for k, v in match.items())
+            )
+
+
+class Gauge(_Metric):
+    """可任意设置的仪表"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """累积桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_sample(self, labels, value) -> List[str]:
+        counts, total = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {count}"
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'rundown_stage_duration_seconds', "流水线阶段耗时", ('pipeline', 'stage', 'status')))
+RUNS = REGISTRY.register(Counter(
+    'rundown_runs_total', "流水线运行次数", ('pipeline', 'status')))
+LAST_RUN_TIMESTAMP = REGISTRY.register(Gauge(
+    'rundown_last_run_timestamp_seconds', "最近一次运行结束的时间戳", ('pipeline',)))
+LAST_RUN_SUCCESS = REGISTRY.register(Gauge(
+    'rundown_last_run_success', "最近一次运行是否成功 (1 成功 / 0 失败,没有新邮件视为成功)", ('pipeline',)))
+LAST_RUN_DURATION = REGISTRY.register(Gauge(
+    'rundown_last_run_duration_seconds', "最近一次运行的总耗时", ('pipeline',)))
+LAST_SUCCESS_TIMESTAMP = REGISTRY.register(Gauge(
+    'rundown_last_success_timestamp_seconds', "最近一次成功运行结束的时间戳", ('pipeline',)))
+
+LLM_REQUESTS = REGISTRY.register(Counter(
+    'rundown_llm_requests_total', "LLM 请求次数 (含重试)", ('provider', 'model', 'status')))
+LLM_TOKENS = REGISTRY.register(Counter(
+    'rundown_llm_tokens_total', "LLM token 用量", ('provider', 'model', 'type')))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    'rundown_llm_request_duration_seconds', "LLM 请求耗时", ('provider', 'model'),
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)))
+TRANSLATION_SEGMENTS = REGISTRY.register(Counter(
+    'rundown_translation_segments_total', "需要翻译的文本片段数 (不含固定标题)", ()))
+TRANSLATION_ROUTED = REGISTRY.register(Counter(
+    'rundown_translation_routed_total', "模型路由分派到各层的片段数", ('tier',)))
+TRANSLATION_SEGMENT_FALLBACKS = REGISTRY.register(Counter(
+    'rundown_translation_segment_fallbacks_total', "按块翻译退回逐个文本节点翻译的块数 (placeholders / error)",
+    ('reason',)))
+TRANSLATION_CACHE = REGISTRY.register(Counter(
+    'rundown_translation_cache_total', "翻译片段的检查点/翻译记忆查询 (hit / miss)", ('result',)))
+ARTIFACT_CACHE = REGISTRY.register(Counter(
+    'rundown_artifact_cache_total', "阶段产物缓存查询 (hit / miss)", ('stage', 'result')))
+
+WECHAT_UPLOADS = REGISTRY.register(Counter(
+    'rundown_wechat_uploads_total', "微信素材上传次数", ('kind', 'status')))
+WECHAT_UPLOAD_BYTES = REGISTRY.register(Counter(
+    'rundown_wechat_upload_bytes_total', "上传到微信的素材字节数", ('kind',)))
+
+# 运行摘要中统计增量的计数器
+_RUN_COUNTERS = {
+    'segments': (TRANSLATION_SEGMENTS, {}),
+    'llm_requests': (LLM_REQUESTS, {}),
+    'llm_errors': (LLM_REQUESTS, {'status': 'error'}),
+    'llm_input_tokens': (LLM_TOKENS, {'type': 'input'}),
+    'llm_output_tokens': (LLM_TOKENS, {'type': 'output'}),
+    'translation_cache_hits': (TRANSLATION_CACHE, {'result': 'hit'}),
+    'translation_cache_misses': (TRANSLATION_CACHE, {'result': 'miss'}),
+    'artifact_cache_hits': (ARTIFACT_CACHE, {'result': 'hit'}),
+    'artifact_cache_misses': (ARTIFACT_CACHE, {'result': 'miss'}),
+    'images_uploaded': (WECHAT_UPLOADS, {'status': 'success'}),
+    'image_bytes_uploaded': (WECHAT_UPLOAD_BYTES, {}),
+}
+
+_latest_runs: Dict[str, Dict[str, Any]] = {}
+_latest_lock = threading.Lock()
+
+
+def snapshot() -> Dict[str, float]:
+    """记录运行开始时的计数器,结束时计算本次运行的增量"""
+    return {name: counter.total(**match) for name, (counter, match) in _RUN_COUNTERS.items()}
+
+
+def _ratio(hits: float, misses: float) -> Optional[float]:
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def record_run(
+    pipeline: str,
+    status: str,
+    started_at: float,
+    total_seconds: float,
+    timings: Dict[str, Any],
+    critical_path: List[str],
+    before: Dict[str, float],
+    error: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    记录一次流水线运行: 更新阶段直方图和最近运行指标,保存运行摘要
+
+    Args:
+        pipeline: 流水线名称
+        status: success / failed / stopped
+        started_at: 开始时间戳 (time.time())
+        total_seconds: 总耗时
+        timings: {阶段名: StageTiming}
+        critical_path: 关键路径
+        before: 运行开始时的 snapshot()
+        error: 失败或终止原因
+
+    Returns:
+        运行摘要
+    """
+    finished_at = time.time()
+    for timing in timings.values():
+        STAGE_DURATION.observe(timing.duration, pipeline=pipeline, stage=timing.name, status=timing.status)
+    RUNS.inc(pipeline=pipeline, status=status)
+    LAST_RUN_TIMESTAMP.set(finished_at, pipeline=pipeline)
+    LAST_RUN_DURATION.set(total_seconds, pipeline=pipeline)
+    LAST_RUN_SUCCESS.set(0 if status == 'failed' else 1, pipeline=pipeline)
+    if status != 'failed':
+        LAST_SUCCESS_TIMESTAMP.set(finished_at, pipeline=pipeline)
+
+    after = snapshot()
+    counters = {name: after[name] - before.get(name, 0) for name in after}
+    summary = {
+        'run_id': f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}",
+        'pipeline': pipeline,
+        'status': status,
+        'error': error,
+        'started_at': datetime.fromtimestamp(started_at, timezone.utc).isoformat(timespec='seconds'),
+        'finished_at': datetime.fromtimestamp(finished_at, timezone.utc).isoformat(timespec='seconds'),
+        'total_seconds': round(total_seconds, 3),
+        'critical_path': critical_path,
+        'stages': [
+            {
+                'name': timing.name,
+                'status': timing.status,
+                'start': round(timing.start, 3),
+                'duration': round(timing.duration, 3),
+                'cpu_seconds': round(timing.cpu_seconds, 3),
+            }
+            for timing in sorted(timings.values(), key=lambda t: t.start)
+        ],
+        'counters': counters,
+        'translation_cache_hit_ratio': _ratio(counters['translation_cache_hits'], counters['translation_cache_misses']),
+        'artifact_cache_hit_ratio': _ratio(counters['artifact_cache_hits'], counters['artifact_cache_misses']),
+    }
+    with _latest_lock:
+        _latest_runs[pipeline] = summary
+    return summary
+
+
+def latest_run(pipeline: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """最近一次运行的摘要;不指定流水线时返回最后结束的一次"""
+    with _latest_lock:
+        if pipeline is not None:
+            return _latest_runs.get(pipeline)
+        if not _latest_runs:
+            return None
+        return max(_latest_runs.values(), key=lambda run: run['finished_at'])
@@ -0,0 +1,254 @@
+"""
+流水线性能剖析
+每个阶段在自己的线程内用 cProfile 剖析,同时后台线程按固定间隔对所有线程采样调用栈 (墙钟时间,
+包含等待 LLM / 微信接口的时间),并在阶段前后拍摄 tracemalloc 快照统计内存增长。
+
+输出目录:
+    <stage>.prof            cProfile 结果 (pstats / snakeviz 可读取)
+    <stage>.txt             按累计时间排序的函数列表
+    <stage>.memory.txt      阶段内内存增长最多的代码行
+    stacks.collapsed        折叠调用栈,可直接交给 flamegraph.pl / speedscope / inferno
+    summary.txt             各阶段耗时、内存和采样热点汇总
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 项目代码所在目录,用于判断线程是否在执行项目代码,以及缩短帧名中的路径
+_SRC_DIR = str(Path(__file__).resolve().parent.parent)
+_ROOT_DIR = str(Path(_SRC_DIR).parent)
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_ROOT_DIR):
+        return os.path.relpath(filename, _ROOT_DIR)
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+def _safe_name(stage: str) -> str:
+    return re.sub(r'[^\w@.-]', '_', stage)
+
+
+class PipelineProfiler:
+    """流水线剖析器,传给 Pipeline.run(profiler=...) 使用"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        interval: float = 0.005,
+        memory: bool = True,
+        memory_frames: int = 1,
+        top: int = 15
+    ):
+        """
+        初始化剖析器
+
+        Args:
+            output_dir: 输出目录
+            interval: 调用栈采样间隔 (秒)
+            memory: 是否用 tracemalloc 统计内存 (会明显拖慢分配密集的阶段)
+            memory_frames: tracemalloc 记录的栈深度
+            top: 报告中列出的条目数
+        """
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.memory = memory
+        self.memory_frames = memory_frames
+        self.top = top
+
+        self._lock = threading.Lock()
+        self._thread_stages: Dict[int, str] = {}
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._memory: Dict[str, List[str]] = {}
+        self._stage_stats: Dict[str, Dict[str, Optional[float]]] = {}
+        self._stop_event = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._owner: Optional[int] = None
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        """开始采样 (调用线程只负责调度阶段,不参与采样)"""
+        self._owner = threading.get_ident()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+            self._started_tracemalloc = True
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> Path:
+        """
+        停止采样并写入结果
+
+        Returns:
+            输出目录
+        """
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        try:
+            self.write(peak)
+        except OSError as e:
+            # 剖析结果写入失败不影响流水线
+            logger.warning(f"写入性能剖析结果失败: {e}")
+        return self.output_dir
+
+    @contextmanager
+    def stage(self, name: str):
+        """剖析在当前线程执行的一个阶段"""
+        ident = threading.get_ident()
+        # 拍摄快照期间该线程不参与采样,避免剖析器自身的开销混入结果
+        before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        traced_before = tracemalloc.get_traced_memory()[0] if before is not None else 0
+        with self._lock:
+            self._thread_stages[ident] = name
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ 的 cProfile 基于进程级的 sys.monitoring,同一时间只能有一个实例
+            profile = None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                self._thread_stages.pop(ident, None)
+                if profile is not None:
+                    self._profiles[name] = profile
+                self._stage_stats[name] = {'wall': wall, 'cpu': cpu, 'memory_delta': None}
+            if before is not None and tracemalloc.is_tracing():
+                self._stage_stats[name]['memory_delta'] = tracemalloc.get_traced_memory()[0] - traced_before
+                self._memory[name] = self._memory_report(before, tracemalloc.take_snapshot())
+
+    def _memory_report(self, before, after) -> List[str]:
+        # 不用 Snapshot.filter_traces: 逐条 fnmatch 匹配比对比本身慢得多,输出时再跳过 tracemalloc 自身
+        diff = after.compare_to(before, 'lineno')
+        lines = []
+        for stat in sorted(diff, key=lambda s: s.size_diff, reverse=True):
+            frame = stat.traceback[0]
+            if frame.filename == tracemalloc.__file__:
+                continue
+            lines.append(f"{stat.size_diff / 1024:>+12.1f} KiB {stat.count_diff:>+9} 块  "
+                         f"{_short_path(frame.filename)}:{frame.lineno}")
+            if len(lines) >= self.top:
+                break
+        return lines
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with self._lock:
+                thread_stages = dict(self._thread_stages)
+            for ident, frame in sys._current_frames().items():
+                if ident in (own, self._owner):
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+
+                root = thread_stages.get(ident)
+                if root is None:
+                    # 阶段内部创建的线程池 (并发翻译/图片上传) 按线程名归类;
+                    # 没有执行项目代码的空闲线程和剖析器自身的簿记跳过
+                    if (not any(code.co_filename.startswith(_SRC_DIR) for code in codes)
+                            or any(code.co_filename == __file__ for code in codes)):
+                        continue
+                    root = re.sub(r'[-_]\d+(_\d+)?$', '', names.get(ident, 'thread'))
+                self._stacks[';'.join([root] + [_frame_label(code) for code in codes])] += 1
+            self._samples += 1
+
+    def hot_spots(self) -> List[tuple]:
+        """采样热点: (帧, 采样数),按栈顶帧 (自身时间) 汇总"""
+        leaves: Counter = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(self.top)
+
+    def write(self, peak_memory: Optional[int] = None) -> None:
+        """写入所有输出文件"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        for name, profile in self._profiles.items():
+            stats = pstats.Stats(profile)
+            stats.dump_stats(str(self.output_dir / f"{_safe_name(name)}.prof"))
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(40)
+            (self.output_dir / f"{_safe_name(name)}.txt").write_text(stream.getvalue(), encoding='utf-8')
+        for name, lines in self._memory.items():
+            (self.output_dir / f"{_safe_name(name)}.memory.txt").write_text(
+                "\n".join(["    增长       块数  位置"] + lines) + "\n", encoding='utf-8')
+
+        with open(self.output_dir / "stacks.collapsed", 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        summary = self.summary(peak_memory)
+        (self.output_dir / "summary.txt").write_text(summary + "\n", encoding='utf-8')
+        for line in summary.splitlines():
+            logger.info(line)
+
+    def summary(self, peak_memory: Optional[int] = None) -> str:
+        """各阶段耗时/内存和采样热点"""
+        lines = [f"🔬 性能剖析结果: {self.output_dir}",
+                 f"  {'阶段':<28}{'墙钟(s)':>9}{'CPU(s)':>9}{'内存增长(MB)':>14}  自身耗时最多的函数"]
+        for name, stats in sorted(self._stage_stats.items(), key=lambda item: -item[1]['wall']):
+            hottest = '-'
+            profile = self._profiles.get(name)
+            if profile is not None:
+                entries = pstats.Stats(profile).stats
+                if entries:
+                    (filename, lineno, func), (_, _, tottime, _, _) = max(
+                        entries.items(), key=lambda item: item[1][2])
+                    hottest = f"{func} ({_short_path(filename)}:{lineno}) {tottime:.3f}s"
+            memory_delta = f"{stats['memory_delta'] / 2**20:.1f}" if stats['memory_delta'] is not None else "-"
+            lines.append(f"  {name:<28}{stats['wall']:>9.3f}{stats['cpu']:>9.3f}{memory_delta:>14}  {hottest}")
+        if peak_memory is not None:
+            lines.append(f"  tracemalloc 峰值: {peak_memory / 2**20:.1f} MB (并发阶段的内存增长会互相计入)")
+
+        total = sum(self._stacks.values())
+        if total:
+            roots: Counter = Counter()
+            for stack, count in self._stacks.items():
+                roots[stack.split(';', 1)[0]] += count
+            lines += ["", f"  采样 {self._samples} 次 (间隔 {self.interval * 1000:.0f}ms),按阶段/线程:"]
+            lines += [f"  {count / total:>7.1%}  {root}" for root, count in roots.most_common(self.top)]
+            lines += ["", "  采样热点 (栈顶帧,含等待网络的时间):"]
+            lines += [f"  {count / total:>7.1%}  {frame}" for frame, count in self.hot_spots()]
+        return "\n".join(lines)
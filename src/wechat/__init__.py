@@ -3,6 +3,7 @@
 """
 
 from .publisher import WeChatPublisher
+from .accounts import WeChatAccount
 
-__all__ = ["WeChatPublisher"]
+__all__ = ["WeChatPublisher", "WeChatAccount"]
 
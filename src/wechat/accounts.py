@@ -0,0 +1,86 @@
+"""
+微信公众号账号配置
+同一篇译文可以发布到多个公众号,每个账号有独立的 AppID/AppSecret、标题前缀和作者
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WeChatAccount:
+    """单个公众号的发布配置"""
+
+    def __init__(
+        self,
+        name: str,
+        app_id: str,
+        app_secret: str,
+        title_prefix: Optional[str] = None,
+        author: Optional[str] = None,
+        auto_publish: Optional[bool] = None,
+        variant: Optional[str] = None
+    ):
+        """
+        初始化账号配置
+
+        Args:
+            name: 账号名称 (用于日志和结果汇总)
+            app_id: 公众号 AppID
+            app_secret: 公众号 AppSecret
+            title_prefix: 标题前缀模板 ({date} 会被替换为日期),None 时使用全局配置
+            author: 作者,None 时使用全局配置
+            auto_publish: 是否自动发布,None 时使用全局配置
+            variant: 发布的中文变体 (如 zh-Hant),None 时发布 LLM 输出的简体版本
+        """
+        self.name = name
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.title_prefix = title_prefix
+        self.author = author
+        self.auto_publish = auto_publish
+        self.variant = variant
+
+    @classmethod
+    def from_config(cls, entry: Dict[str, Any]) -> "WeChatAccount":
+        """
+        从 config.yaml 的 wechat.accounts 条目创建账号
+
+        密钥不写在配置文件中: app_id_env / app_secret_env 指定读取的环境变量名
+
+        Args:
+            entry: 配置条目
+
+        Returns:
+            WeChatAccount
+
+        Raises:
+            ValueError: 缺少名称或密钥
+        """
+        name = entry.get('name')
+        if not name:
+            raise ValueError("wechat.accounts 中的账号缺少 name")
+
+        app_id = os.getenv(entry.get('app_id_env', ''), '')
+        app_secret = os.getenv(entry.get('app_secret_env', ''), '')
+        if not app_id or not app_secret:
+            raise ValueError(
+                f"公众号账号 {name} 缺少 AppID 或 AppSecret "
+                f"(环境变量 {entry.get('app_id_env')} / {entry.get('app_secret_env')})"
+            )
+
+        return cls(
+            name=name,
+            app_id=app_id,
+            app_secret=app_secret,
+            title_prefix=entry.get('title_prefix'),
+            author=entry.get('author'),
+            auto_publish=entry.get('auto_publish'),
+            variant=entry.get('variant')
+        )
+
+    def __repr__(self):
+        return f"<WeChatAccount(name='{self.name}', app_id='{self.app_id[:6]}...')>"
@@ -6,11 +6,12 @@
 import os
 import time
 import json
-from pathlib import Path
 from typing import Optional, Dict, Any
 import requests
 
+from ..utils import metrics
 from ..utils.logger import get_logger
+from ..utils.artifacts import ArtifactStore
 
 logger = get_logger(__name__)
 
@@ -25,7 +26,9 @@ class WeChatPublisher:
         self,
         app_id: Optional[str] = None,
         app_secret: Optional[str] = None,
-        auto_publish: bool = False
+        auto_publish: bool = False,
+        artifact_store: Optional[ArtifactStore] = None,
+        base_url: Optional[str] = None
     ):
         """
         初始化微信发布器
@@ -34,10 +37,15 @@ class WeChatPublisher:
             app_id: 微信公众号 AppID
             app_secret: 微信公众号 AppSecret
             auto_publish: 是否自动发布（False 则保存为草稿）
+            artifact_store: 产物存储,用于保存调试数据
+            base_url: API 基础 URL,默认读取环境变量 WECHAT_API_BASE_URL,
+                未设置时使用微信官方地址 (基准测试指向本地模拟服务)
         """
         self.app_id = app_id or os.getenv("WECHAT_APP_ID")
         self.app_secret = app_secret or os.getenv("WECHAT_APP_SECRET")
         self.auto_publish = auto_publish
+        self.artifact_store = artifact_store or ArtifactStore()
+        self.base_url = (base_url or os.getenv("WECHAT_API_BASE_URL") or self.BASE_URL).rstrip('/')
         
         if not self.app_id or not self.app_secret:
             raise ValueError("未设置微信公众号 AppID 或 AppSecret")
@@ -63,7 +71,7 @@ class WeChatPublisher:
         
         logger.info("获取新的 access_token")
         
-        url = f"{self.BASE_URL}/token"
+        url = f"{self.base_url}/token"
         params = {
             "grant_type": "client_credential",
             "appid": self.app_id,
@@ -101,7 +109,7 @@ class WeChatPublisher:
             封面图片的 media_id
         """
         access_token = self.get_access_token()
-        url = f"{self.BASE_URL}/material/add_material"
+        url = f"{self.base_url}/material/add_material"
 
         params = {
             "access_token": access_token,
@@ -129,10 +137,13 @@ class WeChatPublisher:
                 raise Exception(f"上传封面图失败: {error_msg}")
 
             media_id = data["media_id"]
+            metrics.WECHAT_UPLOADS.inc(kind='thumb', status='success')
+            metrics.WECHAT_UPLOAD_BYTES.inc(len(image_data), kind='thumb')
             logger.info(f"封面图上传成功: media_id={media_id}")
             return media_id
 
         except Exception as e:
+            metrics.WECHAT_UPLOADS.inc(kind='thumb', status='error')
             logger.error(f"上传封面图失败: {e}")
             raise
 
@@ -147,7 +158,7 @@ class WeChatPublisher:
             微信服务器上的图片 URL
         """
         access_token = self.get_access_token()
-        url = f"{self.BASE_URL}/material/add_material"
+        url = f"{self.base_url}/material/add_material"
 
         params = {
             "access_token": access_token,
@@ -186,10 +197,13 @@ class WeChatPublisher:
                 raise Exception(f"上传图片失败: {error_msg}")
 
             media_url = data["url"]
+            metrics.WECHAT_UPLOADS.inc(kind='image', status='success')
+            metrics.WECHAT_UPLOAD_BYTES.inc(len(img_content), kind='image')
             logger.info(f"图片上传成功: {media_url}")
             return media_url
 
         except Exception as e:
+            metrics.WECHAT_UPLOADS.inc(kind='image', status='error')
             logger.error(f"上传图片失败: {e}")
             raise
     
@@ -217,7 +231,7 @@ class WeChatPublisher:
             草稿的 media_id
         """
         access_token = self.get_access_token()
-        url = f"{self.BASE_URL}/draft/add"
+        url = f"{self.base_url}/draft/add"
         
         params = {"access_token": access_token}
         
@@ -246,11 +260,10 @@ class WeChatPublisher:
         payload = {"articles": [article]}
 
         # 调试:保存发送的内容
-        debug_file = Path("data/debug_wechat_request.json")
-        debug_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(debug_file, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        logger.info(f"已保存请求数据到: {debug_file}")
+        try:
+            self.artifact_store.put_debug("wechat_draft_request", payload)
+        except Exception as e:
+            logger.warning(f"保存请求数据失败: {e}")
 
         try:
             logger.info(f"创建草稿: {title}")
@@ -328,7 +341,7 @@ class WeChatPublisher:
             发布结果
         """
         access_token = self.get_access_token()
-        url = f"{self.BASE_URL}/freepublish/submit"
+        url = f"{self.base_url}/freepublish/submit"
         
         params = {"access_token": access_token}
         payload = {"media_id": media_id}
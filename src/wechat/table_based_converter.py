@@ -1,6 +1,7 @@
 """基于Table结构的微信HTML转换器"""
 import re
-from typing import Optional, List, Dict
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable, Iterator
 from bs4 import BeautifulSoup
 from src.utils.logger import get_logger
 
@@ -9,6 +10,8 @@ logger = get_logger(__name__)
 
 class TableBasedConverter:
     """基于Table结构提取内容并生成简洁HTML"""
+
+    BANNER_PATH = Path("data/assets/banner.png")
     
     def __init__(self, publisher=None):
         """初始化转换器
@@ -37,80 +40,132 @@ class TableBasedConverter:
             logger.error("未找到body标签")
             return html_content
         
-        # 提取所有顶层TR
+        # 遍历所有顶层TR,提取内容
         all_trs = body.find_all('tr', recursive=False)
         logger.info(f"找到 {len(all_trs)} 个顶层TR标签")
+
+        result = '\n'.join(self.convert_stream(all_trs))
+        logger.info(f"HTML转换完成,长度: {len(result)} 字符")
         
-        # 构建新的HTML
-        html_parts = []
-        current_section = None  # 跟踪当前章节
+        return result
+
+    def convert_stream(self, blocks: Iterable) -> Iterator[str]:
+        """逐块转换,每处理完一个顶层TR就产出对应的HTML片段
+
+        blocks 可以是边翻译边产出的生成器,第一块翻译完成即可开始格式化,
+        所有片段用换行拼接后与 convert 的结果一致
 
+        Args:
+            blocks: 顶层TR元素序列(按文档顺序)
+
+        Yields:
+            格式化后的HTML片段(首个片段为banner)
+        """
         # 添加banner图片
         banner_html = self._add_banner_image()
         if banner_html:
-            html_parts.append(banner_html)
+            yield banner_html
 
-        # 遍历所有TR,提取内容
-        for i, tr in enumerate(all_trs, 1):
-            td = tr.find('td')
-            if not td:
-                continue
+        for tr in blocks:
+            block_html = self.convert_block(tr)
+            if block_html:
+                yield block_html
 
-            nested_table = td.find('table', recursive=False)
-            if not nested_table:
-                continue
+    def convert_block(self, tr) -> str:
+        """转换单个顶层TR
 
-            nested_tr = nested_table.find('tr')
-            if not nested_tr:
-                continue
+        Args:
+            tr: 顶层TR元素
+
+        Returns:
+            格式化后的HTML片段,无内容时返回空字符串
+        """
+        nested_td = self._find_content_td(tr)
+        if nested_td is None:
+            return ""
+
+        bgcolor = nested_td.get('bgcolor', '')
+
+        # 黑色背景 = 章节标题
+        if bgcolor == '#000000':
+            section_title = nested_td.get_text(strip=True)
+            return self._format_section_title(section_title)
+
+        # 白色背景 = 内容块
+        if bgcolor == '#FFFFFF':
+            # 检查是否是新闻块(有H4标题)
+            h4 = nested_td.find('h4')
+            h3 = nested_td.find('h3')
+
+            if h4:
+                # 这是一条新闻 (LATEST DEVELOPMENTS)
+                return self._format_news_block(nested_td)
+            if h3:
+                # 这是快速要点的子版块(有H3标题)
+                # 需要检查内容是在同一个td还是下一个tr中
+                # 传递顶层TR,而不是嵌套TR
+                return self._format_quick_hits_subsection_with_next_tr(nested_td, tr)
+
+            # 这是简介或快讯
+            # 所有非新闻块都用边框包裹
+            return self._format_content_block(nested_td, add_border=True)
+
+        return ""
+
+    def _find_content_td(self, tr):
+        """返回 tr > td > table > tr > td 结构中最内层的td,结构不符时返回None"""
+        td = tr.find('td')
+        if not td:
+            return None
+
+        nested_table = td.find('table', recursive=False)
+        if not nested_table:
+            return None
 
-            nested_td = nested_tr.find('td')
-            if not nested_td:
+        nested_tr = nested_table.find('tr')
+        if not nested_tr:
+            return None
+
+        return nested_tr.find('td') or None
+
+    def _iter_blocks(self, body):
+        """遍历顶层TR,返回 (顶层TR, 内容TD)"""
+        for tr in body.find_all('tr', recursive=False):
+            nested_td = self._find_content_td(tr)
+            if nested_td is not None:
+                yield tr, nested_td
+
+    def collect_news_image_urls(self, html_content: str) -> List[str]:
+        """按文档顺序收集新闻块中会被转换使用的图片URL
+
+        与 _format_news_block 的选图规则一致(每条新闻取第一张http图片),
+        用于在翻译的同时预先上传图片
+
+        Args:
+            html_content: 原始或翻译后的HTML内容
+
+        Returns:
+            图片URL列表
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        body = soup.find('body')
+        if not body:
+            return []
+
+        urls = []
+        for _, nested_td in self._iter_blocks(body):
+            if nested_td.get('bgcolor', '') != '#FFFFFF' or not nested_td.find('h4'):
                 continue
+            img = nested_td.find('img')
+            if img:
+                img_src = img.get('src', '')
+                if img_src and 'http' in img_src:
+                    urls.append(img_src)
+        return urls
 
-            bgcolor = nested_td.get('bgcolor', '')
-
-            # 黑色背景 = 章节标题
-            if bgcolor == '#000000':
-                section_title = nested_td.get_text(strip=True)
-                current_section = section_title  # 记录当前章节
-                html_parts.append(self._format_section_title(section_title))
-
-            # 白色背景 = 内容块
-            elif bgcolor == '#FFFFFF':
-                # 检查是否是新闻块(有H4标题)
-                h4 = nested_td.find('h4')
-                h3 = nested_td.find('h3')
-
-                if h4:
-                    # 这是一条新闻 (LATEST DEVELOPMENTS)
-                    news_html = self._format_news_block(nested_td)
-                    if news_html:
-                        html_parts.append(news_html)
-                elif h3:
-                    # 这是快速要点的子版块(有H3标题)
-                    # 需要检查内容是在同一个td还是下一个tr中
-                    # 传递顶层TR,而不是嵌套TR
-                    subsection_html = self._format_quick_hits_subsection_with_next_tr(nested_td, tr)
-                    if subsection_html:
-                        html_parts.append(subsection_html)
-                else:
-                    # 这是简介或快讯
-                    # 所有非新闻块都用边框包裹
-                    content_html = self._format_content_block(nested_td, add_border=True)
-                    if content_html:
-                        html_parts.append(content_html)
-        
-        result = '\n'.join(html_parts)
-        logger.info(f"HTML转换完成,长度: {len(result)} 字符")
-        
-        return result
-    
     def _add_banner_image(self) -> str:
         """添加banner图片到文章开头"""
-        from pathlib import Path
-
-        banner_path = Path("data/assets/banner.png")
+        banner_path = self.BANNER_PATH
         if not banner_path.exists():
             logger.warning(f"Banner图片不存在: {banner_path}")
             return ""